@@ -0,0 +1,175 @@
+"""
+Incrementally maintained cohort aggregates for the dashboards.
+
+Each scored upload contributes
+  - counts per (academic year, profile)
+  - counts per (branch, profile)
+  - per-cluster row counts and sums of CGPA / skill scores
+The contribution is computed once when the upload is scored and kept, so the
+upload can later be deleted or replaced by subtracting exactly what it added.
+Sums are kept in fixed point (integer micro-units), which makes add/subtract
+exact: the totals always equal a full recompute over the live uploads
+(tests/test_aggregates.py checks this against a plain pandas groupby).
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+METRICS = ['CGPA', 'Technical_Skills_Score', 'Soft_Skills_Score']
+SCALE = 10 ** 6  # fixed-point resolution for metric sums
+
+
+def _key(*parts):
+    return "|".join(str(p) for p in parts)
+
+
+def contribution(df, academic_year):
+    """What one scored upload adds to every aggregate table"""
+    # Same keys as the prediction store: missing values are 'Unknown', never 'nan'
+    profiles = (df['Profile_Name'].fillna('Unknown').astype(str)
+                if 'Profile_Name' in df.columns else pd.Series('Unknown', index=df.index))
+    branches = (df['Branch_Department'].fillna('Unknown').astype(str)
+                if 'Branch_Department' in df.columns else pd.Series('Unknown', index=df.index))
+
+    year_profile = {_key(academic_year, p): int(c) for p, c in profiles.value_counts().items()}
+    branch_profile = {_key(b, p): int(c)
+                      for (b, p), c in pd.crosstab(branches, profiles).stack().items() if c}
+
+    clusters = {}
+    frame = pd.DataFrame({'cluster': np.asarray(df['Cluster_ID'], dtype=np.int64)}, index=df.index)
+    for m in METRICS:
+        values = pd.to_numeric(df[m], errors='coerce') if m in df.columns else pd.Series(np.nan, index=df.index)
+        frame[f"{m}_n"] = values.notna().astype(np.int64)
+        frame[f"{m}_sum"] = np.rint(values.fillna(0).to_numpy(dtype=np.float64) * SCALE).astype(np.int64)
+    grouped = frame.groupby('cluster').sum()
+    sizes = frame.groupby('cluster').size()
+    for cid, row in grouped.iterrows():
+        clusters[str(int(cid))] = {'rows': int(sizes[cid]),
+                                   **{k: int(v) for k, v in row.items()}}
+
+    return {'academic_year': academic_year, 'rows': int(len(df)),
+            'year_profile': year_profile, 'branch_profile': branch_profile, 'clusters': clusters}
+
+
+class CohortAggregates:
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # one writer of the state file at a time
+        self.uploads = {}
+        self._clear_totals()
+        self._load()
+
+    def _clear_totals(self):
+        self.year_profile = {}
+        self.branch_profile = {}
+        self.clusters = {}
+
+    @staticmethod
+    def _apply(table, delta, sign):
+        for k, v in delta.items():
+            new = table.get(k, 0) + sign * v
+            if new:
+                table[k] = new
+            else:
+                table.pop(k, None)
+
+    def _apply_contribution(self, contrib, sign):
+        self._apply(self.year_profile, contrib['year_profile'], sign)
+        self._apply(self.branch_profile, contrib['branch_profile'], sign)
+        for cid, stats in contrib['clusters'].items():
+            table = self.clusters.setdefault(cid, {})
+            self._apply(table, stats, sign)
+            if not table.get('rows'):
+                self.clusters.pop(cid, None)
+
+    def has_upload(self, upload_id):
+        with self.lock:
+            return upload_id in self.uploads
+
+    def add_upload(self, upload_id, academic_year, df):
+        """Fold an upload in; an existing upload with the same id is replaced"""
+        contrib = contribution(df, academic_year)
+        with self.lock:
+            old = self.uploads.pop(upload_id, None)
+            if old:
+                self._apply_contribution(old, -1)
+            self._apply_contribution(contrib, +1)
+            self.uploads[upload_id] = contrib
+        self.save()
+
+    def remove_upload(self, upload_id):
+        with self.lock:
+            old = self.uploads.pop(upload_id, None)
+            if old:
+                self._apply_contribution(old, -1)
+        if old:
+            self.save()
+        return old is not None
+
+    def snapshot(self):
+        """Dashboard tables, O(#groups)"""
+        with self.lock:
+            years = sorted({k.split('|', 1)[0] for k in self.year_profile})
+            profiles = sorted({k.split('|', 1)[1] for k in self.year_profile})
+            chart_data = [
+                {'name': p, **{y: self.year_profile.get(_key(y, p), 0) for y in years}}
+                for p in profiles
+            ]
+            branch_rows = {}
+            for k, c in self.branch_profile.items():
+                branch, profile = k.split('|', 1)
+                branch_rows.setdefault(branch, {'name': branch})[profile] = c
+
+            clusters = {}
+            for cid, stats in self.clusters.items():
+                clusters[cid] = {'rows': stats.get('rows', 0)}
+                for m in METRICS:
+                    n = stats.get(f"{m}_n", 0)
+                    clusters[cid][f"mean_{m}"] = round(stats.get(f"{m}_sum", 0) / SCALE / n, 4) if n else None
+
+            return {
+                'uploads': len(self.uploads),
+                'rows': sum(u['rows'] for u in self.uploads.values()),
+                'years': years,
+                'year_profile': chart_data,
+                'branch_profile': [branch_rows[b] for b in sorted(branch_rows)],
+                'clusters': dict(sorted(clusters.items(), key=lambda kv: int(kv[0])))
+            }
+
+    def totals(self):
+        with self.lock:
+            return {'year_profile': dict(self.year_profile),
+                    'branch_profile': dict(self.branch_profile),
+                    'clusters': {k: dict(v) for k, v in self.clusters.items()}}
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                state = {'uploads': dict(self.uploads)}
+            try:
+                tmp_path = self.state_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                print(f"Aggregates save error: {e}")
+
+    def _load(self):
+        # Only per-upload contributions are persisted; totals are their exact sum
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            for upload_id, contrib in state.get('uploads', {}).items():
+                self._apply_contribution(contrib, +1)
+                self.uploads[upload_id] = contrib
+        except Exception as e:
+            print(f"Aggregates load error: {e}")
+            self.uploads = {}
+            self._clear_totals()
+
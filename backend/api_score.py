@@ -0,0 +1,130 @@
+"""
+API score calculator shared by /calculate/api and /calculate/api/batch.
+
+Everything is computed with NumPy array operations, so one student and a whole
+cohort go through exactly the same arithmetic.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_SCORE = 10.0
+
+# Thresholds are checked top-down against the rounded total
+LEVELS = [
+    (9.0, 'excellent',
+     "Outstanding profile! You have a competitive edge for top-tier roles and research positions."),
+    (7.0, 'good',
+     "Strong profile. You are well-prepared, but a few more projects or publications could boost your standing."),
+    (5.0, 'fair',
+     "Decent start. Focus on gaining more practical experience (internships) and improving academic performance."),
+    (float('-inf'), 'needs_improvement',
+     "Needs improvement. Prioritize improving your CGPA and actively seeking internships or skill certifications."),
+]
+
+LEVEL_NAMES = np.array([name for _, name, _ in LEVELS])
+FEEDBACK = {name: text for _, name, text in LEVELS}
+
+# Input field -> whether it is a whole number (int() in the single-row endpoint)
+INPUT_FIELDS = {
+    'cgpa': False,
+    'paid_internships': True,
+    'unpaid_internships': True,
+    'research_papers': True,
+    'certificates': True,
+}
+
+
+def round_like_python(values, decimals=2):
+    """np.round, but equal to Python's round() on every element
+
+    np.round scales by 10**decimals first, and the scaling error can push a
+    value sitting next to a half-way point the other way (np.round(0.025, 2) is
+    0.0, round(0.025, 2) is 0.03). Those rare near-ties go through round().
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if np.any(near_tie):
+        flat, flat_values = rounded.reshape(-1).copy(), values.reshape(-1)
+        for i in np.flatnonzero(near_tie):
+            flat[i] = round(float(flat_values[i]), decimals)
+        rounded = flat.reshape(values.shape)
+    return rounded
+
+
+def score_api(cgpa, paid_intern, unpaid_intern, research, certs):
+    """Vectorized score for arrays (or scalars) of inputs"""
+    cgpa = np.asarray(cgpa, dtype=np.float64)
+    paid_intern = np.asarray(paid_intern, dtype=np.float64)
+    unpaid_intern = np.asarray(unpaid_intern, dtype=np.float64)
+    research = np.asarray(research, dtype=np.float64)
+    certs = np.asarray(certs, dtype=np.float64)
+
+    # 1. CGPA (Max 2.0) - Weight 20%, CGPA 10 -> 2.0 points
+    cgpa_points = np.minimum(2.0, (cgpa / 10.0) * 2.0)
+
+    # 2. Internships (Max 4.0) - Weight 40%, Paid = 2 pts, Unpaid = 1 pt
+    intern_points = np.minimum(4.0, (paid_intern * 2.0) + (unpaid_intern * 1.0))
+
+    # 3. Research (Max 2.0) - Weight 20%, 0.5 pts each
+    research_points = np.minimum(2.0, research * 0.5)
+
+    # 4. Certificates (Max 2.0) - Weight 20%, 0.1 pts each
+    cert_points = np.minimum(2.0, certs * 0.1)
+
+    total = round_like_python(cgpa_points + intern_points + research_points + cert_points)
+
+    thresholds = [threshold for threshold, _, _ in LEVELS]
+    level_idx = np.select([total >= t for t in thresholds[:-1]],
+                          list(range(len(thresholds) - 1)), default=len(thresholds) - 1)
+
+    return {
+        'total_score': total,
+        'level': LEVEL_NAMES[level_idx],
+        'level_code': level_idx,
+        'cgpa_points': round_like_python(cgpa_points),
+        'internship_points': round_like_python(intern_points),
+        'research_points': round_like_python(research_points),
+        'cert_points': round_like_python(cert_points)
+    }
+
+
+def coerce_inputs(df):
+    """Pull the calculator inputs out of a dataframe.
+
+    Returns (inputs dict of float arrays, invalid row mask). Missing columns
+    default to 0 like the single-row endpoint; whole-number fields are
+    truncated like int().
+    """
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    invalid = np.zeros(len(df), dtype=bool)
+    inputs = {}
+
+    for field, whole in INPUT_FIELDS.items():
+        if field not in columns:
+            inputs[field] = np.zeros(len(df))
+            continue
+        raw = df[columns[field]]
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        # Blank cells fall back to 0, anything else unparsable is a row error
+        invalid |= np.isnan(values) & raw.notna().to_numpy()
+        values = np.nan_to_num(values, nan=0.0)
+        inputs[field] = np.trunc(values) if whole else values
+
+    return inputs, invalid
+
+
+def summarize(scores, valid):
+    """Score histogram (1-point bins) and level counts for the valid rows"""
+    totals = scores['total_score'][valid]
+    counts, edges = np.histogram(np.clip(totals, 0, MAX_SCORE), bins=np.arange(0, MAX_SCORE + 1))
+    level_counts = np.bincount(scores['level_code'][valid], minlength=len(LEVEL_NAMES))
+    return {
+        'histogram': [
+            {'range': f"{int(lo)}-{int(hi)}", 'count': int(c)}
+            for lo, hi, c in zip(edges[:-1], edges[1:], counts)
+        ],
+        'level_distribution': {str(n): int(c) for n, c in zip(LEVEL_NAMES, level_counts) if c},
+        'mean_score': round(float(totals.mean()), 2) if len(totals) else 0.0
+    }
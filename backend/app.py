@@ -1,5 +1,5 @@
 print("Starting app.py...")
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, g, Response
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -10,24 +10,109 @@ from datetime import datetime
 import google.generativeai as genai
 import json
 from dotenv import load_dotenv
+import atexit
 import base64
+import hashlib
 import re
+import tempfile
+
+from similarity import load_similarity_index
+from result_cache import ResultCache, RowCache, file_key
+from roadmap_pool import RoadmapPool, RoadmapWarmer, profile_bucket, template_roadmap
+from llm_gateway import LLMGateway, GatewayRejected
+from fake_llm import FakeGenerativeModel
+from drift import DriftMonitor
+from prediction_store import PredictionStore, new_upload_id, DIMENSIONS, METRIC_COLUMNS
+from aggregates import CohortAggregates
+from validation import ValidationSchema
+from parallel_scoring import ParallelScorer
+from native_threads import NativeThreads
+from profiling import ProfileStore, to_collapsed, to_speedscope
+import tracing
+from tracing import span, TraceWriter
+from http_encoding import FastJSONProvider, compress_response
+from model_registry import ModelRegistry, UploadFeatures, preprocess_key
+from online_clusters import ONLINE_PREFIX, OnlineClusterUpdater
+from readiness import Readiness, validate_artifacts, fallback_warnings, pca_warnings, synthetic_frame
+from chat_sessions import ChatSessionStore
+from result_writers import OUTPUT_FORMATS, write_result
+import threading
+from api_score import score_api, coerce_inputs, summarize, FEEDBACK, MAX_SCORE
 
 # Load .env from parent directory
 dotenv_path = os.path.join(os.path.dirname(__file__), '..', '.env')
 load_dotenv(dotenv_path)
 
 app = Flask(__name__)
-CORS(app)
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['Server-Timing', 'X-Request-Id', 'X-Profile-Id', 'Content-Disposition',
+                          'X-Upload-Id', 'X-Academic-Year', 'X-Distribution', 'X-Validation'])
 
 # --- Configuration ---
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'models')
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "models/gemma-3-1b-it")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "fake" = local load-test stand-in
+LLM_AVAILABLE = bool(GEMINI_API_KEY) or LLM_BACKEND == "fake"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.dirname(__file__), 'cache'))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+ROW_CACHE_MAX_ROWS = int(os.getenv("ROW_CACHE_MAX_ROWS", "2000000"))
+VALIDATION_MAX_ERROR_RATE = float(os.getenv("VALIDATION_MAX_ERROR_RATE", "0.1"))
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "0"))  # 0 = one per CPU
+PARALLEL_MIN_ROWS = int(os.getenv("PARALLEL_MIN_ROWS", "200000"))
+SCORING_CHUNK_ROWS = int(os.getenv("SCORING_CHUNK_ROWS", "50000"))
+NATIVE_THREAD_CONTROL = os.getenv("NATIVE_THREAD_CONTROL", "1") == "1"
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "1"))
+BATCH_INFERENCE_THREADS = int(os.getenv("BATCH_INFERENCE_THREADS", "0"))  # 0 = one per CPU
+BATCH_THREADS_MIN_ROWS = int(os.getenv("BATCH_THREADS_MIN_ROWS", "50000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(RESULT_CACHE_DIR, 'profiles'))
+PROFILES_PER_MINUTE = int(os.getenv("PROFILES_PER_MINUTE", "6"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")  # if set, X-Profile and /profiles* must carry it
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH", os.path.join(RESULT_CACHE_DIR, 'traces.jsonl'))
+TRACE_LOG_MAX_MB = int(os.getenv("TRACE_LOG_MAX_MB", "50"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+MODEL_VERSIONS_DIR = os.getenv("MODEL_VERSIONS_DIR", os.path.join(MODEL_PATH, 'versions'))
+SHADOW_MODELS = os.getenv("SHADOW_MODELS", "")  # comma-separated version names
+ONLINE_LEARNING = os.getenv("ONLINE_LEARNING", "0") == "1"
+ONLINE_DECAY = float(os.getenv("ONLINE_DECAY", "0.98"))
+ONLINE_PRIOR_COUNT = float(os.getenv("ONLINE_PRIOR_COUNT", "1000"))
+ONLINE_MOVE_THRESHOLD = float(os.getenv("ONLINE_MOVE_THRESHOLD", "0.25"))
+ONLINE_MIN_ROWS = int(os.getenv("ONLINE_MIN_ROWS", "5000"))
+ONLINE_KEEP_VERSIONS = int(os.getenv("ONLINE_KEEP_VERSIONS", "5"))
+ONLINE_AUTO_SHADOW = os.getenv("ONLINE_AUTO_SHADOW", "1") == "1"  # shadow-score the newest online version
+WARMUP_ROUNDS = int(os.getenv("WARMUP_ROUNDS", "3"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+CHAT_IDLE_TTL_MINUTES = float(os.getenv("CHAT_IDLE_TTL_MINUTES", "30"))
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "1500"))
+CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+PREDICTION_STORE_DIR = os.getenv("PREDICTION_STORE_DIR", os.path.join(os.path.dirname(__file__), 'store'))
+DRIFT_STATE_DIR = os.getenv("DRIFT_STATE_DIR", os.path.join(os.path.dirname(__file__), 'drift'))
+ROADMAP_POOL_TTL_HOURS = float(os.getenv("ROADMAP_POOL_TTL_HOURS", "168"))
+ROADMAP_WARM_CONCURRENCY = int(os.getenv("ROADMAP_WARM_CONCURRENCY", "2"))
+ROADMAP_WARM_CALLS_PER_MINUTE = float(os.getenv("ROADMAP_WARM_CALLS_PER_MINUTE", "30"))
+ROADMAP_WARM_INTERVAL_MINUTES = float(os.getenv("ROADMAP_WARM_INTERVAL_MINUTES", "0"))  # 0 = startup only
 
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# One gateway for every outbound LLM call (roadmaps, warmer and chat)
+llm_gateway = LLMGateway(
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "16")),
+    rate_per_second=float(os.getenv("LLM_RATE_PER_SECOND", "2")),
+    burst=int(os.getenv("LLM_BURST", "4")),
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+    default_timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+)
+
+
+def get_llm_model():
+    if LLM_BACKEND == "fake":
+        return FakeGenerativeModel(GEMINI_MODEL_NAME)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
 
 # --- Constants (Must match training) ---
 CATEGORICAL_COLS = [
@@ -50,15 +135,51 @@ scaler = None
 label_encoders = None
 pca_model = None
 cluster_info = None
+similarity_index = None
+model_version = None
+row_cache = None
+drift_monitor = None
+live_preprocess_key = None
+readiness = Readiness()
+validation_schema = ValidationSchema()
+
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024)
+roadmap_pool = RoadmapPool(os.path.join(RESULT_CACHE_DIR, 'roadmaps.sqlite'),
+                           ROADMAP_POOL_TTL_HOURS * 3600)
+roadmap_warmer = None
+prediction_store = PredictionStore(PREDICTION_STORE_DIR)
+chat_sessions = ChatSessionStore(CHAT_MAX_SESSIONS, CHAT_IDLE_TTL_MINUTES * 60,
+                                 CHAT_TOKEN_BUDGET, CHAT_RECENT_TURNS)
+trace_writer = TraceWriter(TRACE_LOG_PATH, max_bytes=TRACE_LOG_MAX_MB * 1024 * 1024)
+profile_store = ProfileStore(PROFILE_DIR, interval_ms=PROFILE_INTERVAL_MS,
+                             per_minute=PROFILES_PER_MINUTE, admin_token=PROFILE_ADMIN_TOKEN)
+parallel_scorer = ParallelScorer(SCORING_WORKERS or None, PARALLEL_MIN_ROWS, SCORING_CHUNK_ROWS)
+# One BLAS/OpenMP thread per request, wider only for big serial batches (see native_threads.py)
+native_threads = NativeThreads(INFERENCE_THREADS, BATCH_INFERENCE_THREADS or None,
+                               BATCH_THREADS_MIN_ROWS, enabled=NATIVE_THREAD_CONTROL)
+native_threads.pin()
+cohort_aggregates = CohortAggregates(os.path.join(PREDICTION_STORE_DIR, '_aggregates.json'))
+
+
+def compute_model_version():
+    """Short hash of the artifacts that decide a row's cluster"""
+    h = hashlib.sha256()
+    for name in ['kmeans_model.pkl', 'scaler.pkl', 'label_encoders.pkl', 'cluster_info.pkl']:
+        path = os.path.join(MODEL_PATH, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:12]
 
 
 def load_models():
-    global kmeans_model, scaler, pca_model, cluster_info, label_encoders
+    global kmeans_model, scaler, pca_model, cluster_info, label_encoders, similarity_index
+    global model_version, row_cache, drift_monitor, validation_schema, live_preprocess_key
     try:
         print("Loading updated models...")
 
         with open(os.path.join(MODEL_PATH, 'kmeans_model.pkl'), 'rb') as f:
-            kmeans_model = pickle.load(f)
+            kmeans_model = native_threads.prepare(pickle.load(f))
 
         with open(os.path.join(MODEL_PATH, 'scaler.pkl'), 'rb') as f:
             scaler = pickle.load(f)
@@ -77,11 +198,35 @@ def load_models():
         else:
             label_encoders = {}
 
-        print("Models loaded successfully!")
+        # Allowed categories for upload validation come from the fitted encoders
+        validation_schema = ValidationSchema(label_encoders)
+
+        # Nearest-alumni index is built offline (see similarity.py) and optional
+        similarity_index = load_similarity_index()
+
+        # Cached results are only valid for the exact artifacts they were scored with
+        model_version = compute_model_version()
+        live_preprocess_key = preprocess_key(MODEL_PATH)
+        row_cache = RowCache(RESULT_CACHE_DIR, model_version,
+                             NUMERICAL_COLS + CATEGORICAL_COLS, ROW_CACHE_MAX_ROWS)
+
+        # Compare live traffic against the statistics the scaler/encoders were fitted on
+        drift_monitor = DriftMonitor(os.path.join(DRIFT_STATE_DIR, f'drift-{model_version}.json'),
+                                     NUMERICAL_COLS, CATEGORICAL_COLS, scaler, label_encoders)
+
+        # Readiness stays false if the artifacts disagree with each other or with our columns
+        readiness.set_artifacts(
+            validate_artifacts(kmeans_model, scaler, pca_model, label_encoders, cluster_info,
+                               NUMERICAL_COLS, CATEGORICAL_COLS),
+            fallback_warnings(kmeans_model, label_encoders, cluster_info, CATEGORICAL_COLS)
+            + pca_warnings(pca_model, NUMERICAL_COLS, CATEGORICAL_COLS))
+
+        print(f"Models loaded successfully! (version {model_version})")
 
     except Exception as e:
         print(f"Error loading models: {e}")
         cluster_info = {}
+        readiness.set_artifacts([f"Model load failed: {e}"])
 
         with open('backend_error.log', 'a') as f:
             f.write(f"Model Load Error: {str(e)}\n")
@@ -90,56 +235,179 @@ def load_models():
 load_models()
 
 
+# --- Per-request timing: Server-Timing / X-Request-Id headers and the JSONL trace log ---
+@app.before_request
+def start_trace():
+    tracing.begin(request.method, request.path, request.headers.get('X-Request-Id'))
+
+
+@app.after_request
+def finish_trace(response):
+    trace = tracing.end()
+    if trace is not None:
+        response.headers['X-Request-Id'] = trace.request_id
+        response.headers['Server-Timing'] = trace.server_timing()
+        response.headers['Timing-Allow-Origin'] = '*'
+        trace_writer.submit(trace.record(response.status_code))
+    return response
+
+
+@app.teardown_request
+def abandon_trace(exc):
+    tracing.end()
+
+
+# --- Opt-in request profiling (X-Profile header or admin toggle) ---
+@app.before_request
+def start_profiling():
+    header = request.headers.get('X-Profile')
+    if header in ('0', 'false'):
+        header = None
+    if profile_store.should_profile(header):
+        g.profiler = profile_store.start()
+
+
+@app.after_request
+def finish_profiling(response):
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        response.headers['X-Profile-Id'] = profile_store.finish(
+            sampler, request.method, request.path, response.status_code)
+    return response
+
+
+@app.teardown_request
+def abandon_profiling(exc):
+    # Unhandled exceptions skip after_request; still stop the sampler thread
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+
+
+# after_request hooks run in reverse registration order: registered after the trace and
+# profiling hooks, this runs before them, so its span lands in Server-Timing
+@app.after_request
+def compress(response):
+    with span('compress'):
+        return compress_response(response, request.headers.get('Accept-Encoding'), COMPRESS_MIN_BYTES)
+
+
+# Prediction endpoints cannot give a correct answer with broken artifacts
+@app.before_request
+def reject_when_failed():
+    if readiness.failed and request.path.startswith('/predict'):
+        return jsonify({'error': 'Models are not usable', 'problems': readiness.report()['problems']}), 503
+
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    return jsonify({'status': 'alive'})
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    report = readiness.report()
+    return jsonify(report), 200 if report['ready'] else 503
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
+    state = readiness.report()
     return jsonify({
-        'status': 'healthy',
+        'status': 'healthy' if state['ready'] else state['state'],
+        'ready': state['ready'],
+        'problems': state['problems'],
         'models_loaded': {
             'kmeans': kmeans_model is not None,
             'pca': pca_model is not None,
-            'scaler': scaler is not None
+            'scaler': scaler is not None,
+            'similarity_index': similarity_index is not None
         },
-        'version': 'multi-year-v1'
+        'version': 'multi-year-v1',
+        'model_version': model_version,
+        'native_threads': native_threads.info()
     })
 
 
-def preprocess_features(df):
-    """Preprocess dataframe to match PCA model input"""
+@app.route('/monitor/drift', methods=['GET'])
+def drift_report():
+    if drift_monitor is None:
+        return jsonify({'error': 'Drift monitor unavailable (models not loaded)'}), 503
+    return jsonify(drift_monitor.report())
+
+
+@app.route('/monitor/drift/reset', methods=['POST'])
+def drift_reset():
+    if drift_monitor is None:
+        return jsonify({'error': 'Drift monitor unavailable (models not loaded)'}), 503
+    drift_monitor.reset()
+    drift_monitor.save()
+    return jsonify({'success': True})
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'results': result_cache.stats(),
+        'rows': row_cache.stats() if row_cache else {},
+        'scoring': parallel_scorer.stats()
+    })
+
+
+def preprocess_features(df, observe=True, drift_out=None, bundle=None):
+    """Preprocess dataframe to match PCA model input
+
+    With drift_out (a list) the batch's drift summary is appended there instead of
+    being merged into the monitor; forked scoring workers hand it back to the parent.
+    A registry bundle swaps in that version's scaler and encoders (shadow scoring).
+    """
+    encoders = bundle.label_encoders if bundle is not None else label_encoders
+    feature_scaler = bundle.scaler if bundle is not None else scaler
 
     df.columns = [c.strip() for c in df.columns]
 
     # Ensure ALL required columns exist even for missing keys
     for col in NUMERICAL_COLS:
         if col not in df.columns:
-            df[col] = 0
-        df[col] = df[col].fillna(0)
+            df[col] = np.nan
 
+    # 🔥 VERY IMPORTANT FIX:
+    # Convert df[NUMERICAL_COLS] to numeric before scaling
+    df[NUMERICAL_COLS] = df[NUMERICAL_COLS].apply(pd.to_numeric, errors='coerce')
+    numeric_raw = df[NUMERICAL_COLS].to_numpy(dtype=np.float64)  # NaN = missing / unparsable
+    df[NUMERICAL_COLS] = df[NUMERICAL_COLS].fillna(0)
+
+    categorical_obs = {}
     for col in CATEGORICAL_COLS:
         if col not in df.columns:
-            df[col] = "Unknown"
-        df[col] = df[col].fillna("Unknown")
-
-        # Apply encoders if available
-        if label_encoders and col in label_encoders:
-            le = label_encoders[col]
-            df[col] = df[col].astype(str).apply(
-                lambda x: x if x in le.classes_ else le.classes_[0]
-            )
-            df[col] = le.transform(df[col])
+            df[col] = np.nan
+        missing = df[col].isna().to_numpy()
+        values = df[col].fillna("Unknown").astype(str)
+
+        # Apply encoders if available (unseen categories map to the first class)
+        if encoders and col in encoders:
+            le = encoders[col]
+            known = values.isin(le.classes_).to_numpy()
+            df[col] = le.transform(values.where(known, le.classes_[0]))
+            unseen = ~known & ~missing
         else:
-            df[col] = df[col].astype(str).astype("category").cat.codes
+            df[col] = values.astype("category").cat.codes
+            unseen = np.zeros(len(df), dtype=bool)
+        categorical_obs[col] = (missing, unseen, values.to_numpy())
 
-    # 🔥 VERY IMPORTANT FIX:
-    # Convert df[NUMERICAL_COLS] to numeric before scaling
-    df[NUMERICAL_COLS] = df[NUMERICAL_COLS].apply(pd.to_numeric, errors='coerce').fillna(0)
+    if observe and drift_monitor is not None:
+        if drift_out is not None:
+            drift_out.append(drift_monitor.summarize(numeric_raw, categorical_obs))
+        else:
+            drift_monitor.observe(numeric_raw, categorical_obs)
 
     # 🔥 Now scale safely (scaler expects 2D numeric array)
     try:
-        df[NUMERICAL_COLS] = scaler.transform(df[NUMERICAL_COLS].values)
+        df[NUMERICAL_COLS] = feature_scaler.transform(df[NUMERICAL_COLS].values)
     except Exception as e:
-        # Fallback if scaler fails (e.g. wrong shape), though it shouldn't if cols match
+        # Unscaled features would silently land in the wrong clusters, so fail loudly
         print(f"Scaler Error: {e}")
-        pass
+        raise ValueError(f"Feature scaling failed: {e}")
 
     # Construct final array (ensure correct column order)
     final_df = df[NUMERICAL_COLS + CATEGORICAL_COLS]
@@ -148,17 +416,150 @@ def preprocess_features(df):
     return final_df
 
 
-def process_student_dataframe(df):
-    """Core logic to process a dataframe and add predictions"""
-    # Preprocess
-    df_processed = preprocess_features(df.copy())
-    
-    # Predict
+def academic_year_label(value, default):
+    """Sanitize a user-supplied year label so it is safe as a partition directory name"""
+    label = re.sub(r'[^A-Za-z0-9_.-]', '-', str(value or '').strip())
+    return label or default
+
+
+def delete_upload(upload_id):
+    """Remove an upload from the store and subtract it from the aggregates"""
+    removed_rows = prediction_store.delete_upload(upload_id)
+    removed_aggregates = cohort_aggregates.remove_upload(upload_id)
+    return removed_rows or removed_aggregates
+
+
+def store_predictions(df, academic_year, replace_upload=None):
+    """Append scored rows to the columnar store and aggregates; never fails the request"""
+    upload_id = new_upload_id()
+    try:
+        if replace_upload:
+            delete_upload(replace_upload)
+        prediction_store.append(df, academic_year, upload_id)
+        cohort_aggregates.add_upload(upload_id, academic_year, df)
+    except Exception as e:
+        print(f"Prediction Store Error: {e}")
+        return None
+    return upload_id
+
+
+def predict_clusters(df, drift_out=None, observe=True, batch=False, features_out=None):
+    """Preprocess a raw dataframe and return KMeans cluster ids
+
+    batch=True lets a large frame use the wider native thread pool; forked
+    workers and single requests keep one thread. With features_out (a list) the
+    feature matrix is appended there for shadow scoring to reuse.
+    """
+    with span('preprocess'):
+        df_processed = preprocess_features(df.copy(), observe=observe, drift_out=drift_out)
+
     # Apply same fix: Use ascontiguousarray with float32 for KMeans
     X_full = np.ascontiguousarray(df_processed.values, dtype=np.float32)
-    
-    clusters = kmeans_model.predict(X_full)
-    
+    if features_out is not None:
+        features_out.append(X_full)
+
+    model = native_threads.for_rows(kmeans_model, len(X_full)) if batch else kmeans_model
+    with span('predict'):
+        return model.predict(X_full)
+
+
+def score_chunk(chunk):
+    """Runs in a forked worker: cluster ids plus the chunk's drift summary"""
+    summaries = []
+    clusters = predict_clusters(chunk, drift_out=summaries)
+    return clusters.astype(np.int32), (summaries[0] if summaries else None)
+
+
+def score_rows(df, features_out=None):
+    """Cluster ids for df; large inputs are split across worker processes
+
+    features_out only receives the matrix on the serial path; forked workers don't send it back.
+    """
+    if not parallel_scorer.should_parallelize(len(df)):
+        return predict_clusters(df, batch=True, features_out=features_out)
+
+    with span('predict'):
+        results = parallel_scorer.map_chunks(df, score_chunk)
+    if drift_monitor is not None:
+        for i, (_, summary) in enumerate(results):
+            if summary is not None:
+                drift_monitor.merge(summary, new_batch=(i == 0))
+    return np.concatenate([clusters for clusters, _ in results])
+
+
+def shadow_features(df, bundle=None):
+    """Feature matrix for shadow scoring; never feeds the drift monitor"""
+    df_processed = preprocess_features(df.copy(), observe=False, bundle=bundle)
+    return np.ascontiguousarray(df_processed.values, dtype=np.float32)
+
+
+model_registry = ModelRegistry(MODEL_VERSIONS_DIR, shadow_features, SHADOW_MODELS.split(','),
+                               prepare_model=native_threads.prepare)
+
+# Optional: fold answered uploads into a shadow copy of the centroids and publish
+# new registry versions when they drift (never swapped in as the live model)
+online_updater = None
+
+
+def publish_online_version(name):
+    # Version names carry timestamps, so they can't be listed in SHADOW_MODELS ahead of time
+    model_registry.add(name)
+    if ONLINE_AUTO_SHADOW:
+        model_registry.shadow_newest(ONLINE_PREFIX)
+
+
+if ONLINE_LEARNING and kmeans_model is not None:
+    online_updater = OnlineClusterUpdater(
+        kmeans_model, MODEL_PATH, MODEL_VERSIONS_DIR,
+        decay=ONLINE_DECAY, prior_count=ONLINE_PRIOR_COUNT, move_threshold=ONLINE_MOVE_THRESHOLD,
+        min_rows=ONLINE_MIN_ROWS, keep_versions=ONLINE_KEEP_VERSIONS,
+        on_publish=publish_online_version, on_prune=model_registry.remove)
+    if ONLINE_AUTO_SHADOW:
+        model_registry.shadow_newest(ONLINE_PREFIX)  # one published by an earlier run
+
+
+def queue_shadow_scoring(df, clusters, features=None):
+    """Shadow-score this upload (and feed the online centroids) once the response has gone out"""
+    if model_registry.active_shadows() or online_updater is not None:
+        g.setdefault('shadow_jobs', []).append((df, clusters, features))
+
+
+def run_shadow_jobs(jobs):
+    for df, clusters, features in jobs:
+        # One live feature matrix per upload for both consumers, reusing what scoring built
+        features = features or UploadFeatures(df, shadow_features)
+        model_registry.submit(df, clusters, cluster_info, live_preprocess_key, features)
+        if online_updater is not None:
+            online_updater.submit(features)
+
+
+@app.after_request
+def submit_shadow_jobs(response):
+    jobs = g.pop('shadow_jobs', None)
+    if jobs:
+        response.call_on_close(lambda: run_shadow_jobs(jobs))
+    return response
+
+
+def process_student_dataframe(df, use_row_cache=False, features_out=None):
+    """Core logic to process a dataframe and add predictions
+
+    With features_out (a list) an UploadFeatures holding whatever feature matrix
+    scoring built is appended, for queue_shadow_scoring.
+    """
+    scored, covered = [], None
+    if use_row_cache and row_cache is not None:
+        # Only rows we have never seen under this model version get scored
+        with span('row_cache'):
+            hashes = row_cache.hash_rows(df)
+            clusters, missing = row_cache.lookup(hashes)
+        if missing.any():
+            clusters[missing] = score_rows(df[missing], features_out=scored)
+            row_cache.store(hashes[missing], clusters[missing])
+        covered = missing
+    else:
+        clusters = score_rows(df, features_out=scored)
+
     # Enrich DataFrame
     df['Cluster_ID'] = clusters
     df['Profile_Name'] = [
@@ -169,7 +570,9 @@ def process_student_dataframe(df):
         ", ".join(cluster_info.get(int(c), {}).get('roles', [])) 
         for c in clusters
     ]
-    
+
+    if features_out is not None:
+        features_out.append(UploadFeatures(df, shadow_features, scored[0] if scored else None, covered))
     return df, clusters
 
 
@@ -204,41 +607,44 @@ def get_embeddings(X):
 
 
 
+def build_individual_input(data):
+    """Map the individual form payload onto the model columns"""
+    return {
+        'Age': data.get('age', 0),
+        'CGPA': data.get('cgpa', 0),
+        'Number_of_Backlogs': data.get('backlogs', 0),
+        'Number_of_Internships': data.get('internships', 0),
+        'Number_of_Publications': data.get('research_papers', 0),
+        'Number_of_Projects': data.get('projects', 0),
+        'Number_of_Certification_Courses': data.get('certifications', 0),
+        'Technical_Skills_Score': data.get('technical_skills', 1),
+        'Number_of_Hackathons': data.get('hackathons', 0),
+        'Soft_Skills_Score': data.get('soft_skills', 1),
+
+        'Gender': data.get('gender', 'Unknown'),
+        'Branch_Department': data.get('branch', 'Unknown'),
+        'Type_of_Internships': data.get('internship_type', 'Unknown'),
+        'Co_curricular_Activities': data.get('cocurricular', 'Unknown'),
+        'Leadership_Roles': data.get('leadership', 'Unknown'),
+        'Entrepreneur_Cell_Member': data.get('entrepreneur_cell', 'Unknown'),
+        'Family_Business_Background': data.get('family_business', 'Unknown')
+    }
+
+
 @app.route('/predict/individual', methods=['POST'])
 def predict_individual():
-    with open("verify_execution.txt", "a") as f:
-        f.write(f"Executing predict_individual at {datetime.now()}\n")
-    
     try:
-        data = request.json
+        with span('parse'):
+            data = request.json
+
+            input_data = build_individual_input(data)
 
-        # Prepare consistent input dictionary
-        input_data = {
-            'Age': data.get('age', 0),
-            'CGPA': data.get('cgpa', 0),
-            'Number_of_Backlogs': data.get('backlogs', 0),
-            'Number_of_Internships': data.get('internships', 0),
-            'Number_of_Publications': data.get('research_papers', 0),
-            'Number_of_Projects': data.get('projects', 0),
-            'Number_of_Certification_Courses': data.get('certifications', 0),
-            'Technical_Skills_Score': data.get('technical_skills', 1),
-            'Number_of_Hackathons': data.get('hackathons', 0),
-            'Soft_Skills_Score': data.get('soft_skills', 1),
-
-            'Gender': data.get('gender', 'Unknown'),
-            'Branch_Department': data.get('branch', 'Unknown'),
-            'Type_of_Internships': data.get('internship_type', 'Unknown'),
-            'Co_curricular_Activities': data.get('cocurricular', 'Unknown'),
-            'Leadership_Roles': data.get('leadership', 'Unknown'),
-            'Entrepreneur_Cell_Member': data.get('entrepreneur_cell', 'Unknown'),
-            'Family_Business_Background': data.get('family_business', 'Unknown')
-        }
-
-        # Convert into DF
-        df_input = pd.DataFrame([input_data])
+            # Convert into DF
+            df_input = pd.DataFrame([input_data])
 
         # Preprocess - now returns DataFrame with correct columns
-        df_processed = preprocess_features(df_input)
+        with span('preprocess'):
+            df_processed = preprocess_features(df_input)
         
         # Extract ONLY numerical columns for PCA (first 10 cols)
         # Extract ONLY numerical columns for PCA (first 10 cols)
@@ -253,7 +659,8 @@ def predict_individual():
         
         try:
              # Try predicting with full features
-             cluster_id = int(kmeans_model.predict(X_full)[0])
+             with span('predict'):
+                 cluster_id = int(kmeans_model.predict(X_full)[0])
         except Exception as e:
              print(f"KMeans Full Feature Error: {e}")
              # Detailed error for debugging
@@ -266,24 +673,110 @@ def predict_individual():
         if cluster_info and isinstance(cluster_info, dict):
             info = cluster_info.get(cluster_id, {})
 
-        # Generate roadmap
-        if GEMINI_API_KEY:
-            roadmap = generate_roadmap(data, info.get('name', ''), info.get('roles'))
+        # Generate roadmap (pre-warmed pool first, LLM only on a miss)
+        if LLM_AVAILABLE:
+            with span('llm'):
+                roadmap = roadmap_pool.get(model_version, cluster_id, data)
+                if roadmap is None:
+                    roadmap = generate_roadmap(data, info.get('name', ''), info.get('roles'), cluster_id)
         else:
             roadmap = "Gemini API Key missing."
 
+        with span('serialize'):
+            return jsonify({
+                'cluster_id': cluster_id,
+                'profile_name': info.get('name', f'Cluster {cluster_id}'),
+                'suggested_roles': info.get('roles', []),
+                'description': info.get('description', ""),
+                'roadmap': roadmap
+            })
+
+
+    except Exception as e:
+        print(f"Individual Error: {e}")
+        return jsonify({'error': f"An error occurred: {str(e)}"}), 500
+
+
+@app.route('/predict/similar', methods=['POST'])
+def predict_similar():
+    """Return the k most similar historical students for an individual profile"""
+    try:
+        if similarity_index is None:
+            return jsonify({'error': 'Similarity index not built. Run similarity.py first.'}), 503
+
+        data = request.json
+        k = max(1, min(int(data.get('k', 5)), 50))
+        nprobe = data.get('nprobe')
+        if nprobe is not None:
+            try:
+                nprobe = int(nprobe)
+            except (TypeError, ValueError):
+                nprobe = 0
+            if not 1 <= nprobe <= similarity_index.n_lists:
+                return jsonify({'error': f'nprobe must be an integer between 1 and {similarity_index.n_lists}'}), 400
+
+        df_processed = preprocess_features(pd.DataFrame([build_individual_input(data)]))
+        X_full = np.ascontiguousarray(df_processed.values, dtype=np.float32)
+        cluster_id = int(kmeans_model.predict(X_full)[0])
+
+        positions, distances = similarity_index.search(
+            X_full[0], k=k, nprobe=nprobe
+        )
+        info = (cluster_info or {}).get(cluster_id, {})
+
         return jsonify({
+            'success': True,
             'cluster_id': cluster_id,
             'profile_name': info.get('name', f'Cluster {cluster_id}'),
-            'suggested_roles': info.get('roles', []),
-            'description': info.get('description', ""),
-            'roadmap': roadmap
+            'neighbours': similarity_index.describe(positions, distances, cluster_info)
         })
 
-
     except Exception as e:
-        print(f"Individual Error: {e}")
-        return jsonify({'error': f"An error occurred: {str(e)}"}), 500
+        print(f"Similarity Error: {e}")
+        return jsonify({'error': f"Similarity search failed: {str(e)}"}), 500
+
+
+def write_result_file(df, output_format):
+    """Scored frame -> temp file in the requested format, written chunk by chunk"""
+    fd, path = tempfile.mkstemp(suffix=f'.{output_format}')
+    os.close(fd)
+    try:
+        return write_result(df, path, output_format)
+    except Exception:
+        os.remove(path)
+        raise
+
+
+def stream_result_file(path, block=1 << 20):
+    """Yield a result file in blocks and delete it afterwards (also if the client goes away)"""
+    try:
+        with open(path, 'rb') as f:
+            for data in iter(lambda: f.read(block), b''):
+                yield data
+    finally:
+        os.remove(path)
+
+
+def batch_attachment(payload, body=None, size=None):
+    """Scored file as a raw download; the JSON summary fields travel in headers
+
+    body is the file's bytes or an iterable of blocks to stream; by default it is
+    decoded from the payload's base64.
+    """
+    if body is None:
+        body = base64.b64decode(payload['file_base64'])
+    validation = payload.get('validation') or {}
+    extension = os.path.splitext(payload['filename'])[1].lstrip('.')
+    response = Response(body, mimetype=OUTPUT_FORMATS.get(extension, 'text/csv'))
+    if size is not None:
+        response.headers['Content-Length'] = str(size)
+    response.headers['Content-Disposition'] = f"attachment; filename={payload['filename']}"
+    response.headers['X-Upload-Id'] = payload.get('upload_id') or ''
+    response.headers['X-Academic-Year'] = payload.get('academic_year') or ''
+    response.headers['X-Distribution'] = json.dumps(payload.get('distribution', {}))
+    response.headers['X-Validation'] = json.dumps({k: validation.get(k) for k in
+                                                   ('rows', 'rows_with_errors', 'error_rate')})
+    return response
 
 
 @app.route('/predict/batch', methods=['POST'])
@@ -297,34 +790,89 @@ def predict_batch():
             return jsonify({'error': 'No selected file'}), 400
 
         if file:
-            # Read file
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(file)
-            elif file.filename.endswith(('.xls', '.xlsx')):
-                df = pd.read_excel(file, engine='openpyxl')
-            else:
+            if not file.filename.endswith(('.csv', '.xls', '.xlsx')):
                 return jsonify({'error': 'Invalid file format. Use CSV or Excel'}), 400
 
+            # delivery=attachment returns the file bytes directly instead of base64 inside JSON
+            as_attachment = (request.args.get('delivery') or request.form.get('delivery')) == 'attachment'
+            output_format = (request.args.get('output_format') or request.form.get('output_format')
+                             or 'csv').lower()
+            if output_format not in OUTPUT_FORMATS:
+                return jsonify({'error': f"Invalid output_format. Use one of: {', '.join(OUTPUT_FORMATS)}"}), 400
+
+            # Same bytes + same model version (+ same output format) -> same answer
+            raw = file.read()
+            scope = 'batch' if output_format == 'csv' else f'batch-{output_format}'
+            cache_key = file_key(raw, model_version, scope, os.path.splitext(file.filename)[1])
+            cached = result_cache.get(cache_key, len(raw))
+            replace_upload = request.form.get('replace_upload')
+            # A cached answer whose upload was since deleted must be re-scored and re-stored
+            upload_gone = cached is not None and cached.get('upload_id') and \
+                not cohort_aggregates.has_upload(cached['upload_id'])
+            if cached is not None and not upload_gone and not replace_upload:
+                return batch_attachment(cached) if as_attachment else jsonify(cached)
+
+            # Read file
+            with span('parse'):
+                if file.filename.endswith('.csv'):
+                    df = pd.read_csv(BytesIO(raw))
+                else:
+                    df = pd.read_excel(BytesIO(raw), engine='openpyxl')
+
+            # Reject garbage before spending any time scoring it
+            with span('validate'):
+                validation = validation_schema.validate(df, VALIDATION_MAX_ERROR_RATE)
+            if validation['aborted']:
+                return jsonify({'error': 'Upload failed validation', 'validation': validation}), 422
+
             # Process
-            df, clusters = process_student_dataframe(df)
-            
+            features = []
+            df, clusters = process_student_dataframe(df, use_row_cache=True, features_out=features)
+            queue_shadow_scoring(df, clusters, features[0])
+
+            academic_year = academic_year_label(request.form.get('academic_year'), str(datetime.now().year))
+            with span('store'):
+                upload_id = store_predictions(df, academic_year, replace_upload)
+
             # Calculate Distribution
             distribution = df['Profile_Name'].value_counts().to_dict()
 
-            # Convert back to CSV/Excel
-            output = BytesIO()
-            df.to_csv(output, index=False)
-            output.seek(0)
-            
-            # Encode to base64
-            file_base64 = base64.b64encode(output.getvalue()).decode('utf-8')
-            
-            return jsonify({
+            payload = {
                 'success': True,
-                'file_base64': file_base64,
-                'filename': 'career_predictions.csv',
-                'distribution': distribution
-            })
+                'filename': f'career_predictions.{output_format}',
+                'distribution': distribution,
+                'academic_year': academic_year,
+                'upload_id': upload_id,
+                'validation': validation
+            }
+
+            # Convert back to CSV/Excel/Parquet
+            with span('serialize'):
+                if output_format == 'csv':
+                    output = BytesIO()
+                    df.to_csv(output, index=False)
+                    file_bytes = output.getvalue()
+                else:
+                    result_path = write_result_file(df, output_format)
+                    if as_attachment:
+                        # Streamed from disk and not cached, so the file is never held in memory
+                        return batch_attachment(payload, stream_result_file(result_path),
+                                                os.path.getsize(result_path))
+                    # JSON delivery holds the whole file (and its base64) in memory
+                    try:
+                        with open(result_path, 'rb') as f:
+                            file_bytes = f.read()
+                    finally:
+                        os.remove(result_path)
+
+                # Encode to base64
+                payload['file_base64'] = base64.b64encode(file_bytes).decode('utf-8')
+            result_cache.put(cache_key, payload)
+
+            with span('serialize'):
+                if as_attachment:
+                    return batch_attachment(payload, file_bytes)
+                return jsonify(payload)
 
     except Exception as e:
         print(f"Batch Error: {e}")
@@ -349,19 +897,43 @@ def predict_multi_year():
             if year in request.files:
                 file = request.files[year]
                 if file.filename:
-                     # Read
-                    if file.filename.endswith('.csv'):
-                        df = pd.read_csv(file)
-                    elif file.filename.endswith('.xlsx'):
-                        df = pd.read_excel(file, engine='openpyxl')
+                    raw = file.read()
+                    # The label decides where the rows are stored, so it is part of the key
+                    academic_year = academic_year_label(request.form.get(f'{year}_label'), year)
+                    cache_key = file_key(raw, model_version, f'multi-year|{academic_year}',
+                                         os.path.splitext(file.filename)[1])
+                    cached = result_cache.get(cache_key, len(raw))
+                    # A cached answer whose upload was since deleted must be re-scored and re-stored
+                    upload_gone = cached is not None and cached.get('upload_id') and \
+                        not cohort_aggregates.has_upload(cached['upload_id'])
+
+                    if cached is not None and not upload_gone:
+                        counts = cached['counts']
                     else:
-                        df = pd.read_excel(file)
-                    
-                    # Process
-                    df, _ = process_student_dataframe(df)
-                    
-                    # Get Count
-                    counts = df['Profile_Name'].value_counts().to_dict()
+                         # Read
+                        if file.filename.endswith('.csv'):
+                            df = pd.read_csv(BytesIO(raw))
+                        elif file.filename.endswith('.xlsx'):
+                            df = pd.read_excel(BytesIO(raw), engine='openpyxl')
+                        else:
+                            df = pd.read_excel(BytesIO(raw))
+
+                        validation = validation_schema.validate(df, VALIDATION_MAX_ERROR_RATE)
+                        if validation['aborted']:
+                            return jsonify({'error': f'{year} upload failed validation',
+                                            'validation': validation}), 422
+
+                        # Process
+                        features = []
+                        df, clusters = process_student_dataframe(df, use_row_cache=True,
+                                                                 features_out=features)
+                        queue_shadow_scoring(df, clusters, features[0])
+                        upload_id = store_predictions(df, academic_year)
+
+                        # Get Count
+                        counts = df['Profile_Name'].value_counts().to_dict()
+                        result_cache.put(cache_key, {'counts': counts, 'upload_id': upload_id})
+
                     results[year] = counts
                     
                     # Add to set
@@ -387,6 +959,56 @@ def predict_multi_year():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/store/query', methods=['GET'])
+def query_prediction_store():
+    """Distributions / trends over stored predictions.
+
+    ?group_by=year,profile&branch=CSE&year=2024,2025&metrics=CGPA,Soft_Skills_Score
+    """
+    try:
+        def split(value):
+            return [v.strip() for v in value.split(',') if v.strip()] if value else []
+
+        group_by = split(request.args.get('group_by', 'year,profile'))
+        unknown = [g for g in group_by if g not in DIMENSIONS]
+        if unknown:
+            return jsonify({'error': f"Unknown group_by {unknown}. Use {list(DIMENSIONS)}"}), 400
+
+        filters = {name: split(request.args.get(name)) for name in DIMENSIONS if request.args.get(name)}
+        metrics = split(request.args.get('metrics', 'CGPA'))
+
+        t0 = datetime.now()
+        rows = prediction_store.query(group_by, filters, metrics)
+        elapsed_ms = (datetime.now() - t0).total_seconds() * 1000
+
+        return jsonify({
+            'success': True,
+            'group_by': group_by,
+            'filters': filters,
+            'metrics': [m for m in metrics if m in METRIC_COLUMNS],
+            'rows': rows,
+            'total': sum(r['count'] for r in rows),
+            'elapsed_ms': round(elapsed_ms, 2)
+        })
+
+    except Exception as e:
+        print(f"Store Query Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/dashboard/aggregates', methods=['GET'])
+def dashboard_aggregates():
+    """Year x profile, branch x profile and per-cluster means, maintained incrementally"""
+    return jsonify({'success': True, **cohort_aggregates.snapshot()})
+
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def remove_upload(upload_id):
+    if not delete_upload(upload_id):
+        return jsonify({'error': f"Unknown upload {upload_id}"}), 404
+    return jsonify({'success': True, 'upload_id': upload_id})
+
+
 @app.route('/calculate/api', methods=['POST'])
 def calculate_api():
     try:
@@ -398,53 +1020,25 @@ def calculate_api():
         unpaid_intern = int(data.get('unpaid_internships', 0))
         research = int(data.get('research_papers', 0))
         certs = int(data.get('certificates', 0))
+        # float('nan') parses fine but would propagate through the kernel; batch rows reject it too
+        if np.isnan(cgpa):
+            return jsonify({'error': 'cgpa must be a number'}), 400
         
-        # Calculate Points
-        # 1. CGPA (Max 2.0) - Weight 20%
-        # Assumption: CGPA is scaled to 2.0. If CGPA is 10, points = 2.0
-        cgpa_points = min(2.0, (cgpa / 10.0) * 2.0)
-        
-        # 2. Internships (Max 4.0) - Weight 40%
-        # Paid = 2 pts, Unpaid = 1 pt
-        intern_raw = (paid_intern * 2.0) + (unpaid_intern * 1.0)
-        intern_points = min(4.0, intern_raw)
-        
-        # 3. Research (Max 2.0) - Weight 20%
-        # 0.5 pts each
-        research_points = min(2.0, research * 0.5)
-        
-        # 4. Certificates (Max 2.0) - Weight 20%
-        # 0.1 pts each
-        cert_points = min(2.0, certs * 0.1)
-        
-        # Total
-        total_score = round(cgpa_points + intern_points + research_points + cert_points, 2)
-        
-        # Determine Level
-        if total_score >= 9.0:
-            level = 'excellent'
-            feedback = "Outstanding profile! You have a competitive edge for top-tier roles and research positions."
-        elif total_score >= 7.0:
-            level = 'good'
-            feedback = "Strong profile. You are well-prepared, but a few more projects or publications could boost your standing."
-        elif total_score >= 5.0:
-            level = 'fair'
-            feedback = "Decent start. Focus on gaining more practical experience (internships) and improving academic performance."
-        else:
-            level = 'needs_improvement'
-            feedback = "Needs improvement. Prioritize improving your CGPA and actively seeking internships or skill certifications."
+        # Same vectorized kernel as the batch endpoint, on a single row
+        scores = score_api(cgpa, paid_intern, unpaid_intern, research, certs)
+        level = str(scores['level'])
 
         return jsonify({
             'success': True,
-            'total_score': total_score,
-            'max_score': 10.0,
+            'total_score': float(scores['total_score']),
+            'max_score': MAX_SCORE,
             'level': level,
-            'feedback': feedback,
+            'feedback': FEEDBACK[level],
             'breakdown': {
-                'cgpa_points': round(cgpa_points, 2),
-                'internship_points': round(intern_points, 2),
-                'research_points': round(research_points, 2),
-                'cert_points': round(cert_points, 2)
+                'cgpa_points': float(scores['cgpa_points']),
+                'internship_points': float(scores['internship_points']),
+                'research_points': float(scores['research_points']),
+                'cert_points': float(scores['cert_points'])
             }
         })
 
@@ -453,27 +1047,210 @@ def calculate_api():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/calculate/api/batch', methods=['POST'])
+def calculate_api_batch():
+    """Score a whole cohort from a CSV/XLSX upload or a JSON array"""
+    try:
+        if 'file' in request.files:
+            file = request.files['file']
+            if file.filename.endswith('.csv'):
+                df = pd.read_csv(file)
+            elif file.filename.endswith(('.xls', '.xlsx')):
+                df = pd.read_excel(file, engine='openpyxl')
+            else:
+                return jsonify({'error': 'Invalid file format. Use CSV or Excel'}), 400
+        else:
+            data = request.get_json(silent=True)
+            if isinstance(data, dict):
+                data = data.get('students')
+            if not isinstance(data, list):
+                return jsonify({'error': 'Upload a file or send a JSON array of students'}), 400
+            df = pd.DataFrame(data)
+
+        inputs, invalid = coerce_inputs(df)
+        scores = score_api(inputs['cgpa'], inputs['paid_internships'], inputs['unpaid_internships'],
+                           inputs['research_papers'], inputs['certificates'])
+        valid = ~invalid
+
+        results = []
+        columns = [scores[k].tolist() for k in ['total_score', 'level', 'cgpa_points',
+                                                 'internship_points', 'research_points', 'cert_points']]
+        for i, (total, level, cgpa_p, intern_p, research_p, cert_p) in enumerate(zip(*columns)):
+            if invalid[i]:
+                results.append({'row': i, 'error': 'Non-numeric input'})
+                continue
+            results.append({
+                'row': i,
+                'total_score': total,
+                'level': level,
+                'breakdown': {
+                    'cgpa_points': cgpa_p,
+                    'internship_points': intern_p,
+                    'research_points': research_p,
+                    'cert_points': cert_p
+                }
+            })
+
+        return jsonify({
+            'success': True,
+            'count': len(df),
+            'invalid_rows': int(invalid.sum()),
+            'max_score': MAX_SCORE,
+            'results': results,
+            'feedback': FEEDBACK,
+            **summarize(scores, valid)
+        })
+
+    except Exception as e:
+        print(f"API Batch Calc Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+
+def request_roadmap(data, profile, roles):
+    """Call the LLM for a roadmap; raises on failure or when the gateway sheds the call"""
+    model = get_llm_model()
+
+    prompt = f"""
+    Create a career roadmap for student aiming for: {profile}
+    Target roles: {roles}
+
+    Student details:
+    CGPA: {data.get('cgpa')}
+    Projects: {data.get('projects')}
+
+    Provide a 6 month plan.
+    """
 
-def generate_roadmap(data, profile, roles):
+    response = llm_gateway.call(
+        lambda timeout: model.generate_content(prompt, request_options={'timeout': timeout}))
+    return response.text
+
+
+def generate_roadmap(data, profile, roles, cluster_id=None):
+    try:
+        roadmap = request_roadmap(data, profile, roles)
+    except Exception as e:
+        print(f"Roadmap Error: {e}")
+        # Degrade to any cached roadmap for this cluster, then to the static template
+        cached = roadmap_pool.get_any(model_version, cluster_id) if cluster_id is not None else None
+        return cached or template_roadmap(profile, roles)
+
+    # Misses fill the pool too, keyed by the same bands the warmer uses
+    if cluster_id is not None:
+        cgpa_band, project_band = profile_bucket(data)
+        roadmap_pool.put(model_version, cluster_id, cgpa_band, project_band, roadmap)
+    return roadmap
+
+
+@app.route('/roadmaps/pool', methods=['GET'])
+def roadmap_pool_stats():
+    stats = roadmap_pool.stats(model_version, (cluster_info or {}).keys())
+    stats['warmer'] = roadmap_warmer.stats() if roadmap_warmer else None
+    return jsonify(stats)
+
+
+@app.route('/llm/stats', methods=['GET'])
+def llm_stats():
+    stats = llm_gateway.stats()
+    stats['backend'] = LLM_BACKEND
+    return jsonify(stats)
+
+
+@app.route('/models', methods=['GET'])
+def model_versions():
+    report = model_registry.report()
+    report['live'] = {'version': model_version, 'preprocess_key': live_preprocess_key}
+    report['online'] = online_updater.stats() if online_updater is not None else None
+    return jsonify(report)
+
+
+@app.route('/models/shadow', methods=['POST'])
+def set_shadow_models():
+    data = request.json or {}
+    names = data.get('names', [])
+    if isinstance(names, str):
+        names = [n for n in names.split(',') if n]
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        model_registry.set_shadow(names)
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 404
+    return jsonify({'success': True, 'shadow': names})
+
+
+@app.route('/models/reload', methods=['POST'])
+def reload_model_versions():
+    model_registry.load()
+    return jsonify({'success': True, 'versions': [b.describe() for b in model_registry.bundles.values()]})
+
+
+@app.route('/models/online', methods=['GET'])
+def online_cluster_stats():
+    if online_updater is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **online_updater.stats()})
+
+
+@app.route('/models/online/publish', methods=['POST'])
+def publish_online_clusters():
+    """Publish the current shadow centroids as a version now, whatever they moved"""
+    if online_updater is None:
+        return jsonify({'error': 'Online learning is disabled (set ONLINE_LEARNING=1)'}), 404
+    try:
+        record = online_updater.publish()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'success': True, 'version': record})
 
-        prompt = f"""
-        Create a career roadmap for student aiming for: {profile}
-        Target roles: {roles}
 
-        Student details:
-        CGPA: {data.get('cgpa')}
-        Projects: {data.get('projects')}
+@app.route('/traces/stats', methods=['GET'])
+def trace_stats():
+    return jsonify(trace_writer.stats())
 
-        Provide a 6 month plan.
-        """
 
-        response = model.generate_content(prompt)
-        return response.text
+def profile_admin_denied():
+    """403 response unless the request carries the profiling admin token (when one is configured)"""
+    if PROFILE_ADMIN_TOKEN and request.headers.get('X-Admin-Token') != PROFILE_ADMIN_TOKEN:
+        return jsonify({'error': 'Admin token required'}), 403
+    return None
 
-    except:
-        return "Could not generate roadmap."
+
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    # Profiles expose code paths and file names, so reading them needs the same token as toggling
+    denied = profile_admin_denied()
+    if denied:
+        return denied
+    return jsonify({'profiles': profile_store.list(), **profile_store.stats()})
+
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    denied = profile_admin_denied()
+    if denied:
+        return denied
+    profile = profile_store.load(profile_id)
+    if profile is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    fmt = request.args.get('format', 'speedscope')
+    if fmt == 'collapsed':
+        return Response(to_collapsed(profile), mimetype='text/plain')
+    if fmt == 'speedscope':
+        return jsonify(to_speedscope(profile))
+    if fmt == 'raw':
+        return jsonify(profile)
+    return jsonify({'error': 'format must be collapsed, speedscope or raw'}), 400
+
+
+@app.route('/profiles/toggle', methods=['POST'])
+def toggle_profiling():
+    denied = profile_admin_denied()
+    if denied:
+        return denied
+    data = request.json or {}
+    profile_store.toggle(bool(data.get('enabled', True)), float(data.get('minutes', 5)))
+    return jsonify({'success': True, **profile_store.stats()})
 
 
 @app.route('/chat', methods=['POST'])
@@ -487,40 +1264,45 @@ def chat():
         if not user_message:
             return jsonify({'error': 'Message is required'}), 400
 
-        # Construct System Prompt with Context
-        system_prompt = f"""
-        You are a helpful Career Counselor AI.
-        Context about the student:
-        - Profile: {context.get('profile_name', 'Student')}
-        - Suggested Roles: {context.get('roles', 'N/A')}
-        - Technical Skill Score: {context.get('technical_score', 'N/A')}/5
-        
-        Answer the student's question based on this profile. Be encouraging and practical.
-        """
+        # Server-side session; a client without one seeds a new session from its history
+        session, created = chat_sessions.get_or_create(data.get('session_id'), context, history)
+        full_prompt = chat_sessions.build_prompt(session, user_message)
 
-        # Initialize Chat
-        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
-        chat_session = model.start_chat(history=[])
-        
-        # Add limited history context if needed, but for simplicity we send a composed prompt
-        # or just the latest message with system instruction.
-        # Gemini API supports system_instruction on model creation in newer versions, 
-        # but here we'll just prepend it to the message or assume stateless content generation for simplicity 
-        # due to unknown library version features.
-        
-        full_prompt = f"{system_prompt}\n\nStudent: {user_message}"
-        
-        response = model.generate_content(full_prompt)
-        
-        return jsonify({
-            'response': response.text
-        })
+        model = get_llm_model()
+        with span('llm'):
+            response = llm_gateway.call(
+                lambda timeout: model.generate_content(full_prompt, request_options={'timeout': timeout}))
+        chat_sessions.record(session, user_message, response.text)
+
+        with span('serialize'):
+            return jsonify({
+                'response': response.text,
+                'session_id': session.id,
+                'new_session': created
+            })
+
+    except GatewayRejected as e:
+        print(f"Chat Shed: {e.reason}")
+        return jsonify({'error': 'The AI counsellor is busy right now. Please try again in a moment.',
+                        'reason': e.reason}), 503, {'Retry-After': '5'}
 
     except Exception as e:
         print(f"Chat Error: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/chat/<session_id>', methods=['DELETE'])
+def end_chat(session_id):
+    if not chat_sessions.delete(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'success': True})
+
+
+@app.route('/chat/stats', methods=['GET'])
+def chat_stats():
+    return jsonify(chat_sessions.stats())
+
+
 @app.route('/predict/batch-compare', methods=['POST'])
 def predict_batch_compare():
     try:
@@ -691,15 +1473,15 @@ def predict_batch_compare():
             pred_counts = subset[pred_target].astype(str).str.lower().str.strip().value_counts()
             
             for predicted_label, count in pred_counts.items():
-                row[predicted_label] = int(count)
+                row[predicted_label] = count
                 
             cm_data.append(row)
 
         return jsonify({
             'success': True,
             'accuracy': round(accuracy, 2),
-            'correct': int(correct_count),
-            'total': int(total),
+            'correct': correct_count,
+            'total': total,
             'pred_column': pred_target,
             'truth_column': truth_target,
             'matrix_data': cm_data,
@@ -711,8 +1493,84 @@ def predict_batch_compare():
         return jsonify({'error': f"Comparison failed: {str(e)}"}), 500
 
 
+@atexit.register
+def save_monitor_state():
+    if drift_monitor is not None:
+        drift_monitor.save()
+    trace_writer.close()
+
+
+def warmup_steps():
+    """Synthetic inputs through every model path; nothing is stored, cached or observed"""
+    single = synthetic_frame(1, NUMERICAL_COLS, CATEGORICAL_COLS, scaler, label_encoders)
+    batch = synthetic_frame(512, NUMERICAL_COLS, CATEGORICAL_COLS, scaler, label_encoders, seed=1)
+
+    def individual():
+        # single already has the model columns that build_individual_input produces from the form
+        df_processed = preprocess_features(single.copy(), observe=False)
+        X_full = np.ascontiguousarray(df_processed.values, dtype=np.float32)
+        cluster_id = int(kmeans_model.predict(X_full)[0])
+        if similarity_index is not None:
+            similarity_index.search(X_full[0], k=5)
+        get_embeddings(df_processed[NUMERICAL_COLS].values)
+        with app.test_request_context():
+            jsonify({'cluster_id': cluster_id, 'info': cluster_info.get(cluster_id, {})})
+
+    def batch_upload():
+        raw = BytesIO(batch.to_csv(index=False).encode('utf-8'))
+        df = pd.read_csv(raw)
+        validation_schema.validate(df, VALIDATION_MAX_ERROR_RATE)
+        if row_cache is not None:
+            row_cache.hash_rows(df)
+        clusters = predict_clusters(df, observe=False)
+        df['Cluster_ID'] = clusters
+        df['Profile_Name'] = [cluster_info.get(int(c), {}).get('name', f'Cluster {c}') for c in clusters]
+        file_base64 = base64.b64encode(df.to_csv(index=False).encode('utf-8')).decode('utf-8')
+        with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+            response = jsonify({'file_base64': file_base64,
+                                'distribution': df['Profile_Name'].value_counts().to_dict()})
+            compress_response(response, 'gzip', 0)
+
+    def api_calculator():
+        score_api(8.0, 1, 1, 1, 5)
+        inputs, _ = coerce_inputs(pd.DataFrame({'cgpa': [8.0] * 64, 'paid_internships': [1] * 64,
+                                                'unpaid_internships': [0] * 64, 'research_papers': [1] * 64,
+                                                'certificates': [3] * 64}))
+        score_api(inputs['cgpa'], inputs['paid_internships'], inputs['unpaid_internships'],
+                  inputs['research_papers'], inputs['certificates'])
+
+    return [('individual', individual), ('batch', batch_upload), ('api_calculator', api_calculator)]
+
+
+def start_background_tasks():
+    """Kick off startup jobs (skipped when DISABLE_BACKGROUND_TASKS=1, e.g. for CLI use)"""
+    global roadmap_warmer
+    if os.getenv("DISABLE_BACKGROUND_TASKS") == "1":
+        readiness.skip_warmup()
+        return
+
+    # The scoring pool is forked first, while no other thread exists (see parallel_scoring.py)
+    if parallel_scorer.workers > 1:
+        parallel_scorer.start()
+    trace_writer.start()
+
+    # Readiness flips once warmup has run; liveness answers meanwhile
+    if not readiness.failed:
+        threading.Thread(target=readiness.run_warmup, args=(warmup_steps(), WARMUP_ROUNDS),
+                         name='warmup', daemon=True).start()
+
+    if LLM_AVAILABLE and cluster_info:
+        roadmap_warmer = RoadmapWarmer(roadmap_pool, request_roadmap,
+                                       ROADMAP_WARM_CONCURRENCY, ROADMAP_WARM_CALLS_PER_MINUTE)
+        roadmap_warmer.start(lambda: (model_version, cluster_info),
+                             ROADMAP_WARM_INTERVAL_MINUTES * 60)
+
+
+start_background_tasks()
+
+
 if __name__ == '__main__':
-    app.run(debug=False, port=5001)
+    app.run(debug=False, port=int(os.getenv("PORT", "5001")))
 #cd frontend
 #npm start
 
@@ -0,0 +1,279 @@
+"""
+Offline batch scorer for whole archives, straight from disk.
+
+    python batch_score.py archive/ --output scored/ --format parquet
+    python batch_score.py students_2025.xlsx students_2026.csv --output scored/ --format xlsx
+
+Inputs are CSV, XLSX or Parquet files, or directories of them. Each file is
+read in chunks; the parent process parses, and a fork pool of workers (one per
+CPU by default, each with single-threaded BLAS) runs the backend's own
+preprocessing and KMeans on a chunk and writes it as its own part file. A
+chunk only counts as done once its part file has been renamed into place and
+the per-file checkpoint has been updated, so an interrupted run picks up where
+it stopped when the same command is run again: the finished prefix of a CSV is
+skipped without parsing, finished Parquet row groups are not read at all.
+Parts are merged into one <file name>.scored.<format> file (e.g.
+students.xlsx.scored.parquet) at the end, unless --no-merge, and throughput
+statistics are printed. XLSX results are scored into Parquet parts and
+streamed into the workbook when they are merged (see result_writers.py).
+
+The checkpoint is discarded (and the file rescored) if the input file, the
+model version, the chunk size or the output format has changed.
+"""
+import os
+
+# Importing app must not start warmup threads, roadmap warming etc.
+os.environ.setdefault('DISABLE_BACKGROUND_TASKS', '1')
+
+import argparse
+import json
+import multiprocessing as mp
+import shutil
+import signal
+import time
+
+import numpy as np
+import pandas as pd
+
+import app
+from chunk_readers import input_files, read_chunks, fingerprint
+from result_writers import CHUNK_ROWS, open_writer
+
+CHECKPOINT = '_checkpoint.json'
+
+
+# --- scoring, in forked workers ---
+
+def _init_worker():
+    # Ctrl-C reaches the whole process group; only the parent reacts (it terminates the pool)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def score_and_write(task):
+    """Worker: score one chunk with the backend pipeline and write it as a part file"""
+    index, chunk, parts_dir, fmt = task
+    clusters = app.predict_clusters(chunk, observe=False).astype(np.int32)
+
+    ids = range(int(clusters.max()) + 1 if len(clusters) else 0)
+    names = np.array([app.cluster_info.get(c, {}).get('name', f'Cluster {c}') for c in ids], dtype=object)
+    roles = np.array([", ".join(app.cluster_info.get(c, {}).get('roles', [])) for c in ids], dtype=object)
+    chunk = chunk.copy()
+    chunk['Cluster_ID'] = clusters
+    chunk['Profile_Name'] = names[clusters] if len(clusters) else []
+    chunk['Suggested_Roles'] = roles[clusters] if len(clusters) else []
+
+    final = os.path.join(parts_dir, f"part-{index:06d}.{fmt}")
+    tmp = final + '.tmp'
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(part_table(chunk), tmp)
+    else:
+        chunk.to_csv(tmp, index=False)
+    os.replace(tmp, final)
+    return index, len(chunk), np.bincount(clusters, minlength=len(ids)).tolist()
+
+
+def part_table(chunk):
+    """Chunk -> Arrow table with a schema fixed by column name, never by what pandas inferred
+
+    Numerical features are float64, Cluster_ID int32 and everything else string,
+    so a chunk where an optional column happens to be empty (read as float64 NaN)
+    still merges with the chunks where it holds text.
+    """
+    import pyarrow as pa
+    numerical = set(app.NUMERICAL_COLS)
+    fields, columns = [], {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if col == 'Cluster_ID':
+            fields.append(pa.field(col, pa.int32()))
+        elif col in numerical:
+            fields.append(pa.field(col, pa.float64()))
+            values = pd.to_numeric(values, errors='coerce').astype(np.float64)
+        else:
+            fields.append(pa.field(col, pa.string()))
+            if values.dtype.kind == 'f' and np.all(np.isnan(values) | (values == np.round(values))):
+                values = values.astype('Int64')  # IDs with gaps: '123', not '123.0'
+            values = values.astype('string')
+        columns[col] = values
+    schema = pa.schema(fields)
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+
+# --- checkpoints ---
+
+def load_checkpoint(parts_dir, expected):
+    path = os.path.join(parts_dir, CHECKPOINT)
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if all(state.get(k) == v for k, v in expected.items()):
+            return state
+        print(f"   Input, model or settings changed since the last run; rescoring {expected['input']}")
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir, exist_ok=True)
+    return {**expected, 'done': {}, 'complete': False}
+
+
+def save_checkpoint(parts_dir, state):
+    path = os.path.join(parts_dir, CHECKPOINT)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(path + '.tmp', path)
+
+
+def finished_prefix(done):
+    n = 0
+    while str(n) in done:
+        n += 1
+    return n
+
+
+def part_format(fmt):
+    return 'parquet' if fmt == 'xlsx' else fmt
+
+
+def merge_parts(parts_dir, target, fmt):
+    parts = sorted(p for p in os.listdir(parts_dir)
+                   if p.startswith('part-') and p.endswith('.' + part_format(fmt)))
+    tmp = target + '.tmp'
+    if fmt == 'xlsx':
+        import pyarrow.parquet as pq
+        writer = open_writer('xlsx', tmp)
+        for name in parts:
+            for batch in pq.ParquetFile(os.path.join(parts_dir, name)).iter_batches(batch_size=CHUNK_ROWS):
+                writer.write(batch.to_pandas())
+        writer.close()
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        writer = None
+        for name in parts:
+            table = pq.read_table(os.path.join(parts_dir, name))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is not None:
+            writer.close()
+    else:
+        with open(tmp, 'wb') as out:
+            for i, name in enumerate(parts):
+                with open(os.path.join(parts_dir, name), 'rb') as f:
+                    if i:
+                        f.readline()  # header only once
+                    shutil.copyfileobj(f, out, 1 << 20)
+    os.replace(tmp, target)
+
+
+# --- driver ---
+
+def score_file(path, output_dir, fmt, chunk_rows, pool, max_in_flight, merge=True):
+    # Full file name, so students.csv and students.xlsx don't share an output
+    name = os.path.basename(path)
+    parts_dir = os.path.join(output_dir, f"{name}.parts")
+    target = os.path.join(output_dir, f"{name}.scored.{fmt}")
+    state = load_checkpoint(parts_dir, {'input': os.path.abspath(path), 'fingerprint': fingerprint(path),
+                                        'model_version': app.model_version, 'chunk_rows': chunk_rows,
+                                        'format': fmt})
+    resumed_rows = sum(state['done'].values())
+    stats = {'file': path, 'rows': resumed_rows, 'resumed_rows': resumed_rows, 'seconds': 0.0,
+             'output': parts_dir}
+    t0 = time.perf_counter()
+
+    if not state['complete']:
+        pending = []
+
+        def drain(limit):
+            # Record finished chunks in submission order; block while more than `limit` are outstanding
+            while pending and (len(pending) > limit or pending[0].ready()):
+                index, rows, counts = pending.pop(0).get()
+                state['done'][str(index)] = rows
+                for c, n in enumerate(counts):
+                    state['counts'][str(c)] = state['counts'].get(str(c), 0) + n
+                save_checkpoint(parts_dir, state)
+                stats['rows'] += rows
+
+        state.setdefault('counts', {})
+        for index, chunk in read_chunks(path, chunk_rows, finished_prefix(state['done'])):
+            if str(index) in state['done']:
+                continue
+            pending.append(pool.apply_async(score_and_write, ((index, chunk, parts_dir, part_format(fmt)),)))
+            # Bounded read-ahead: the parent never holds more than max_in_flight parsed chunks
+            drain(max_in_flight - 1)
+        drain(0)
+        state['complete'] = True
+        save_checkpoint(parts_dir, state)
+
+    if merge and not state.get('merged'):
+        merge_parts(parts_dir, target, fmt)
+        for name in os.listdir(parts_dir):
+            if name.startswith('part-'):
+                os.remove(os.path.join(parts_dir, name))
+        state['merged'] = True
+        save_checkpoint(parts_dir, state)
+    if state.get('merged'):
+        stats['output'] = target
+    stats['seconds'] = time.perf_counter() - t0
+    return stats, state.get('counts', {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score CSV / XLSX / Parquet archives with the backend models")
+    parser.add_argument('inputs', nargs='+', help="Files or directories")
+    parser.add_argument('--output', required=True, help="Output directory")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'xlsx'], default='csv')
+    parser.add_argument('--chunk-rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--no-merge', action='store_true', help="Leave the per-chunk part files")
+    args = parser.parse_args()
+
+    if app.kmeans_model is None:
+        raise SystemExit("Models failed to load; see the messages above")
+    files = input_files(args.inputs)
+    if not files:
+        raise SystemExit("No input files found")
+    os.makedirs(args.output, exist_ok=True)
+
+    print(f"Scoring {len(files)} file(s) with model {app.model_version} on {args.workers} worker(s)")
+    t0 = time.perf_counter()
+    totals = {}
+    results = []
+    ctx = mp.get_context('fork') if 'fork' in mp.get_all_start_methods() else mp.get_context()
+    pool = ctx.Pool(args.workers, initializer=_init_worker)
+    try:
+        for path in files:
+            stats, counts = score_file(path, args.output, args.format, args.chunk_rows, pool,
+                                       max_in_flight=args.workers * 2, merge=not args.no_merge)
+            for c, n in counts.items():
+                totals[int(c)] = totals.get(int(c), 0) + n
+            results.append(stats)
+            scored = stats['rows'] - stats['resumed_rows']
+            rate = scored / stats['seconds'] if stats['seconds'] else 0
+            print(f"   {path}: {stats['rows']:,} rows ({stats['resumed_rows']:,} from checkpoint), "
+                  f"{stats['seconds']:.1f}s, {rate:,.0f} rows/s -> {stats['output']}")
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise SystemExit("Interrupted; finished chunks are checkpointed, rerun the same command to resume")
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    elapsed = time.perf_counter() - t0
+    rows = sum(s['rows'] for s in results)
+    scored = sum(s['rows'] - s['resumed_rows'] for s in results)
+    print(f"\nDone: {rows:,} rows in {elapsed:.1f}s ({scored:,} scored this run, "
+          f"{scored / elapsed if elapsed else 0:,.0f} rows/s)")
+    for c in sorted(totals):
+        name = app.cluster_info.get(c, {}).get('name', f'Cluster {c}')
+        print(f"   {name:<35} {totals[c]:>12,} ({totals[c] / max(rows, 1) * 100:5.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
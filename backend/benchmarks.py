@@ -0,0 +1,582 @@
+"""
+Micro-benchmarks for the backend hot paths.
+
+Run from the backend folder, e.g.
+
+    python benchmarks.py api-calculator --rows 1000000
+    python benchmarks.py llm-gateway --clients 64
+    python benchmarks.py prediction-store --rows 10000000
+    python benchmarks.py validation --rows 1000000
+    python benchmarks.py parallel-scoring --rows 2000000 --workers 1 4 16 32
+    python benchmarks.py responses --rows 100000
+    python benchmarks.py chat --turns 30
+    python benchmarks.py inference-threads --clients 1 4 16 64
+    python benchmarks.py result-writers --rows 100000 1000000
+    python benchmarks.py similarity-index --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def bench_api_calculator(rows):
+    """Vectorized cohort scoring vs one scalar call per student"""
+    from api_score import score_api, coerce_inputs, summarize
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'cgpa': np.round(rng.uniform(4, 10, rows), 2),
+        'paid_internships': rng.integers(0, 3, rows),
+        'unpaid_internships': rng.integers(0, 3, rows),
+        'research_papers': rng.integers(0, 5, rows),
+        'certificates': rng.integers(0, 25, rows),
+    })
+
+    (inputs, invalid), t_coerce = _timed(coerce_inputs, df)
+    scores, t_score = _timed(score_api, inputs['cgpa'], inputs['paid_internships'],
+                             inputs['unpaid_internships'], inputs['research_papers'],
+                             inputs['certificates'])
+    _, t_summary = _timed(summarize, scores, ~invalid)
+
+    # The single-row endpoint runs the same kernel on one row; time that path on a sample
+    sample = min(rows, 20000)
+    records = df.iloc[:sample].to_dict('records')
+    t0 = time.perf_counter()
+    mismatches = 0
+    for i, r in enumerate(records):
+        single = score_api(float(r['cgpa']), int(r['paid_internships']), int(r['unpaid_internships']),
+                           int(r['research_papers']), int(r['certificates']))
+        if float(single['total_score']) != scores['total_score'][i] or str(single['level']) != scores['level'][i]:
+            mismatches += 1
+    t_single = (time.perf_counter() - t0) / sample * rows
+
+    print(f"rows={rows:,}")
+    print(f"  coerce     {t_coerce * 1000:9.1f} ms")
+    print(f"  score      {t_score * 1000:9.1f} ms")
+    print(f"  summarize  {t_summary * 1000:9.1f} ms")
+    print(f"  row-by-row {t_single * 1000:9.1f} ms (extrapolated from {sample:,} rows, no HTTP)")
+    print(f"  mismatches vs single-row path: {mismatches}")
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def bench_llm_gateway(clients, calls_per_client, latency_ms, upstream_concurrency, error_rate):
+    """Burst of clients against a fake LLM that 429s when overloaded, with and without the gateway"""
+    from concurrent.futures import ThreadPoolExecutor
+    from fake_llm import FakeGenerativeModel
+    from llm_gateway import LLMGateway, GatewayRejected
+
+    model = FakeGenerativeModel('bench', latency_ms=latency_ms, error_rate=error_rate,
+                                max_concurrency=upstream_concurrency)
+
+    def run(label, gateway):
+        FakeGenerativeModel.reset_counters()
+        outcomes = {'ok': 0, 'upstream_error': 0, 'shed_fallback': 0}
+        latencies = []
+
+        def one_call(_):
+            t0 = time.perf_counter()
+            try:
+                if gateway:
+                    gateway.call(lambda t: model.generate_content("plan", request_options={'timeout': t}),
+                                 timeout=5)
+                else:
+                    model.generate_content("plan")
+                key = 'ok'
+            except GatewayRejected:
+                key = 'shed_fallback'
+            except Exception:
+                key = 'upstream_error'
+            return key, time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as ex:
+            for key, elapsed in ex.map(one_call, range(clients * calls_per_client)):
+                outcomes[key] += 1
+                latencies.append(elapsed)
+        wall = time.perf_counter() - t0
+
+        print(f"{label}: wall {wall:.1f}s, upstream calls {FakeGenerativeModel.calls}, "
+              f"upstream 429s {FakeGenerativeModel.rate_limited}, {outcomes}")
+        print(f"    latency p50 {_percentile(latencies, 50):.0f} ms  p99 {_percentile(latencies, 99):.0f} ms")
+        if gateway:
+            print(f"    gateway {gateway.stats()}")
+
+    run("direct ", None)
+    run("gateway", LLMGateway(max_concurrency=upstream_concurrency, max_queue=clients // 2,
+                              rate_per_second=upstream_concurrency * 1000.0 / latency_ms,
+                              burst=upstream_concurrency, failure_threshold=5, reset_seconds=2.0))
+
+
+def bench_prediction_store(rows, uploads):
+    """Fill a scratch store with `rows` predictions and time the dashboard queries"""
+    import shutil
+    import tempfile
+    from prediction_store import PredictionStore, new_upload_id
+
+    root = tempfile.mkdtemp(prefix='prediction-store-')
+    store = PredictionStore(root)
+    rng = np.random.default_rng(0)
+    profiles = np.array(["Tech-Oriented Dev Track", "Research & Higher Studies",
+                         "Corporate/Management Oriented", "Entrepreneurial Track",
+                         "Low-skill / Needs Intervention"])
+    branches = np.array(['CSE', 'ECE', 'ME', 'CIVIL', 'EEE', 'ISE'])
+    per_upload = rows // uploads
+
+    t0 = time.perf_counter()
+    for i in range(uploads):
+        clusters = rng.integers(0, len(profiles), per_upload)
+        df = pd.DataFrame({
+            'Cluster_ID': clusters,
+            'Profile_Name': profiles[clusters],
+            'Branch_Department': branches[rng.integers(0, len(branches), per_upload)],
+            'CGPA': rng.uniform(5, 10, per_upload),
+            'Technical_Skills_Score': rng.integers(1, 6, per_upload),
+            'Soft_Skills_Score': rng.integers(1, 6, per_upload),
+        })
+        store.append(df, str(2020 + i % 5), new_upload_id())
+    print(f"wrote {per_upload * uploads:,} rows in {uploads} uploads: {time.perf_counter() - t0:.1f}s")
+
+    queries = [
+        (['year', 'profile'], {}),
+        (['branch', 'profile'], {}),
+        (['profile'], {'year': ['2023']}),
+        (['year'], {'branch': ['CSE'], 'profile': ['Research & Higher Studies']}),
+    ]
+    try:
+        for group_by, filters in queries:
+            store.query(group_by, filters)  # warm the OS page cache
+            result, elapsed = _timed(store.query, group_by, filters, ('CGPA',))
+            print(f"  group_by={group_by} filters={filters}: {elapsed * 1000:.0f} ms ({len(result)} groups)")
+    finally:
+        shutil.rmtree(root)
+
+
+def synthetic_students(rows, seed=0):
+    """Upload-shaped frame with the 17 model columns, values in the valid ranges"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Age': rng.integers(18, 25, rows),
+        'Gender': rng.choice(['Male', 'Female'], rows),
+        'Branch_Department': rng.choice(['CSE', 'ECE', 'ME', 'CIVIL'], rows),
+        'CGPA': np.round(rng.uniform(5, 10, rows), 2),
+        'Number_of_Backlogs': rng.integers(0, 4, rows),
+        'Number_of_Internships': rng.integers(0, 4, rows),
+        'Type_of_Internships': rng.choice(['None', 'Paid', 'Unpaid'], rows),
+        'Number_of_Publications': rng.integers(0, 3, rows),
+        'Number_of_Projects': rng.integers(0, 8, rows),
+        'Number_of_Certification_Courses': rng.integers(0, 10, rows),
+        'Technical_Skills_Score': rng.integers(1, 6, rows),
+        'Number_of_Hackathons': rng.integers(0, 6, rows),
+        'Co_curricular_Activities': rng.choice(['Yes', 'No'], rows),
+        'Leadership_Roles': rng.choice(['Yes', 'No'], rows),
+        'Soft_Skills_Score': rng.integers(1, 6, rows),
+        'Entrepreneur_Cell_Member': rng.choice(['Yes', 'No'], rows),
+        'Family_Business_Background': rng.choice(['Yes', 'No'], rows),
+    })
+
+
+def bench_validation(rows):
+    """Schema validation cost relative to scoring the same upload"""
+    import os
+    os.environ.setdefault('DISABLE_BACKGROUND_TASKS', '1')
+    import app
+
+    df = synthetic_students(rows)
+    report, t_validate = _timed(app.validation_schema.validate, df)
+    _, t_score = _timed(app.process_student_dataframe, df.copy())
+
+    # A file that is mostly garbage should be rejected after the cheap checks
+    bad = df.copy()
+    bad['CGPA'] = bad['CGPA'].astype(object)
+    bad.loc[bad.index[: rows // 2], 'CGPA'] = 'n/a'
+    bad_report, t_bad = _timed(app.validation_schema.validate, bad)
+
+    print(f"rows={rows:,}")
+    print(f"  validate       {t_validate * 1000:9.1f} ms (valid={report['valid']})")
+    print(f"  score          {t_score * 1000:9.1f} ms")
+    print(f"  overhead       {t_validate / (t_validate + t_score) * 100:9.1f} % of validate + score")
+    print(f"  50% bad CGPA   {t_bad * 1000:9.1f} ms (aborted={bad_report['aborted']})")
+
+
+def bench_parallel_scoring(rows, worker_counts):
+    """Serial cluster scoring vs the forked chunk pool at several worker counts"""
+    import os
+    os.environ.setdefault('DISABLE_BACKGROUND_TASKS', '1')
+    import app
+    from parallel_scoring import ParallelScorer
+
+    df = synthetic_students(rows)
+    serial, t_serial = _timed(app.predict_clusters, df, [])
+    print(f"rows={rows:,}, cpus={os.cpu_count()}")
+    print(f"  serial      {t_serial * 1000:9.1f} ms")
+
+    for workers in worker_counts:
+        # Forked before any request-like work, like the server's startup pool
+        scorer = ParallelScorer(workers, chunk_rows=app.parallel_scorer.chunk_rows)
+        scorer.start()
+        try:
+            results, elapsed = _timed(scorer.map_chunks, df, app.score_chunk)
+        finally:
+            scorer.close()
+        clusters = np.concatenate([c for c, _ in results])
+        same = np.array_equal(clusters, serial)
+        print(f"  workers={workers:<3} {elapsed * 1000:9.1f} ms  speedup {t_serial / elapsed:5.2f}x  "
+              f"chunks={len(results)} identical={same}")
+
+
+def bench_responses(rows):
+    """Wire bytes and encode time of batch / compare payloads: before (stdlib, base64) vs after"""
+    import base64
+    import json
+    from http_encoding import dumps_bytes, compress, available_encodings
+
+    df = synthetic_students(rows)
+    rng = np.random.default_rng(1)
+    df['Cluster_ID'] = rng.integers(0, 5, rows)
+    df['Profile_Name'] = np.array(['Tech-Oriented Dev Track', 'Research & Higher Studies',
+                                   'Corporate/Management Oriented', 'Entrepreneurial Track',
+                                   'Low-skill / Needs Intervention'])[df['Cluster_ID']]
+    csv_bytes = df.to_csv(index=False).encode('utf-8')
+    batch = {'success': True, 'filename': 'career_predictions.csv',
+             'file_base64': base64.b64encode(csv_bytes).decode('utf-8'),
+             'distribution': df['Profile_Name'].value_counts().to_dict()}
+
+    # batch-compare style matrix with NumPy counts (the stdlib needs them cast first)
+    labels = [f"label {i}" for i in range(40)]
+    matrix = [{'name': a, 'total': np.int64(rows), **{b: np.int64(rng.integers(0, rows)) for b in labels}}
+              for a in labels]
+    matrix = matrix * 50
+
+    def stdlib(obj):
+        return json.dumps(obj, default=lambda o: o.item()).encode('utf-8')
+
+    for name, obj in (('batch', batch), ('matrix', {'matrix_data': matrix})):
+        before, t_before = _timed(stdlib, obj)
+        after, t_after = _timed(dumps_bytes, obj)
+        print(f"{name}: stdlib {len(before):,} B in {t_before * 1000:.1f} ms, "
+              f"fast {len(after):,} B in {t_after * 1000:.1f} ms")
+
+    print(f"batch wire bytes (rows={rows:,}):")
+    print(f"  base64 JSON, identity   {len(dumps_bytes(batch)):>12,} B")
+    print(f"  raw CSV attachment      {len(csv_bytes):>12,} B")
+    body = dumps_bytes(batch)
+    for encoding in available_encodings():
+        packed_json, t_json = _timed(compress, body, encoding)
+        packed_csv, t_csv = _timed(compress, csv_bytes, encoding)
+        print(f"  {encoding:<5} base64 JSON {len(packed_json):>12,} B {t_json * 1000:7.1f} ms | "
+              f"CSV {len(packed_csv):>10,} B {t_csv * 1000:7.1f} ms")
+
+
+def bench_chat(turns, latency_ms, ms_per_kchar, reply_chars, token_budget, recent_turns):
+    """Prompt size and latency per turn: full history resent every turn vs server-side sessions"""
+    from chat_sessions import ChatSessionStore, build_preamble
+    from fake_llm import FakeGenerativeModel
+
+    model = FakeGenerativeModel('bench', latency_ms=latency_ms, error_rate=0.0, max_concurrency=1000,
+                                ms_per_kchar=ms_per_kchar, reply_chars=reply_chars)
+    context = {'profile_name': 'Tech-Oriented Dev Track', 'technical_score': 4,
+               'roles': 'Software Engineer, Full Stack Developer, DevOps Engineer, System Architect'}
+    questions = ["Which certification should I take next and why?",
+                 "How do I prepare for product company interviews in six months?",
+                 "Should I do a second internship or focus on open source?",
+                 "What projects would make my resume stand out for backend roles?"]
+
+    def run(label, next_prompt, on_reply):
+        sizes, latencies = [], []
+        for turn in range(turns):
+            message = questions[turn % len(questions)]
+            prompt = next_prompt(message)
+            t0 = time.perf_counter()
+            reply = model.generate_content(prompt).text
+            latencies.append(time.perf_counter() - t0)
+            sizes.append(len(prompt))
+            on_reply(message, reply)
+        print(f"{label}: prompt chars first {sizes[0]:,} / last {sizes[-1]:,} / mean {np.mean(sizes):,.0f}; "
+              f"latency mean {np.mean(latencies) * 1000:.0f} ms, last {latencies[-1] * 1000:.0f} ms")
+
+    history = []
+    preamble = build_preamble(context)
+    run("full history", lambda m: "\n\n".join([preamble] + history + [f"Student: {m}"]),
+        lambda m, r: history.extend([f"Student: {m}", f"Counsellor: {r}"]))
+
+    store = ChatSessionStore(token_budget=token_budget, recent_turns=recent_turns)
+    session, _ = store.get_or_create(None, context)
+    run("sessions    ", lambda m: store.build_prompt(session, m), lambda m, r: store.record(session, m, r))
+    print(f"    {store.stats()}")
+
+
+def bench_inference_threads(client_counts, requests_per_client, rows_per_request):
+    """Concurrent preprocess + KMeans + PCA on the shared models, with and without native thread control"""
+    import os
+    import threading
+    os.environ.setdefault('DISABLE_BACKGROUND_TASKS', '1')
+    import app
+
+    kmeans, threads = app.kmeans_model, app.native_threads
+    inputs = [synthetic_students(rows_per_request, seed=i) for i in range(32)]
+
+    def infer(df):
+        clusters = app.predict_clusters(df, observe=False)
+        features = app.shadow_features(df)
+        return clusters, app.get_embeddings(features[:, :len(app.NUMERICAL_COLS)])
+
+    # Serial answers are the reference every concurrent answer must match
+    reference = [infer(df) for df in inputs]
+    fitted = threads.fitted.get(kmeans, kmeans._n_threads)
+
+    def run(clients):
+        latencies, mismatches = [], [0]
+        lock = threading.Lock()
+        start = threading.Barrier(clients)
+
+        def client(c):
+            mine = []
+            start.wait()
+            for r in range(requests_per_client):
+                i = (c * requests_per_client + r) % len(inputs)
+                t0 = time.perf_counter()
+                clusters, embeddings = infer(inputs[i])
+                mine.append(time.perf_counter() - t0)
+                if not (np.array_equal(clusters, reference[i][0])
+                        and np.array_equal(embeddings, reference[i][1])):
+                    with lock:
+                        mismatches[0] += 1
+            with lock:
+                latencies.extend(mine)
+
+        workers = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+        t0 = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return len(latencies) / (time.perf_counter() - t0), latencies, mismatches[0]
+
+    print(f"rows/request={rows_per_request} requests/client={requests_per_client} cpus={os.cpu_count()} "
+          f"(KMeans fitted with {fitted} OpenMP thread(s))")
+    for label, controlled in (('uncontrolled', False), ('controlled  ', True)):
+        if controlled:
+            threads.enabled = True
+            threads.pin()
+            threads.prepare(kmeans)
+        else:
+            threads.unpin()
+            threads.restore(kmeans)
+            threads.enabled = False
+        print(f"  {label} {threads.info()['native_pools']} kmeans n_threads={kmeans._n_threads}")
+        for clients in client_counts:
+            throughput, latencies, mismatches = run(clients)
+            print(f"    clients={clients:<3} {throughput:9.1f} req/s  p50 {_percentile(latencies, 50):7.2f} ms  "
+                  f"p99 {_percentile(latencies, 99):7.2f} ms  mismatches={mismatches}")
+
+
+def _rss_mb():
+    import os
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def _measure_writer(rows, fmt):
+    """Runs in a fresh process: (seconds, peak RSS growth in MB while writing, file MB)"""
+    import os
+    import tempfile
+    import threading
+    from result_writers import write_result
+
+    df = synthetic_students(rows)
+    names = np.array(['Tech-Oriented Dev Track', 'Research & Higher Studies', 'Corporate/Management Oriented',
+                      'Entrepreneurial Track', 'Low-skill / Needs Intervention'], dtype=object)
+    df['USN'] = [f"1XX{i:08d}" for i in range(rows)]
+    df['Cluster_ID'] = np.arange(rows) % len(names)
+    df['Profile_Name'] = names[df['Cluster_ID'].to_numpy()]
+    df['Suggested_Roles'] = 'Software Engineer, Full Stack Developer, DevOps Engineer'
+    fd, path = tempfile.mkstemp(suffix='.' + fmt.split('-')[0])
+    os.close(fd)
+
+    base = _rss_mb()
+    peak = [base]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], _rss_mb())
+            done.wait(0.005)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    t0 = time.perf_counter()
+    try:
+        if fmt == 'xlsx-default':
+            df.to_excel(path, index=False, engine='openpyxl')
+        else:
+            write_result(df, path, fmt)
+    finally:
+        done.set()
+        sampler.join()
+    seconds = time.perf_counter() - t0
+    size = os.path.getsize(path) / 2 ** 20
+    os.remove(path)
+    return seconds, max(peak[0], _rss_mb()) - base, size
+
+
+def bench_result_writers(row_counts, formats, default_rows):
+    """Peak memory of the chunked result writers vs row count (one fresh process per run)"""
+    import multiprocessing as mp
+    ctx = mp.get_context('fork')
+
+    runs = [(rows, fmt) for rows in row_counts for fmt in formats]
+    runs += [(rows, 'xlsx-default') for rows in default_rows]
+    print(f"rows={row_counts} (peak = RSS growth above the loaded frame while writing)")
+    peaks = {}
+    for rows, fmt in runs:
+        with ctx.Pool(1) as pool:
+            seconds, peak, size = pool.apply(_measure_writer, (rows, fmt))
+        peaks.setdefault(fmt, []).append(peak)
+        print(f"  {fmt:<13} rows={rows:>10,}  {seconds:8.1f}s  {rows / seconds:>9,.0f} rows/s  "
+              f"peak +{peak:7.1f} MB  file {size:7.1f} MB")
+    for fmt in formats:
+        if len(peaks.get(fmt, [])) > 1:
+            print(f"  {fmt}: peak at {row_counts[-1]:,} rows is {peaks[fmt][-1] - peaks[fmt][0]:+.1f} MB "
+                  f"vs {row_counts[0]:,} rows")
+
+
+def bench_similarity_index(rows, dim, queries, nprobes, n_lists):
+    """IVF query latency and recall@10 against brute force at archive scale"""
+    import shutil
+    import tempfile
+    from sklearn.cluster import KMeans
+    from similarity import SimilarityIndex, build_index, measure_recall
+
+    # Standardised-looking embeddings: a mixture of many student "types"
+    rng = np.random.default_rng(0)
+    centers = rng.normal(0, 1, (200, dim)).astype(np.float32)
+    def draw(n):
+        return centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.6, (n, dim)).astype(np.float32)
+    vectors = draw(rows)
+    held_out = draw(queries)  # queries are new students, not stored rows
+    kmeans = KMeans(n_clusters=5, n_init=1, random_state=0).fit(vectors[:20000])
+
+    print(f"rows={rows:,} dim={dim} queries={queries}")
+    layouts = [('kmeans lists', 0), ('auto lists', n_lists)]
+    for label, lists in layouts:
+        out_dir = tempfile.mkdtemp(prefix='ivf-bench-')
+        try:
+            meta, t_build = _timed(build_index, vectors, kmeans, out_dir, lists)
+            index = SimilarityIndex(out_dir)
+            print(f"  {label}: {meta['n_lists']} lists, built in {t_build:.1f}s, "
+                  f"default nprobe {index.default_nprobe}")
+            for nprobe in [None] + [p for p in nprobes if p < index.n_lists]:
+                stats = measure_recall(index, held_out, k=10, nprobe=nprobe)
+                scanned = np.mean([_probed_rows(index, q, stats['nprobe']) for q in held_out[:50]])
+                print(f"    nprobe {stats['nprobe']:>4} {'(default)' if nprobe is None else '':<10}"
+                      f"recall@10 {stats['recall']:.3f}  p50 {stats['p50_latency_ms']:7.2f} ms  "
+                      f"p99 {stats['p99_latency_ms']:7.2f} ms  scans {scanned / rows * 100:5.1f}% of rows")
+            latencies = []
+            for q in held_out:
+                _, seconds = _timed(index.brute_force, q, 10)
+                latencies.append(seconds * 1000)
+            print(f"    brute force           p50 {np.percentile(latencies, 50):7.2f} ms  "
+                  f"p99 {np.percentile(latencies, 99):7.2f} ms")
+            del index
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def _probed_rows(index, q, nprobe):
+    c_dist = ((index.centroids - q) ** 2).sum(axis=1)
+    probe = np.argsort(c_dist)[:nprobe]
+    return int((index.offsets[probe + 1] - index.offsets[probe]).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend benchmarks")
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p = sub.add_parser('api-calculator')
+    p.add_argument('--rows', type=int, default=1_000_000)
+
+    p = sub.add_parser('llm-gateway')
+    p.add_argument('--clients', type=int, default=64)
+    p.add_argument('--calls-per-client', type=int, default=4)
+    p.add_argument('--latency-ms', type=float, default=100)
+    p.add_argument('--upstream-concurrency', type=int, default=8)
+    p.add_argument('--error-rate', type=float, default=0.02)
+
+    p = sub.add_parser('prediction-store')
+    p.add_argument('--rows', type=int, default=10_000_000)
+    p.add_argument('--uploads', type=int, default=20)
+
+    p = sub.add_parser('validation')
+    p.add_argument('--rows', type=int, default=1_000_000)
+
+    p = sub.add_parser('parallel-scoring')
+    p.add_argument('--rows', type=int, default=2_000_000)
+    p.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16, 32])
+
+    p = sub.add_parser('responses')
+    p.add_argument('--rows', type=int, default=100_000)
+
+    p = sub.add_parser('chat')
+    p.add_argument('--turns', type=int, default=30)
+    p.add_argument('--latency-ms', type=float, default=150)
+    p.add_argument('--ms-per-kchar', type=float, default=25)
+    p.add_argument('--reply-chars', type=int, default=800)
+    p.add_argument('--token-budget', type=int, default=1500)
+    p.add_argument('--recent-turns', type=int, default=6)
+
+    p = sub.add_parser('inference-threads')
+    p.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64])
+    p.add_argument('--requests-per-client', type=int, default=20)
+    p.add_argument('--rows-per-request', type=int, default=64)
+
+    p = sub.add_parser('result-writers')
+    p.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    p.add_argument('--formats', nargs='+', default=['csv', 'xlsx', 'parquet'])
+    p.add_argument('--default-rows', type=int, nargs='*', default=[100_000],
+                   help="Also time pandas' in-memory to_excel at these sizes")
+
+    p = sub.add_parser('similarity-index')
+    p.add_argument('--rows', type=int, default=1_000_000)
+    p.add_argument('--dim', type=int, default=17)
+    p.add_argument('--queries', type=int, default=500)
+    p.add_argument('--nprobes', type=int, nargs='*', default=[8, 16, 32, 64])
+    p.add_argument('--n-lists', type=int, default=None, help="Default: similarity.default_n_lists")
+
+    args = parser.parse_args()
+    if args.bench == 'api-calculator':
+        bench_api_calculator(args.rows)
+    elif args.bench == 'llm-gateway':
+        bench_llm_gateway(args.clients, args.calls_per_client, args.latency_ms,
+                          args.upstream_concurrency, args.error_rate)
+    elif args.bench == 'prediction-store':
+        bench_prediction_store(args.rows, args.uploads)
+    elif args.bench == 'validation':
+        bench_validation(args.rows)
+    elif args.bench == 'parallel-scoring':
+        bench_parallel_scoring(args.rows, args.workers)
+    elif args.bench == 'responses':
+        bench_responses(args.rows)
+    elif args.bench == 'chat':
+        bench_chat(args.turns, args.latency_ms, args.ms_per_kchar, args.reply_chars,
+                   args.token_budget, args.recent_turns)
+    elif args.bench == 'inference-threads':
+        bench_inference_threads(args.clients, args.requests_per_client, args.rows_per_request)
+    elif args.bench == 'result-writers':
+        bench_result_writers(args.rows, args.formats, args.default_rows)
+    elif args.bench == 'similarity-index':
+        bench_similarity_index(args.rows, args.dim, args.queries, args.nprobes, args.n_lists)
+
+
+if __name__ == '__main__':
+    main()
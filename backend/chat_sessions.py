@@ -0,0 +1,174 @@
+"""
+Server-side chat sessions for /chat with a bounded prompt.
+
+A session keeps the student-context preamble (built once when the session
+starts), the last few turns verbatim and a rolling extractive summary of
+everything older. Each upstream prompt is assembled from those parts and kept
+under a token budget: the full preamble only goes out on the first turn, later
+turns carry a one-line context reminder, and turns that no longer fit are
+folded into the summary (oldest summary lines are dropped last). Summaries are
+built locally, so keeping the prompt small never costs an extra LLM call.
+
+Sessions are evicted least-recently-used once the store is full, and after an
+idle timeout.
+"""
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Rough token estimate: ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+SUMMARY_LINE_CHARS = 160
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _first_sentence(text, limit=SUMMARY_LINE_CHARS):
+    text = re.sub(r'\s+', ' ', str(text)).strip()
+    match = re.match(r'(.+?[.!?])(\s|$)', text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 3].rstrip() + '...'
+
+
+def build_preamble(context):
+    return (
+        "You are a helpful Career Counselor AI.\n"
+        "Context about the student:\n"
+        f"- Profile: {context.get('profile_name', 'Student')}\n"
+        f"- Suggested Roles: {context.get('roles', 'N/A')}\n"
+        f"- Technical Skill Score: {context.get('technical_score', 'N/A')}/5\n"
+        "Answer the student's question based on this profile. Be encouraging and practical."
+    )
+
+
+def build_reminder(context):
+    return (f"(Career counsellor for a {context.get('profile_name', 'student')} profile; "
+            f"roles: {context.get('roles', 'N/A')}; technical score {context.get('technical_score', 'N/A')}/5)")
+
+
+class ChatSession:
+    def __init__(self, session_id, context):
+        self.id = session_id
+        self.preamble = build_preamble(context)
+        self.reminder = build_reminder(context)
+        self.turns = deque()      # (role, text), role is 'user' or 'ai'
+        self.summary = deque()    # one short line per folded turn
+        self.total_turns = 0
+        self.preamble_sent = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def fold_oldest(self):
+        role, text = self.turns.popleft()
+        who = 'Student asked' if role == 'user' else 'Counsellor said'
+        self.summary.append(f"{who}: {_first_sentence(text)}")
+
+    def add_turn(self, role, text):
+        self.turns.append((role, str(text)))
+        self.total_turns += 1
+
+
+class ChatSessionStore:
+    def __init__(self, max_sessions=10000, idle_ttl_seconds=1800, token_budget=1500, recent_turns=6):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl_seconds
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.sessions = OrderedDict()  # id -> ChatSession, least recently used first
+        self.lock = threading.Lock()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self.prompt_tokens = 0
+        self.prompts = 0
+
+    def _expire(self, now):
+        while self.sessions:
+            oldest = next(iter(self.sessions.values()))
+            if now - oldest.last_used <= self.idle_ttl:
+                break
+            self.sessions.popitem(last=False)
+            self.evicted_idle += 1
+
+    def get_or_create(self, session_id, context, history=None):
+        """Existing live session, or a new one seeded from the client's history"""
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            session = self.sessions.get(session_id) if session_id else None
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+                session.last_used = now
+                return session, False
+
+            session = ChatSession(uuid.uuid4().hex, context or {})
+            for item in history or []:
+                if isinstance(item, dict) and item.get('content'):
+                    session.add_turn('user' if item.get('role') == 'user' else 'ai', item['content'])
+            self.sessions[session.id] = session
+            self.created += 1
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted_lru += 1
+        return session, True
+
+    def build_prompt(self, session, message):
+        """Prompt for the next turn within the token budget; folds old turns as needed"""
+        with session.lock:
+            while len(session.turns) > self.recent_turns:
+                session.fold_oldest()
+
+            # The upstream model is stateless, so later turns get a one-line reminder instead
+            header = session.reminder if session.preamble_sent else session.preamble
+
+            def assemble():
+                parts = [header]
+                if session.summary:
+                    parts.append("Conversation so far (summary):\n" + "\n".join(session.summary))
+                if session.turns:
+                    parts.append("\n".join(f"{'Student' if role == 'user' else 'Counsellor'}: {text}"
+                                          for role, text in session.turns))
+                parts.append(f"Student: {message}")
+                return "\n\n".join(parts)
+
+            prompt = assemble()
+            while estimate_tokens(prompt) > self.token_budget and session.turns:
+                session.fold_oldest()
+                prompt = assemble()
+            while estimate_tokens(prompt) > self.token_budget and session.summary:
+                session.summary.popleft()
+                prompt = assemble()
+
+        with self.lock:
+            self.prompts += 1
+            self.prompt_tokens += estimate_tokens(prompt)
+        return prompt
+
+    def record(self, session, message, reply):
+        with session.lock:
+            session.add_turn('user', message)
+            session.add_turn('ai', reply)
+            session.preamble_sent = True
+            session.last_used = time.monotonic()
+
+    def delete(self, session_id):
+        with self.lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def stats(self):
+        with self.lock:
+            self._expire(time.monotonic())
+            return {
+                'sessions': len(self.sessions),
+                'created': self.created,
+                'evicted_lru': self.evicted_lru,
+                'evicted_idle': self.evicted_idle,
+                'prompts': self.prompts,
+                'avg_prompt_tokens': round(self.prompt_tokens / self.prompts, 1) if self.prompts else 0,
+                'token_budget': self.token_budget,
+                'recent_turns': self.recent_turns
+            }
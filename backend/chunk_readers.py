@@ -0,0 +1,106 @@
+"""
+Chunked readers for CSV, XLSX and Parquet inputs, shared by the offline batch
+scorer and the shard coordinator. Every reader yields (chunk index, DataFrame)
+with exactly chunk_rows rows per chunk (the last one may be shorter) and can
+start at a given chunk index without parsing the chunks before it.
+"""
+import csv
+import glob
+import os
+
+import pandas as pd
+
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.parquet')  # legacy .xls would need xlrd
+
+
+def input_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(p for p in glob.glob(os.path.join(path, '*')) if p.endswith(INPUT_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def fingerprint(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+# --- readers; each yields (chunk index, DataFrame) from `start_chunk` on ---
+
+def _read_csv(path, chunk_rows, start_chunk):
+    if not start_chunk:
+        for i, chunk in enumerate(pd.read_csv(path, chunksize=chunk_rows)):
+            yield i, chunk
+        return
+    # Rows of finished chunks are stepped over with the csv module (quoted newlines
+    # included) and never converted. pandas' own skiprows, int or range, becomes a set
+    # of every skipped row number: hundreds of MB deep into a large file.
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    with open(path, newline='', encoding='utf-8') as f:
+        records = csv.reader(f)
+        for _ in range(start_chunk * chunk_rows + 1):
+            if next(records, None) is None:
+                return
+        for i, chunk in enumerate(pd.read_csv(f, chunksize=chunk_rows, header=None, names=header),
+                                  start_chunk):
+            if len(chunk):  # nothing left after the skipped prefix
+                yield i, chunk
+
+
+def _read_parquet(path, chunk_rows, start_chunk):
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    # Whole row groups that lie inside the finished prefix are never read
+    skip_rows, first_group = start_chunk * chunk_rows, 0
+    while (first_group < parquet.num_row_groups
+           and parquet.metadata.row_group(first_group).num_rows <= skip_rows):
+        skip_rows -= parquet.metadata.row_group(first_group).num_rows
+        first_group += 1
+    groups = list(range(first_group, parquet.num_row_groups))
+    if not groups:
+        return
+    index, buffered = start_chunk, []
+    for batch in parquet.iter_batches(batch_size=chunk_rows, row_groups=groups):
+        df = batch.to_pandas()
+        if skip_rows:
+            dropped = min(skip_rows, len(df))
+            df, skip_rows = df.iloc[dropped:], skip_rows - dropped
+        buffered.append(df)
+        # Batches don't span row groups, so re-cut them to exactly chunk_rows
+        while sum(len(b) for b in buffered) >= chunk_rows:
+            joined = pd.concat(buffered, ignore_index=True)
+            yield index, joined.iloc[:chunk_rows]
+            buffered, index = [joined.iloc[chunk_rows:]], index + 1
+    rest = pd.concat(buffered, ignore_index=True) if buffered else None
+    if rest is not None and len(rest):
+        yield index, rest
+
+
+def _read_excel(path, chunk_rows, start_chunk):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    header = [str(c).strip() if c is not None else '' for c in next(rows)]
+    index, buffer = 0, []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) == chunk_rows:
+            if index >= start_chunk:
+                yield index, pd.DataFrame(buffer, columns=header)
+            index, buffer = index + 1, []
+    if buffer and index >= start_chunk:
+        yield index, pd.DataFrame(buffer, columns=header)
+    workbook.close()
+
+
+def read_chunks(path, chunk_rows, start_chunk=0):
+    if path.endswith('.csv'):
+        return _read_csv(path, chunk_rows, start_chunk)
+    if path.endswith('.parquet'):
+        return _read_parquet(path, chunk_rows, start_chunk)
+    if path.endswith('.xlsx'):
+        return _read_excel(path, chunk_rows, start_chunk)
+    raise ValueError(f"Unsupported input {path}; use one of {', '.join(INPUT_EXTENSIONS)}")
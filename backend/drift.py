@@ -0,0 +1,223 @@
+"""
+Streaming feature-drift monitor.
+
+Keeps running statistics for the traffic that reaches preprocess_features and
+compares them with what the StandardScaler / LabelEncoders were fitted on:
+  - numerical features: count, Welford mean / M2 (merged per batch with Chan's
+    parallel update) and a fixed-bin histogram over the reference z-range
+  - categorical features: unseen-category rate against the encoder vocabulary
+  - both: missing-value rate (values that preprocessing silently fills)
+State is a handful of small arrays, so updating it per batch is a few
+vectorized passes, and it is saved to JSON so it survives restarts.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+# Histogram covers +-Z_RANGE reference standard deviations, plus under/overflow bins
+Z_RANGE = 3.0
+TOP_UNSEEN = 20
+
+
+def _normal_cdf(z):
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2.0)))
+
+
+class DriftMonitor:
+    def __init__(self, state_path, numerical_cols, categorical_cols, scaler,
+                 label_encoders=None, n_bins=10, save_every_seconds=30.0):
+        self.state_path = state_path
+        os.makedirs(os.path.dirname(state_path) or '.', exist_ok=True)
+        self.numerical_cols = list(numerical_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.n_bins = n_bins
+        self.save_every_seconds = save_every_seconds
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # one writer of the state file at a time
+        self.last_saved = 0.0
+
+        self.ref_mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.ref_std = np.sqrt(np.asarray(scaler.var_, dtype=np.float64))
+        self.ref_std[self.ref_std == 0] = 1.0
+        self.vocab = {col: set(map(str, le.classes_)) for col, le in (label_encoders or {}).items()}
+
+        # Expected bin mass if the feature still looks like the fitted data (normal approx.)
+        edges = np.linspace(-Z_RANGE, Z_RANGE, n_bins + 1)
+        cdf = np.array([_normal_cdf(z) for z in edges])
+        self.expected = np.concatenate([[cdf[0]], np.diff(cdf), [1.0 - cdf[-1]]])
+
+        self.reset()
+        self._load()
+
+    def reset(self):
+        f = len(self.numerical_cols)
+        with self.lock:
+            self.rows = 0
+            self.batches = 0
+            self.count = np.zeros(f)
+            self.mean = np.zeros(f)
+            self.m2 = np.zeros(f)
+            self.num_missing = np.zeros(f)
+            self.hist = np.zeros((f, self.n_bins + 2))
+            self.cat_missing = {c: 0 for c in self.categorical_cols}
+            self.cat_unseen = {c: 0 for c in self.categorical_cols}
+            self.unseen_values = {c: {} for c in self.categorical_cols}
+            self.started_at = time.time()
+
+    def observe(self, numeric, categorical):
+        """Fold one batch in.
+
+        numeric: (n, len(numerical_cols)) float array, NaN where missing/unparsable
+        categorical: {col: (missing mask, unseen mask, raw string values)}
+        """
+        summary = self.summarize(numeric, categorical)
+        if summary is not None:
+            self.merge(summary)
+
+    def summarize(self, numeric, categorical):
+        """Batch statistics only, no shared state touched (safe in forked scoring workers)"""
+        x = np.asarray(numeric, dtype=np.float64)
+        if x.size == 0:
+            return None
+        present = ~np.isnan(x)
+        n_b = present.sum(axis=0).astype(np.float64)
+        safe_n = np.maximum(n_b, 1)
+        mean_b = np.where(present, x, 0).sum(axis=0) / safe_n
+        m2_b = np.where(present, (x - mean_b) ** 2, 0).sum(axis=0)
+
+        # Histogram bin per value in reference z-space, all features at once
+        z = (x - self.ref_mean) / self.ref_std
+        width = 2 * Z_RANGE / self.n_bins
+        bins = np.clip(np.floor((z + Z_RANGE) / width) + 1, 0, self.n_bins + 1)
+        bins = np.where(present, bins, 0).astype(np.int64)
+        offsets = np.arange(x.shape[1]) * (self.n_bins + 2)
+        flat = (bins + offsets)[present]
+        hist_b = np.bincount(flat, minlength=x.shape[1] * (self.n_bins + 2)).reshape(x.shape[1], -1)
+
+        cat = {}
+        for col, (missing, unseen, values) in categorical.items():
+            top = {}
+            if np.any(unseen):
+                labels, counts = np.unique(np.asarray(values)[unseen], return_counts=True)
+                top = dict(zip(labels.tolist(), counts.tolist()))
+            cat[col] = (int(np.sum(missing)), int(np.sum(unseen)), top)
+
+        return {'rows': x.shape[0], 'n': n_b, 'mean': mean_b, 'm2': m2_b,
+                'missing': (~present).sum(axis=0), 'hist': hist_b, 'categorical': cat}
+
+    def merge(self, summary, new_batch=True):
+        """Chan's parallel update of the running state with one batch summary"""
+        n_b, mean_b, m2_b = summary['n'], summary['mean'], summary['m2']
+        with self.lock:
+            n_a = self.count
+            n = n_a + n_b
+            delta = mean_b - self.mean
+            has = n > 0
+            self.mean = np.where(has, self.mean + delta * n_b / np.maximum(n, 1), self.mean)
+            self.m2 = np.where(has, self.m2 + m2_b + delta ** 2 * n_a * n_b / np.maximum(n, 1), self.m2)
+            self.count = n
+            self.num_missing += summary['missing']
+            self.hist += summary['hist']
+            self.rows += summary['rows']
+            self.batches += int(new_batch)
+
+            for col, (missing, unseen, top) in summary['categorical'].items():
+                self.cat_missing[col] += missing
+                self.cat_unseen[col] += unseen
+                seen = self.unseen_values[col]
+                for label, c in top.items():
+                    if label in seen or len(seen) < TOP_UNSEEN:
+                        seen[label] = seen.get(label, 0) + c
+
+            due = time.time() - self.last_saved >= self.save_every_seconds
+        if due:
+            self.save()
+
+    def report(self):
+        with self.lock:
+            numerical = {}
+            for j, col in enumerate(self.numerical_cols):
+                n = self.count[j]
+                std = math.sqrt(self.m2[j] / (n - 1)) if n > 1 else 0.0
+                observed = self.hist[j] / n if n else np.zeros_like(self.hist[j])
+                # Population stability index against the expected normal bin mass
+                eps = 1e-6
+                psi = float(np.sum((observed - self.expected) * np.log((observed + eps) / (self.expected + eps)))) if n else 0.0
+                numerical[col] = {
+                    'count': int(n),
+                    'mean': round(float(self.mean[j]), 4),
+                    'std': round(std, 4),
+                    'ref_mean': round(float(self.ref_mean[j]), 4),
+                    'ref_std': round(float(self.ref_std[j]), 4),
+                    'mean_shift_sd': round(float((self.mean[j] - self.ref_mean[j]) / self.ref_std[j]), 4) if n else 0.0,
+                    'variance_ratio': round((std / self.ref_std[j]) ** 2, 4) if n > 1 else None,
+                    'psi': round(psi, 4),
+                    'missing_rate': round(float(self.num_missing[j] / self.rows), 4) if self.rows else 0.0,
+                    'histogram': self.hist[j].astype(int).tolist()
+                }
+
+            categorical = {}
+            for col in self.categorical_cols:
+                categorical[col] = {
+                    'unseen_rate': round(self.cat_unseen[col] / self.rows, 4) if self.rows else 0.0,
+                    'missing_rate': round(self.cat_missing[col] / self.rows, 4) if self.rows else 0.0,
+                    'has_vocabulary': col in self.vocab,
+                    'top_unseen': dict(sorted(self.unseen_values[col].items(), key=lambda kv: -kv[1])[:10])
+                }
+
+            return {
+                'rows_observed': int(self.rows),
+                'batches_observed': int(self.batches),
+                'since': self.started_at,
+                'histogram_edges_sd': np.linspace(-Z_RANGE, Z_RANGE, self.n_bins + 1).tolist(),
+                'numerical': numerical,
+                'categorical': categorical
+            }
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                state = {
+                    'numerical_cols': self.numerical_cols,
+                    'n_bins': self.n_bins,
+                    'rows': self.rows, 'batches': self.batches, 'started_at': self.started_at,
+                    'count': self.count.tolist(), 'mean': self.mean.tolist(), 'm2': self.m2.tolist(),
+                    'num_missing': self.num_missing.tolist(), 'hist': self.hist.tolist(),
+                    # Copies: json.dump runs outside self.lock while observe() keeps counting
+                    'cat_missing': dict(self.cat_missing), 'cat_unseen': dict(self.cat_unseen),
+                    'unseen_values': {col: dict(v) for col, v in self.unseen_values.items()}
+                }
+                self.last_saved = time.time()
+            try:
+                tmp_path = self.state_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                print(f"Drift state save error: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            if state['numerical_cols'] != self.numerical_cols or state['n_bins'] != self.n_bins:
+                print("Drift state layout changed, starting fresh")
+                return
+            self.rows, self.batches, self.started_at = state['rows'], state['batches'], state['started_at']
+            self.count = np.asarray(state['count'])
+            self.mean = np.asarray(state['mean'])
+            self.m2 = np.asarray(state['m2'])
+            self.num_missing = np.asarray(state['num_missing'])
+            self.hist = np.asarray(state['hist'])
+            for col in self.categorical_cols:
+                self.cat_missing[col] = state['cat_missing'].get(col, 0)
+                self.cat_unseen[col] = state['cat_unseen'].get(col, 0)
+                self.unseen_values[col] = state['unseen_values'].get(col, {})
+        except Exception as e:
+            print(f"Drift state load error: {e}")
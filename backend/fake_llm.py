@@ -0,0 +1,85 @@
+"""
+Local stand-in for genai.GenerativeModel, used for load tests (LLM_BACKEND=fake).
+
+It sleeps for a configurable latency (optionally growing with prompt size, like
+a real model's prefill) and answers 429s like a rate-limited upstream: randomly
+at FAKE_LLM_ERROR_RATE, and always when more than FAKE_LLM_MAX_CONCURRENCY
+calls are in flight at once. A request_options timeout shorter than the
+latency ends the call at the timeout with FakeDeadlineExceeded, like the real
+client.
+"""
+import os
+import random
+import threading
+import time
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the upstream 429 Resource Exhausted error"""
+
+
+class FakeDeadlineExceeded(Exception):
+    """Mimics the upstream 504 Deadline Exceeded error"""
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    lock = threading.Lock()
+    in_flight = 0
+    calls = 0
+    rate_limited = 0
+    prompt_chars = 0
+
+    def __init__(self, model_name='fake', latency_ms=None, error_rate=None, max_concurrency=None,
+                 ms_per_kchar=None, reply_chars=None):
+        self.model_name = model_name
+        self.latency = (latency_ms if latency_ms is not None
+                        else float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))) / 1000.0
+        self.error_rate = (error_rate if error_rate is not None
+                           else float(os.getenv("FAKE_LLM_ERROR_RATE", "0.0")))
+        self.max_concurrency = (max_concurrency if max_concurrency is not None
+                                else int(os.getenv("FAKE_LLM_MAX_CONCURRENCY", "8")))
+        self.ms_per_kchar = (ms_per_kchar if ms_per_kchar is not None
+                             else float(os.getenv("FAKE_LLM_MS_PER_KCHAR", "0")))
+        self.reply_chars = (reply_chars if reply_chars is not None
+                            else int(os.getenv("FAKE_LLM_REPLY_CHARS", "0")))
+
+    def generate_content(self, prompt, **kwargs):
+        cls = FakeGenerativeModel
+        with cls.lock:
+            cls.calls += 1
+            cls.prompt_chars += len(str(prompt))
+            cls.in_flight += 1
+            overloaded = cls.in_flight > self.max_concurrency
+        try:
+            if overloaded or random.random() < self.error_rate:
+                with cls.lock:
+                    cls.rate_limited += 1
+                time.sleep(self.latency / 10)
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+            latency = self.latency + len(str(prompt)) / 1000.0 * self.ms_per_kchar / 1000.0
+            timeout = (kwargs.get('request_options') or {}).get('timeout')
+            if timeout is not None and timeout < latency:
+                time.sleep(timeout)
+                raise FakeDeadlineExceeded("504 Deadline Exceeded")
+            time.sleep(latency)
+            text = f"[fake {self.model_name}] 6 month plan for: {str(prompt)[:80].strip()}"
+            if len(text) < self.reply_chars:
+                filler = " Focus on one project, one certification and steady practice every week."
+                text += filler * ((self.reply_chars - len(text)) // len(filler) + 1)
+            return _Response(text)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def start_chat(self, history=None):
+        return None
+
+    @classmethod
+    def reset_counters(cls):
+        with cls.lock:
+            cls.calls = cls.rate_limited = cls.prompt_chars = 0
@@ -0,0 +1,136 @@
+"""
+Response encoding: a fast JSON provider and negotiated compression.
+
+FastJSONProvider swaps Flask's stdlib encoder for orjson when it is installed.
+orjson writes NumPy arrays and scalars natively (no int(...) casts needed) and
+emits NaN as null. Without orjson the stdlib encoder is used with a default()
+hook that understands NumPy types, so behaviour stays the same.
+
+compress_response() picks zstd, brotli or gzip from Accept-Encoding (by q-value,
+then by our preference), skipping small or already-compressed bodies. zstd and
+brotli are optional; gzip is always available.
+"""
+import gzip
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/csv', 'text/plain', 'application/x-ndjson')
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip of the default provider
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def available_encodings():
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def choose_encoding(accept_encoding):
+    """Best supported coding for an Accept-Encoding header, or None"""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            offered[name] = q
+
+    supported = available_encodings()
+    candidates = []
+    for rank, name in enumerate(supported):
+        q = offered.get(name, offered.get('*', 0.0))
+        if q > 0:
+            candidates.append((-q, rank, name))
+    return min(candidates)[2] if candidates else None
+
+
+def compress(body, encoding, level=None):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 3).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=level or 4)
+    return gzip.compress(body, compresslevel=level or 3)
+
+
+def compress_response(response, accept_encoding, min_bytes=1024):
+    """Compress a buffered Flask response in place when it is worth it"""
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,193 @@
+"""
+Admission control for outbound LLM calls.
+
+Every generate_content call goes through one shared LLMGateway:
+  - a semaphore caps in-flight upstream calls
+  - a bounded wait queue sheds requests when it is full or when a caller's
+    deadline passes before a slot frees up
+  - whatever is left of the deadline is handed to the upstream call as its own
+    timeout, so a hung upstream cannot hold a slot past the deadline
+  - a token bucket keeps the sustained call rate under the upstream quota
+  - a circuit breaker stops calling upstream after repeated failures (e.g.
+    429s) and lets a single probe through once the reset timeout passes
+Callers catch GatewayRejected and fall back to a cached or template answer.
+"""
+import threading
+import time
+
+
+class GatewayRejected(Exception):
+    """The gateway refused to send the call upstream"""
+
+    def __init__(self, reason):
+        super().__init__(f"LLM call rejected: {reason}")
+        self.reason = reason
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, burst):
+        self.rate = rate_per_second
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """Take one token, waiting until the deadline at most"""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+            # Half-open: exactly one probe decides whether we close again
+            if self.state == self.HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        # The call never reached upstream, so it says nothing about its health
+        with self.lock:
+            self.probe_in_flight = False
+
+
+class LLMGateway:
+    def __init__(self, max_concurrency=4, max_queue=16, rate_per_second=2.0, burst=4,
+                 failure_threshold=5, reset_seconds=30.0, default_timeout=20.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.counters = {'calls': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'shed_queue_full': 0,
+                         'shed_deadline': 0, 'shed_rate_limited': 0, 'shed_circuit_open': 0}
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def call(self, fn, timeout=None):
+        """Run fn(remaining_seconds) under admission control; raises GatewayRejected when shed
+
+        fn must pass remaining_seconds on as the upstream call's timeout (for genai,
+        request_options={'timeout': remaining_seconds}). A call that fails once the
+        deadline has passed is counted as timed out; like any upstream failure it
+        counts against the circuit breaker.
+        """
+        deadline = time.monotonic() + (timeout or self.default_timeout)
+        self._count('calls')
+
+        if not self.breaker.allow():
+            self._count('shed_circuit_open')
+            raise GatewayRejected('circuit_open')
+
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                self.counters['shed_queue_full'] += 1
+                self.breaker.release_probe()
+                raise GatewayRejected('queue_full')
+            self.waiting += 1
+        try:
+            acquired = self.slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if not acquired:
+            self._count('shed_deadline')
+            self.breaker.release_probe()
+            raise GatewayRejected('deadline')
+
+        try:
+            if not self.bucket.acquire(deadline):
+                self._count('shed_rate_limited')
+                self.breaker.release_probe()
+                raise GatewayRejected('rate_limited')
+
+            with self.lock:
+                self.in_flight += 1
+            try:
+                result = fn(max(0.001, deadline - time.monotonic()))
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        except GatewayRejected:
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            self._count('failed')
+            if time.monotonic() >= deadline:
+                self._count('timed_out')
+            raise
+        finally:
+            self.slots.release()
+
+        self.breaker.record_success()
+        self._count('succeeded')
+        return result
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update({
+                'queue_depth': self.waiting,
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'shed_total': sum(v for k, v in self.counters.items() if k.startswith('shed_'))
+            })
+        stats['breaker'] = {
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'times_opened': self.breaker.times_opened
+        }
+        return stats
@@ -0,0 +1,336 @@
+"""
+Side-by-side model versions and shadow scoring.
+
+Model bundles (kmeans_model.pkl, scaler.pkl, label_encoders.pkl and
+cluster_info.pkl) live under models/versions/<name>/ and are all loaded at
+startup. Candidates named in SHADOW_MODELS re-score every batch upload on a
+background thread, after the response has been sent, and their assignments are
+accumulated into an agreement matrix against the live model:
+
+  - raw cluster-id agreement
+  - agreement after the best one-to-one matching of cluster ids (a retrained
+    KMeans numbers its clusters arbitrarily)
+  - agreement on profile names, which is what students actually see
+
+Preprocessing is keyed on the scaler + encoder files, so candidates that share
+them with the live model (the usual case when only KMeans is retrained) reuse
+the feature matrix the request itself built for the live model (UploadFeatures;
+the online centroid updater shares the same one).
+
+    python model_registry.py register <name> [--source DIR]   # snapshot a bundle
+"""
+import hashlib
+import os
+import pickle
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+BUNDLE_FILES = ['kmeans_model.pkl', 'scaler.pkl', 'label_encoders.pkl', 'cluster_info.pkl']
+PREPROCESS_FILES = ['scaler.pkl', 'label_encoders.pkl']
+
+
+def _files_hash(directory, names):
+    h = hashlib.sha256()
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def preprocess_key(directory):
+    """Bundles with equal keys produce identical feature matrices"""
+    return _files_hash(directory, PREPROCESS_FILES)
+
+
+class ModelBundle:
+    def __init__(self, name, path, prepare_model=None):
+        self.name = name
+        self.path = path
+        artifacts = {}
+        for filename in BUNDLE_FILES:
+            file_path = os.path.join(path, filename)
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    artifacts[filename] = pickle.load(f)
+        self.kmeans = artifacts['kmeans_model.pkl']
+        if prepare_model is not None:
+            self.kmeans = prepare_model(self.kmeans)
+        self.scaler = artifacts['scaler.pkl']
+        self.label_encoders = artifacts.get('label_encoders.pkl', {})
+        self.cluster_info = artifacts.get('cluster_info.pkl', {})
+        self.version = _files_hash(path, BUNDLE_FILES)
+        self.preprocess_key = preprocess_key(path)
+        self.n_clusters = int(self.kmeans.n_clusters)
+
+    def describe(self):
+        return {'name': self.name, 'version': self.version, 'preprocess_key': self.preprocess_key,
+                'n_clusters': self.n_clusters, 'n_features': int(getattr(self.kmeans, 'n_features_in_', 0))}
+
+
+class UploadFeatures:
+    """The live feature matrix of one upload, completed at most once and shared by its consumers
+
+    X holds the rows the request already preprocessed: all of them (rows=None) or the
+    ones selected by the boolean mask `rows` (row-cache misses). Anything not covered
+    is transformed on first use, on the consumer's thread, never on the request path.
+    """
+
+    def __init__(self, df, transform, X=None, rows=None):
+        self.df = df
+        self.transform = transform
+        self.X = X
+        self.rows = rows
+        self.lock = threading.Lock()
+        self._matrix = None
+
+    def matrix(self):
+        with self.lock:
+            if self._matrix is None:
+                if self.X is None:
+                    self._matrix = self.transform(self.df, None)
+                elif self.rows is None or self.rows.all():
+                    self._matrix = self.X
+                else:
+                    full = np.empty((len(self.df), self.X.shape[1]), dtype=self.X.dtype)
+                    full[self.rows] = self.X
+                    full[~self.rows] = self.transform(self.df[~self.rows], None)
+                    self._matrix = full
+                self.X = None
+            return self._matrix
+
+
+def _profile_names(cluster_info, clusters):
+    names = np.array([cluster_info.get(int(c), {}).get('name', f'Cluster {c}')
+                      for c in range(int(clusters.max()) + 1 if len(clusters) else 0)], dtype=object)
+    return names[clusters] if len(clusters) else names
+
+
+class Agreement:
+    """Live x candidate assignment counts, accumulated over shadow-scored uploads"""
+
+    def __init__(self, live_k, candidate_k):
+        self.matrix = np.zeros((live_k, candidate_k), dtype=np.int64)
+        self.profile_matches = 0
+        self.rows = 0
+        self.uploads = 0
+        self.updated_at = None
+
+    def add(self, live, candidate, live_names, candidate_names):
+        k_live, k_cand = self.matrix.shape
+        if live.max(initial=0) >= k_live or candidate.max(initial=0) >= k_cand:
+            grown = np.zeros((max(k_live, live.max() + 1), max(k_cand, candidate.max() + 1)), dtype=np.int64)
+            grown[:k_live, :k_cand] = self.matrix
+            self.matrix = grown
+        flat = live.astype(np.int64) * self.matrix.shape[1] + candidate
+        self.matrix += np.bincount(flat, minlength=self.matrix.size).reshape(self.matrix.shape)
+        self.profile_matches += int(np.sum(live_names == candidate_names))
+        self.rows += len(live)
+        self.uploads += 1
+        self.updated_at = time.time()
+
+    def report(self):
+        rows = max(self.rows, 1)
+        n = min(self.matrix.shape)
+        same_id = int(np.trace(self.matrix[:n, :n]))
+        # Best one-to-one relabelling of candidate clusters onto live ones
+        r, c = linear_sum_assignment(-self.matrix)
+        matched = int(self.matrix[r, c].sum())
+        return {
+            'rows': self.rows,
+            'uploads': self.uploads,
+            'updated_at': self.updated_at,
+            'matrix': self.matrix.tolist(),
+            'same_cluster_id_rate': round(same_id / rows, 4),
+            'matched_agreement_rate': round(matched / rows, 4),
+            'candidate_to_live': {int(b): int(a) for a, b in zip(r, c)},
+            'same_profile_rate': round(self.profile_matches / rows, 4),
+            'would_change_profile': self.rows - self.profile_matches
+        }
+
+
+class ModelRegistry:
+    def __init__(self, versions_dir, transform, shadow_names=(), max_queue=4, prepare_model=None):
+        """transform(df, bundle_or_None) -> float32 feature matrix; None means the live preprocessing
+
+        prepare_model(kmeans) -> kmeans is applied to every bundle as it is loaded.
+        """
+        self.versions_dir = versions_dir
+        self.transform = transform
+        self.prepare_model = prepare_model
+        self.lock = threading.Lock()
+        self.bundles = {}
+        self.errors = {}
+        self.shadow_names = [n for n in shadow_names if n]
+        self.agreements = {}
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.failed = 0
+        self.shadow_seconds = 0.0
+        self.thread = None
+        self.load()
+
+    def load(self):
+        bundles, errors = {}, {}
+        if os.path.isdir(self.versions_dir):
+            for name in sorted(os.listdir(self.versions_dir)):
+                path = os.path.join(self.versions_dir, name)
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    bundles[name] = ModelBundle(name, path, self.prepare_model)
+                except Exception as e:
+                    errors[name] = str(e)
+                    print(f"Model registry: could not load {name}: {e}")
+        with self.lock:
+            self.bundles, self.errors = bundles, errors
+            self.agreements = {}
+
+    def add(self, name):
+        """Load one new version without resetting the other versions' agreement stats"""
+        bundle = ModelBundle(name, os.path.join(self.versions_dir, name), self.prepare_model)
+        with self.lock:
+            self.bundles[name] = bundle
+            self.errors.pop(name, None)
+        return bundle
+
+    def remove(self, names):
+        """Forget versions whose directories are gone (e.g. pruned online versions)"""
+        with self.lock:
+            for name in names:
+                self.bundles.pop(name, None)
+                self.errors.pop(name, None)
+                self.agreements.pop(name, None)
+            self.shadow_names = [n for n in self.shadow_names if n not in names]
+
+    def shadow_newest(self, prefix):
+        """Shadow-score the newest version named prefix*, in place of older ones with that prefix
+
+        Other shadowed versions (and their agreement stats) are left alone.
+        """
+        with self.lock:
+            names = sorted(n for n in self.bundles if n.startswith(prefix))
+            if not names:
+                return None
+            newest = names[-1]
+            for name in self.shadow_names:
+                if name.startswith(prefix) and name != newest:
+                    self.agreements.pop(name, None)
+            self.shadow_names = [n for n in self.shadow_names if not n.startswith(prefix)] + [newest]
+        return newest
+
+    def set_shadow(self, names):
+        unknown = [n for n in names if n not in self.bundles]
+        if unknown:
+            raise KeyError(f"Unknown model version(s): {', '.join(unknown)}")
+        with self.lock:
+            self.shadow_names = list(names)
+            self.agreements = {}
+
+    def active_shadows(self):
+        with self.lock:
+            return [self.bundles[n] for n in self.shadow_names if n in self.bundles]
+
+    # --- shadow scoring, off the request path ---
+
+    def submit(self, df, live_clusters, live_cluster_info, live_preprocess_key, features=None):
+        """Queue an already-answered upload for shadow scoring; never blocks
+
+        features: the upload's UploadFeatures, so the live matrix is not rebuilt here.
+        """
+        if not self.active_shadows():
+            return False
+        self._ensure_thread()
+        if features is None:
+            features = UploadFeatures(df, self.transform)
+        try:
+            self.queue.put_nowait((df, np.asarray(live_clusters), live_cluster_info, live_preprocess_key,
+                                   features))
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='shadow-scoring', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            t0 = time.perf_counter()
+            try:
+                self.shadow_score(*job)
+            except Exception as e:
+                self.failed += 1
+                print(f"Shadow scoring error: {e}")
+            self.shadow_seconds += time.perf_counter() - t0
+
+    def shadow_score(self, df, live_clusters, live_cluster_info, live_preprocess_key, live_features=None):
+        live_names = _profile_names(live_cluster_info, live_clusters)
+        if live_features is None:
+            live_features = UploadFeatures(df, self.transform)
+        features = {}  # other preprocess keys -> matrix, built once per upload
+        for bundle in self.active_shadows():
+            key = bundle.preprocess_key
+            if key == live_preprocess_key:
+                X = live_features.matrix()
+            else:
+                if key not in features:
+                    features[key] = self.transform(df, bundle)
+                X = features[key]
+            candidate = bundle.kmeans.predict(X).astype(np.int64)
+            candidate_names = _profile_names(bundle.cluster_info, candidate)
+            with self.lock:
+                agreement = self.agreements.get(bundle.name)
+                if agreement is None:
+                    agreement = self.agreements[bundle.name] = Agreement(
+                        int(live_clusters.max(initial=0)) + 1, bundle.n_clusters)
+                agreement.add(live_clusters.astype(np.int64), candidate, live_names, candidate_names)
+
+    def report(self):
+        with self.lock:
+            return {
+                'versions': [b.describe() for b in self.bundles.values()],
+                'load_errors': self.errors,
+                'shadow': list(self.shadow_names),
+                'agreement': {name: a.report() for name, a in self.agreements.items()},
+                'queued': self.queue.qsize(),
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'shadow_seconds': round(self.shadow_seconds, 3)
+            }
+
+
+def register(name, source, versions_dir):
+    """Copy a bundle's artifacts into versions/<name>"""
+    target = os.path.join(versions_dir, name)
+    os.makedirs(target, exist_ok=True)
+    for filename in BUNDLE_FILES:
+        path = os.path.join(source, filename)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(target, filename))
+    bundle = ModelBundle(name, target)
+    print(f"Registered {name}: {bundle.describe()}")
+
+
+if __name__ == '__main__':
+    import argparse
+    models_dir = os.path.join(os.path.dirname(__file__), '..', 'models')
+    parser = argparse.ArgumentParser(description="Model version registry")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('register')
+    p.add_argument('name')
+    p.add_argument('--source', default=models_dir)
+    p.add_argument('--versions-dir', default=os.path.join(models_dir, 'versions'))
+    args = parser.parse_args()
+    register(args.name, args.source, args.versions_dir)
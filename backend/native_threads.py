@@ -0,0 +1,108 @@
+"""
+Native (BLAS / OpenMP) thread control for inference.
+
+Under a threaded server every concurrent request that reaches native math
+would otherwise bring a full-width thread pool of its own: sklearn's KMeans
+runs its OpenMP loop with the thread count it saw when it was *fitted* (stored
+on the pickled model), and numpy's BLAS (PCA.transform) uses every core. N
+concurrent requests then run N x cores threads on `cores` CPUs.
+
+Two widths, both fixed when models are loaded:
+
+  - request_threads (INFERENCE_THREADS, default 1): the process-wide BLAS limit
+    and the OpenMP width of the live and registry KMeans models. A request does
+    its native math single-threaded; throughput comes from serving requests
+    (and server workers) side by side.
+  - batch_threads (BATCH_INFERENCE_THREADS, default one per CPU): a shallow
+    copy of each KMeans with a wider OpenMP width, used for batches of at least
+    batch_min_rows rows on the serial path (below the process-pool threshold,
+    or without fork). Forked scoring workers keep the one-thread model.
+
+Concurrency guarantee for the shared model objects (benchmarks.py
+inference-threads checks it: every concurrent answer must equal the serial
+one):
+
+  - Fitted estimators are never mutated once a request can reach them. predict
+    and transform only read fitted attributes; the OpenMP width is set before
+    the model is published, and the wide variant is a separate object.
+  - The BLAS limit is set once, process-wide, and never per request:
+    threadpoolctl limits are global, so a per-request limit would race with
+    every other request. sklearn's own "BLAS = 1" set/restore inside
+    KMeans.predict is then a no-op (with request_threads > 1 it can only leave
+    BLAS narrower, never wider).
+  - Per-call width goes through sklearn's explicit n_threads, an attribute of
+    the model object, not through global state.
+"""
+import copy
+import os
+import threading
+import weakref
+
+try:
+    from threadpoolctl import ThreadpoolController
+except ImportError:  # missing or threadpoolctl < 3: native pools are left alone
+    ThreadpoolController = None
+
+
+class NativeThreads:
+    def __init__(self, request_threads=1, batch_threads=None, batch_min_rows=50000, enabled=True):
+        self.request_threads = max(1, request_threads)
+        self.batch_threads = max(1, batch_threads or os.cpu_count() or 1)
+        self.batch_min_rows = batch_min_rows
+        self.enabled = enabled
+        self.controller = None
+        self.limiter = None
+        self.lock = threading.Lock()
+        self.wide = weakref.WeakKeyDictionary()      # model -> wide copy
+        self.fitted = weakref.WeakKeyDictionary()    # model -> OpenMP width it was fitted with
+
+    def pin(self):
+        """Process-wide BLAS limit; once at startup, before requests are served"""
+        if not self.enabled or ThreadpoolController is None or self.limiter is not None:
+            return
+        self.controller = ThreadpoolController()
+        self.limiter = self.controller.limit(limits=self.request_threads, user_api='blas')
+
+    def unpin(self):
+        if self.limiter is not None:
+            self.limiter.restore_original_limits()
+            self.limiter = None
+
+    def prepare(self, kmeans):
+        """Give a freshly loaded KMeans the request width (before it is shared)"""
+        if self.enabled and hasattr(kmeans, '_n_threads'):
+            with self.lock:
+                self.fitted.setdefault(kmeans, kmeans._n_threads)
+                self.wide.pop(kmeans, None)
+            kmeans._n_threads = self.request_threads
+        return kmeans
+
+    def restore(self, kmeans):
+        """Back to the fitted width (benchmarks only; not while serving)"""
+        with self.lock:
+            if kmeans in self.fitted:
+                kmeans._n_threads = self.fitted.pop(kmeans)
+            self.wide.pop(kmeans, None)
+
+    def for_rows(self, kmeans, rows):
+        """The model to score `rows` rows with: the wide copy for large serial batches"""
+        if (not self.enabled or rows < self.batch_min_rows or self.batch_threads <= self.request_threads
+                or not hasattr(kmeans, '_n_threads')):
+            return kmeans
+        with self.lock:
+            wide = self.wide.get(kmeans)
+            if wide is None:
+                # Shares the centroid arrays; only the OpenMP width differs
+                wide = copy.copy(kmeans)
+                wide._n_threads = self.batch_threads
+                self.wide[kmeans] = wide
+        return wide
+
+    def info(self):
+        pools = []
+        if ThreadpoolController is not None:
+            pools = [{'api': p['internal_api'], 'threads': p['num_threads']}
+                     for p in (self.controller or ThreadpoolController()).info()]
+        return {'enabled': self.enabled, 'pinned': self.limiter is not None,
+                'request_threads': self.request_threads, 'batch_threads': self.batch_threads,
+                'batch_min_rows': self.batch_min_rows, 'native_pools': pools}
@@ -0,0 +1,224 @@
+"""
+Online centroid updates from scored batch uploads.
+
+Every batch upload that has been answered is folded into a *shadow copy* of the
+KMeans centroids with the mini-batch k-means rule: each centroid keeps a count,
+and a batch pulls it towards the mean of the rows assigned to it with learning
+rate n_batch / count. Counts are multiplied by a decay factor before every
+batch so that recent cohorts keep a meaningful weight instead of the learning
+rate shrinking towards zero. The cost of an update is proportional to the new
+batch, never to the history.
+
+The shadow copy never replaces the live model. Once the centroids have moved
+more than a threshold (in scaled feature units) away from the last published
+version, a new bundle is written to the model registry's versions directory,
+where it can be shadow-scored and promoted like any other candidate (the app
+shadow-scores the newest online version automatically). Before
+publishing, the new centroids are matched one-to-one to the previous version's
+with the Hungarian algorithm and reordered so cluster ids (and therefore
+profile names) stay stable; the matching and the share of the last batch that
+keeps its label are recorded per version.
+"""
+import copy
+import json
+import os
+import pickle
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+ONLINE_PREFIX = 'online-'
+
+
+def _nearest(X, centers):
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2 ; |x|^2 is constant per row
+    dist = (centers ** 2).sum(axis=1)[None, :] - 2.0 * (X @ centers.T)
+    return dist.argmin(axis=1)
+
+
+def match_centroids(previous, current):
+    """Hungarian matching: order[i] is the current centroid that plays previous centroid i"""
+    cost = np.sqrt(((previous[:, None, :] - current[None, :, :]) ** 2).sum(axis=2))
+    rows, cols = linear_sum_assignment(cost)
+    order = np.empty(len(previous), dtype=np.int64)
+    order[rows] = cols
+    return order, cost[rows, cols]
+
+
+class OnlineClusterUpdater:
+    def __init__(self, kmeans, model_path, versions_dir, decay=0.98, prior_count=1000,
+                 move_threshold=0.25, min_rows=5000, keep_versions=5, max_queue=4, on_publish=None,
+                 on_prune=None):
+        """on_publish(name) runs after a version is written, on_prune(names) after old ones are deleted"""
+        self.kmeans = kmeans
+        self.model_path = model_path
+        self.versions_dir = versions_dir
+        self.decay = decay
+        self.move_threshold = move_threshold
+        self.min_rows = min_rows
+        self.keep_versions = keep_versions
+        self.on_publish = on_publish
+        self.on_prune = on_prune
+
+        self.lock = threading.Lock()
+        self.centers = np.array(kmeans.cluster_centers_, dtype=np.float64)
+        # MiniBatchKMeans remembers how many rows each centroid has absorbed; KMeans does not
+        counts = getattr(kmeans, '_counts', None)
+        self.counts = (np.array(counts, dtype=np.float64) if counts is not None
+                       else np.full(len(self.centers), float(prior_count)))
+        self.published_centers = self.centers.copy()
+        self.rows_since_publish = 0
+        self.rows_total = 0
+        self.batches = 0
+        self.last_batch = None
+        self.versions = []  # publish records, oldest first
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.failed = 0
+        self.update_seconds = 0.0
+        self.thread = None
+
+    # --- updates, off the request path ---
+
+    def submit(self, features):
+        """features: the upload's model_registry.UploadFeatures (live preprocessing, built once)"""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(features)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='online-clusters', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            features = self.queue.get()
+            t0 = time.perf_counter()
+            try:
+                self.update(features.matrix())
+            except Exception as e:
+                self.failed += 1
+                print(f"Online cluster update error: {e}")
+            self.update_seconds += time.perf_counter() - t0
+
+    def update(self, X):
+        """Fold one batch into the shadow centroids; publishes when they have drifted enough"""
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return None
+        with self.lock:
+            labels = _nearest(X, self.centers)
+            k, dims = self.centers.shape
+            n = np.bincount(labels, minlength=k).astype(np.float64)
+            sums = np.zeros((k, dims))
+            np.add.at(sums, labels, X)
+
+            self.counts *= self.decay
+            self.counts += n
+            hit = n > 0
+            means = sums[hit] / n[hit, None]
+            rate = n[hit] / self.counts[hit]
+            self.centers[hit] += rate[:, None] * (means - self.centers[hit])
+
+            self.rows_since_publish += len(X)
+            self.rows_total += len(X)
+            self.batches += 1
+            self.last_batch = X
+            should_publish = (self.rows_since_publish >= self.min_rows
+                              and self.movement() >= self.move_threshold)
+        return self.publish() if should_publish else None
+
+    def movement(self):
+        """Largest centroid shift since the last published version"""
+        return float(np.sqrt(((self.centers - self.published_centers) ** 2).sum(axis=1)).max())
+
+    # --- publishing ---
+
+    def publish(self):
+        with self.lock:
+            order, distances = match_centroids(self.published_centers, self.centers)
+            # Reorder so cluster i of the new version is the continuation of cluster i
+            self.centers = self.centers[order]
+            self.counts = self.counts[order]
+            centers = self.centers.copy()
+            previous = self.published_centers
+            batch = self.last_batch
+            record = {
+                'movement': round(float(np.sqrt(((centers - previous) ** 2).sum(axis=1)).max()), 4),
+                'matched_distances': [round(float(d), 4) for d in distances],
+                'mapping': {int(i): int(j) for i, j in enumerate(order)},
+                'ids_stable': bool(np.array_equal(order, np.arange(len(order)))),
+                'rows_since_previous': self.rows_since_publish,
+                'counts': [round(float(c), 1) for c in self.counts]
+            }
+            if batch is not None:
+                record['last_batch_label_stability'] = round(
+                    float(np.mean(_nearest(batch, previous) == _nearest(batch, centers))), 4)
+            self.published_centers = centers.copy()
+            self.rows_since_publish = 0
+
+        name = f"{ONLINE_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{len(self.versions) + 1}"
+        target = os.path.join(self.versions_dir, name)
+        os.makedirs(target, exist_ok=True)
+
+        model = copy.deepcopy(self.kmeans)
+        model.cluster_centers_ = centers.astype(np.asarray(self.kmeans.cluster_centers_).dtype)
+        with open(os.path.join(target, 'kmeans_model.pkl'), 'wb') as f:
+            pickle.dump(model, f)
+        # Same preprocessing and profile names as the live model, so the registry reuses
+        # the live feature matrix when shadow-scoring this version
+        for filename in ('scaler.pkl', 'label_encoders.pkl', 'cluster_info.pkl'):
+            path = os.path.join(self.model_path, filename)
+            if os.path.exists(path):
+                shutil.copy2(path, os.path.join(target, filename))
+
+        record.update({'name': name, 'published_at': time.time()})
+        with open(os.path.join(target, 'online_update.json'), 'w') as f:
+            json.dump(record, f, indent=2)
+        with self.lock:
+            self.versions.append(record)
+        self._prune()
+        print(f"Online clusters: published {name} (movement {record['movement']})")
+        if self.on_publish is not None:
+            self.on_publish(name)
+        return record
+
+    def _prune(self):
+        if not os.path.isdir(self.versions_dir):
+            return
+        online = sorted(n for n in os.listdir(self.versions_dir) if n.startswith(ONLINE_PREFIX))
+        pruned = online[:max(0, len(online) - self.keep_versions)]
+        for name in pruned:
+            shutil.rmtree(os.path.join(self.versions_dir, name), ignore_errors=True)
+        if pruned and self.on_prune is not None:
+            self.on_prune(pruned)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'batches': self.batches,
+                'rows_total': self.rows_total,
+                'rows_since_publish': self.rows_since_publish,
+                'movement': round(self.movement(), 4),
+                'move_threshold': self.move_threshold,
+                'min_rows': self.min_rows,
+                'decay': self.decay,
+                'counts': [round(float(c), 1) for c in self.counts],
+                'versions': list(self.versions[-self.keep_versions:]),
+                'queued': self.queue.qsize(),
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'update_seconds': round(self.update_seconds, 3)
+            }
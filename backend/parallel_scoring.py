@@ -0,0 +1,87 @@
+"""
+Multi-core chunked scoring for large uploads.
+
+Large frames are cut into contiguous row ranges and scored on one long-lived
+process pool. The pool is forked once at startup (start()), after the models
+are loaded and before the server starts any thread, so every worker has the
+models in copy-on-write memory and no worker can inherit a lock some other
+thread was holding at fork time (forking per request inside a threaded server
+could deadlock a child). A task carries its chunk of rows; workers send back
+compact numpy results (int32 cluster ids and a small drift summary), never
+DataFrames, and results are reassembled in input order. Small inputs, a pool
+that was never started, or platforms without fork are scored serially
+in-process.
+"""
+import math
+import multiprocessing as mp
+import os
+import threading
+
+
+def _limit_worker_threads():
+    # N workers each starting a full BLAS/OpenMP pool would oversubscribe the host
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _run_chunk(task):
+    fn, chunk = task
+    return fn(chunk)
+
+
+class ParallelScorer:
+    def __init__(self, workers=None, min_rows=200000, chunk_rows=50000):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.min_rows = min_rows
+        self.chunk_rows = chunk_rows
+        self.can_fork = 'fork' in mp.get_all_start_methods()
+        self.pool = None
+        # One parallel run at a time: each already uses every core
+        self.lock = threading.Lock()
+        self.runs = 0
+
+    def start(self):
+        """Fork the worker pool; once, at startup, while this is the only thread"""
+        if self.pool is not None or not self.can_fork:
+            return self
+        if threading.active_count() > 1:
+            print("Parallel scoring: other threads are already running, not forking a pool "
+                  "(large uploads are scored serially)")
+            return self
+        self.pool = mp.get_context('fork').Pool(self.workers, initializer=_limit_worker_threads)
+        return self
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def should_parallelize(self, rows):
+        return self.pool is not None and self.workers > 1 and rows >= self.min_rows
+
+    def ranges(self, rows, workers=None):
+        # At least a few chunks per worker so a slow chunk doesn't leave the rest idle
+        workers = workers or self.workers
+        size = max(1000, min(self.chunk_rows, math.ceil(rows / (workers * 4))))
+        return [(start, min(start + size, rows)) for start in range(0, rows, size)]
+
+    def map_chunks(self, df, fn):
+        """[fn(chunk) for each chunk of df], in row order
+
+        fn must be a module-level function that existed when the pool was forked, and
+        return picklable numpy results.
+        """
+        tasks = ((fn, df.iloc[start:stop]) for start, stop in self.ranges(len(df)))
+        with self.lock:
+            results = self.pool.map(_run_chunk, tasks, chunksize=1)
+            self.runs += 1
+        return results
+
+    def stats(self):
+        return {'workers': self.workers, 'min_rows': self.min_rows,
+                'chunk_rows': self.chunk_rows, 'fork_available': self.can_fork,
+                'pool_started': self.pool is not None, 'parallel_runs': self.runs}
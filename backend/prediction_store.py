@@ -0,0 +1,164 @@
+"""
+Local columnar store of scored predictions.
+
+Every scored batch is appended as one Parquet file under a hive-style layout
+
+    <root>/academic_year=<year>/upload_id=<id>/part-0.parquet
+
+with Profile_Name and Branch_Department dictionary-encoded. Queries go through
+pyarrow.dataset, so partition filters prune whole directories, other filters
+are pushed down to row groups, and only the columns a query needs are read.
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Partition values come back dictionary-encoded too, so grouping by year stays cheap
+PARTITIONING = ds.partitioning(
+    pa.schema([('academic_year', pa.dictionary(pa.int32(), pa.string())),
+               ('upload_id', pa.dictionary(pa.int32(), pa.string()))]),
+    flavor='hive', dictionaries='infer'
+)
+
+# Public query names -> stored column names
+DIMENSIONS = {
+    'year': 'academic_year',
+    'upload': 'upload_id',
+    'branch': 'Branch_Department',
+    'profile': 'Profile_Name',
+    'cluster': 'Cluster_ID',
+}
+
+METRIC_COLUMNS = ['CGPA', 'Technical_Skills_Score', 'Soft_Skills_Score']
+
+ROW_GROUP_SIZE = 65536
+
+
+def new_upload_id():
+    return uuid.uuid4().hex[:12]
+
+
+class PredictionStore:
+    def __init__(self, root):
+        self.root = root
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _upload_dir(self, academic_year, upload_id):
+        return os.path.join(self.root, f"academic_year={academic_year}", f"upload_id={upload_id}")
+
+    def append(self, df, academic_year, upload_id):
+        """Write the scored rows of one upload; returns the number of rows stored"""
+        n = len(df)
+
+        def strings(col, default):
+            if col not in df.columns:
+                return np.full(n, default, dtype=object)
+            return df[col].fillna(default).astype(str).to_numpy(dtype=object)
+
+        profiles = strings('Profile_Name', 'Unknown')
+        branches = strings('Branch_Department', 'Unknown')
+
+        # Clustering rows by profile/branch gives each row group a narrow min/max range,
+        # so equality filters on those columns skip most row groups via Parquet statistics
+        # (categorical codes follow sorted category order, so sorting codes sorts the strings)
+        order = np.lexsort((pd.Categorical(branches).codes, pd.Categorical(profiles).codes))
+
+        def numeric(col):
+            if col not in df.columns:
+                return pa.nulls(n, pa.float32())
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float32)[order]
+            return pa.array(values, mask=np.isnan(values))
+
+        table = pa.table({
+            'row': pa.array(order.astype(np.int32)),
+            'Cluster_ID': pa.array(np.asarray(df['Cluster_ID'], dtype=np.int16)[order]),
+            'Profile_Name': pa.array(profiles[order], pa.string()).dictionary_encode(),
+            'Branch_Department': pa.array(branches[order], pa.string()).dictionary_encode(),
+            **{col: numeric(col) for col in METRIC_COLUMNS},
+            'scored_at': pa.array(np.full(n, time.time(), dtype=np.float64)),
+        })
+
+        out_dir = self._upload_dir(academic_year, upload_id)
+        os.makedirs(out_dir, exist_ok=True)
+        tmp_path = os.path.join(out_dir, 'part-0.parquet.tmp')
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE,
+                       use_dictionary=['Profile_Name', 'Branch_Department'])
+        os.replace(tmp_path, os.path.join(out_dir, 'part-0.parquet'))
+        return n
+
+    def delete_upload(self, upload_id):
+        """Drop every partition written for an upload; returns True if anything was removed"""
+        removed = False
+        with self.lock:
+            for year_dir in os.listdir(self.root):
+                path = os.path.join(self.root, year_dir, f"upload_id={upload_id}")
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                    removed = True
+        return removed
+
+    def uploads(self):
+        """[(academic_year, upload_id)] currently stored"""
+        found = []
+        for year_dir in sorted(os.listdir(self.root)):
+            if not year_dir.startswith('academic_year='):
+                continue
+            for upload_dir in sorted(os.listdir(os.path.join(self.root, year_dir))):
+                if upload_dir.startswith('upload_id='):
+                    found.append((year_dir.split('=', 1)[1], upload_dir.split('=', 1)[1]))
+        return found
+
+    def dataset(self):
+        # Files starting with '_' or '.' (e.g. the aggregates state) are skipped by the scanner
+        return ds.dataset(self.root, format='parquet', partitioning=PARTITIONING)
+
+    def scan(self, columns, filters=None):
+        """Read only `columns` for rows matching {stored column: value or list}"""
+        expr = None
+        for col, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            if col == 'Cluster_ID':
+                values = [int(v) for v in values]
+            # Plain equality lets the scanner prune row groups from their statistics
+            term = pc.field(col) == values[0]
+            for v in values[1:]:
+                term = term | (pc.field(col) == v)
+            expr = term if expr is None else expr & term
+        return self.dataset().to_table(columns=list(columns), filter=expr)
+
+    def query(self, group_by, filters=None, metrics=('CGPA',)):
+        """Counts (and metric means) grouped by the requested dimensions"""
+        keys = [DIMENSIONS.get(g, g) for g in group_by]
+        stored_filters = {DIMENSIONS.get(k, k): v for k, v in (filters or {}).items()}
+        metrics = [m for m in metrics if m in METRIC_COLUMNS]
+
+        if not self.uploads():
+            return []
+
+        # Dictionary-encoded keys are grouped on their indices, no string decoding per row;
+        # each file carries its own dictionary, so unify them across files first
+        table = self.scan(set(keys) | set(metrics) | {'row'}, stored_filters).unify_dictionaries()
+        aggregations = [('row', 'count')] + [(m, 'mean') for m in metrics]
+        grouped = table.group_by(keys).aggregate(aggregations) if keys else \
+            pa.table({'row_count': [table.num_rows],
+                      **{f"{m}_mean": [pc.mean(table.column(m)).as_py()] for m in metrics}})
+
+        rows = grouped.to_pylist()
+        for row in rows:
+            row['count'] = row.pop('row_count')
+            for m in metrics:
+                value = row.pop(f"{m}_mean")
+                row[f"mean_{m}"] = round(value, 4) if value is not None else None
+        rows.sort(key=lambda r: tuple(str(r[k]) for k in keys))
+        return rows
+
@@ -0,0 +1,182 @@
+"""
+Opt-in per-request sampling profiler.
+
+A profiled request gets a sampler thread that reads the request thread's
+stack via sys._current_frames() every few milliseconds and counts identical
+stacks. Nothing is installed on the interpreter (no sys.setprofile), so other
+requests are unaffected, and when profiling is off the only cost is the check
+in should_profile(). Finished profiles are written as small JSON files and can
+be exported as collapsed stacks (flamegraph.pl / speedscope import) or as
+speedscope's own JSON format.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from llm_gateway import TokenBucket
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.done = threading.Event()
+        self.frames = []          # [(function, file, first line)]
+        self.frame_index = {}     # code object -> index into frames
+        self.stacks = {}          # tuple of frame indices (root first) -> samples
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def _index(self, code):
+        idx = self.frame_index.get(code)
+        if idx is None:
+            idx = self.frame_index[code] = len(self.frames)
+            self.frames.append((code.co_name, code.co_filename, code.co_firstlineno))
+        return idx
+
+    def run(self):
+        while not self.done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._index(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+        self.done.set()
+        self.join()
+
+
+class ProfileStore:
+    def __init__(self, directory, keep=50, interval_ms=2.0, per_minute=6, admin_token=None):
+        self.directory = directory
+        self.keep = keep
+        self.interval = interval_ms / 1000.0
+        self.admin_token = admin_token
+        self.limiter = TokenBucket(per_minute / 60.0, max(1, per_minute))
+        self.lock = threading.Lock()
+        self.enabled_until = 0.0   # admin toggle: profile every request until then
+        self.rejected = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # --- switching on ---
+
+    def toggle(self, enabled, minutes=5):
+        with self.lock:
+            self.enabled_until = time.time() + minutes * 60 if enabled else 0.0
+
+    def toggled_on(self):
+        return time.time() < self.enabled_until
+
+    def should_profile(self, header_value):
+        """Header opt-in or admin toggle, subject to the rate limit"""
+        if not header_value and not self.enabled_until:
+            return False
+        if header_value and self.admin_token and header_value != self.admin_token:
+            header_value = None
+        if not header_value and not self.toggled_on():
+            return False
+        if not self.limiter.acquire(time.monotonic()):
+            with self.lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def start(self):
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        return sampler
+
+    # --- storing / exporting ---
+
+    def finish(self, sampler, method, path, status):
+        sampler.stop()
+        profile_id = uuid.uuid4().hex[:12]
+        profile = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'status': status,
+            'created_at': time.time(),
+            'duration_ms': round(sampler.elapsed * 1000, 2),
+            'interval_ms': self.interval * 1000,
+            'samples': sum(sampler.stacks.values()),
+            'frames': sampler.frames,
+            'stacks': [[list(stack), count] for stack, count in sampler.stacks.items()]
+        }
+        with open(os.path.join(self.directory, f"{profile_id}.json"), 'w') as f:
+            json.dump(profile, f)
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        files = sorted((os.path.join(self.directory, n) for n in os.listdir(self.directory)
+                        if n.endswith('.json')), key=os.path.getmtime)
+        for path in files[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load(self, profile_id):
+        if not profile_id.isalnum():
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def list(self):
+        items = []
+        for name in os.listdir(self.directory):
+            profile = self.load(name[:-5]) if name.endswith('.json') else None
+            if profile:
+                items.append({k: profile[k] for k in ('id', 'method', 'path', 'status',
+                                                      'created_at', 'duration_ms', 'samples')})
+        return sorted(items, key=lambda p: -p['created_at'])
+
+    def stats(self):
+        return {'toggled_on': self.toggled_on(), 'enabled_until': self.enabled_until,
+                'rate_limited': self.rejected, 'interval_ms': self.interval * 1000}
+
+
+def _frame_label(frame):
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(profile):
+    """One 'root;child;leaf count' line per distinct stack"""
+    labels = [_frame_label(f) for f in profile['frames']]
+    lines = [";".join(labels[i] for i in stack) + f" {count}" for stack, count in profile['stacks']]
+    return "\n".join(sorted(lines)) + "\n"
+
+
+def to_speedscope(profile):
+    interval = profile['interval_ms']
+    return {
+        '$schema': SPEEDSCOPE_SCHEMA,
+        'name': f"{profile['method']} {profile['path']}",
+        'exporter': 'career-path-backend',
+        'shared': {'frames': [{'name': n, 'file': f, 'line': l} for n, f, l in profile['frames']]},
+        'profiles': [{
+            'type': 'sampled',
+            'name': f"{profile['method']} {profile['path']} ({profile['id']})",
+            'unit': 'milliseconds',
+            'startValue': 0,
+            'endValue': profile['duration_ms'],
+            'samples': [stack for stack, _ in profile['stacks']],
+            'weights': [count * interval for _, count in profile['stacks']]
+        }]
+    }
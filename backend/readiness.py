@@ -0,0 +1,163 @@
+"""
+Startup artifact checks, warmup and readiness state.
+
+Liveness only says the process is up. Readiness additionally requires that
+  - the loaded artifacts are consistent with each other and with the feature
+    columns the app builds (validate_artifacts), and
+  - the warmup pass has pushed synthetic single-row and batch inputs through
+    every model path, so pandas/sklearn/BLAS lazy initialisation and first-use
+    code paths are paid for before real traffic arrives.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def validate_artifacts(kmeans, scaler, pca, label_encoders, cluster_info, numerical_cols, categorical_cols):
+    """List of problems that make predictions wrong or impossible (empty = fine)"""
+    problems = []
+    n_features = len(numerical_cols) + len(categorical_cols)
+
+    if kmeans is None:
+        problems.append("kmeans_model.pkl not loaded")
+    else:
+        if getattr(kmeans, 'n_features_in_', n_features) != n_features:
+            problems.append(f"KMeans expects {kmeans.n_features_in_} features, app builds {n_features}")
+        centers = np.asarray(kmeans.cluster_centers_)
+        if not np.issubdtype(centers.dtype, np.floating) or not np.isfinite(centers).all():
+            problems.append(f"KMeans centroids are not finite floats (dtype {centers.dtype})")
+
+    if scaler is None:
+        problems.append("scaler.pkl not loaded")
+    else:
+        if getattr(scaler, 'n_features_in_', len(numerical_cols)) != len(numerical_cols):
+            problems.append(f"Scaler expects {scaler.n_features_in_} features, "
+                            f"app scales {len(numerical_cols)}")
+        for attr in ('mean_', 'scale_'):
+            values = getattr(scaler, attr, None)
+            if values is not None and not np.isfinite(np.asarray(values, dtype=np.float64)).all():
+                problems.append(f"Scaler {attr} contains non-finite values")
+
+    for col in categorical_cols:
+        le = (label_encoders or {}).get(col)
+        if le is not None and np.asarray(le.classes_).dtype.kind not in ('U', 'O', 'S'):
+            problems.append(f"Label encoder for {col} has non-string classes ({np.asarray(le.classes_).dtype})")
+
+    return problems
+
+
+def fallback_warnings(kmeans, label_encoders, cluster_info, categorical_cols):
+    """Gaps the app scores around (category codes, generic cluster names), reported but not fatal"""
+    warnings = [f"No label encoder for {col}; categories are coded per upload"
+                for col in categorical_cols if col not in (label_encoders or {})]
+    if kmeans is not None:
+        missing = [c for c in range(int(kmeans.n_clusters)) if c not in (cluster_info or {})]
+        if missing:
+            warnings.append(f"cluster_info has no entry for cluster ids {missing}; they are named 'Cluster <id>'")
+    return warnings
+
+
+def pca_warnings(pca, numerical_cols, categorical_cols):
+    """PCA only feeds optional embeddings, so a mismatch is reported but not fatal"""
+    if pca is None:
+        return ["pca.pkl not loaded; embeddings fall back to raw features"]
+    expected = getattr(pca, 'n_features_in_', None)
+    if expected not in (None, len(numerical_cols), len(numerical_cols) + len(categorical_cols)):
+        return [f"PCA expects {expected} features"]
+    return []
+
+
+class Readiness:
+    STARTING, WARMING, READY, FAILED = 'starting', 'warming', 'ready', 'failed'
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = self.STARTING
+        self.problems = []
+        self.warnings = []
+        self.warmup = {}
+        self.started_at = time.time()
+        self.ready_at = None
+
+    def set_artifacts(self, problems, warnings=()):
+        with self.lock:
+            self.problems = list(problems)
+            self.warnings = list(warnings)
+            if self.problems:
+                self.state = self.FAILED
+
+    @property
+    def ready(self):
+        return self.state == self.READY
+
+    @property
+    def failed(self):
+        return self.state == self.FAILED
+
+    def run_warmup(self, steps, rounds=3):
+        """steps: [(name, fn)]; each runs `rounds` times, first and last timings are kept"""
+        with self.lock:
+            if self.state == self.FAILED:
+                return
+            self.state = self.WARMING
+        timings = {}
+        try:
+            for name, fn in steps:
+                runs = []
+                for _ in range(rounds):
+                    t0 = time.perf_counter()
+                    fn()
+                    runs.append(round((time.perf_counter() - t0) * 1000, 2))
+                timings[name] = {'first_ms': runs[0], 'last_ms': runs[-1]}
+        except Exception as e:
+            with self.lock:
+                self.warmup = timings
+                self.problems.append(f"Warmup step '{name}' failed: {e}")
+                self.state = self.FAILED
+            print(f"Warmup Error: {e}")
+            return
+        with self.lock:
+            self.warmup = timings
+            self.state = self.READY
+            self.ready_at = time.time()
+
+    def skip_warmup(self):
+        with self.lock:
+            if self.state != self.FAILED:
+                self.state = self.READY
+                self.ready_at = time.time()
+                self.warmup = {'skipped': True}
+
+    def report(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'ready': self.state == self.READY,
+                'problems': list(self.problems),
+                'warnings': list(self.warnings),
+                'warmup': dict(self.warmup),
+                'started_at': self.started_at,
+                'ready_at': self.ready_at
+            }
+
+
+def synthetic_frame(rows, numerical_cols, categorical_cols, scaler=None, label_encoders=None, seed=0):
+    """Upload-shaped rows built from the fitted artifacts themselves (around the scaler means,
+    cycling through every known category), so warmup never depends on a data file"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    means = getattr(scaler, 'mean_', None)
+    scales = getattr(scaler, 'scale_', None)
+    for j, col in enumerate(numerical_cols):
+        if means is not None:
+            values = rng.normal(means[j], scales[j], rows)
+        else:
+            values = rng.uniform(0, 5, rows)
+        data[col] = np.round(np.maximum(values, 0), 2)
+    for col in categorical_cols:
+        le = (label_encoders or {}).get(col)
+        classes = np.asarray(le.classes_).astype(str) if le is not None else np.array(['Unknown'])
+        data[col] = classes[np.arange(rows) % len(classes)]
+    return pd.DataFrame(data)
@@ -0,0 +1,201 @@
+"""
+Content-addressed caches for batch uploads.
+
+ResultCache stores the full JSON response of an upload on local disk, keyed on
+the uploaded bytes plus the active model version, with LRU eviction once the
+directory passes its size budget. RowCache remembers the cluster of every
+individual row it has scored, so an upload where only a few rows changed only
+re-scores those rows.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def file_key(raw_bytes, model_version, scope='', extension=''):
+    """Hash of an upload's bytes together with everything that affects its result"""
+    h = hashlib.sha256()
+    h.update(f"{scope}|{extension}|{model_version}|".encode('utf-8'))
+    h.update(raw_bytes)
+    return h.hexdigest()
+
+
+class ResultCache:
+    SUFFIX = '.result.json'  # only files with this suffix are entries; the directory is shared
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> size in bytes, oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild LRU order from disk so the cache survives restarts
+        files = [f for f in os.listdir(cache_dir) if f.endswith(self.SUFFIX)]
+        files.sort(key=lambda f: os.path.getmtime(os.path.join(cache_dir, f)))
+        for name in files:
+            size = os.path.getsize(os.path.join(cache_dir, name))
+            self.entries[name[:-len(self.SUFFIX)]] = size
+            self.total_bytes += size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.SUFFIX}")
+
+    def get(self, key, upload_size=0):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            os.utime(self._path(key))
+        except (OSError, ValueError) as e:
+            print(f"Result cache read error: {e}")
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += upload_size
+        return payload
+
+    def put(self, key, payload):
+        data = json.dumps(payload).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return
+        # Concurrent puts of the same key must not share a temp file
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self.lock:
+            self.total_bytes += len(data) - self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            # Evict least recently used entries until we are back under budget
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes_on_disk': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'bytes_saved': self.bytes_saved
+            }
+
+
+class RowCache:
+    """Per-row hash -> cluster id for one model version, least recently used evicted first.
+
+    Persisted as an append-only log of (hash, cluster) records: a store appends
+    only its new rows, and the log is rewritten as a snapshot of the live rows
+    once it holds twice max_rows records. Later records win on load.
+    """
+
+    RECORD = np.dtype([('hash', '<u8'), ('cluster', '<i4')])
+
+    def __init__(self, cache_dir, model_version, columns, max_rows):
+        self.path = os.path.join(cache_dir, f"rows-{model_version}.log")
+        self.columns = list(columns)
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.rows = OrderedDict()
+        self.logged = 0  # records in the log file
+        self.rows_reused = 0
+        self.rows_scored = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    data = f.read()
+                # A crash mid-append can leave a partial last record
+                whole = len(data) - len(data) % self.RECORD.itemsize
+                saved = np.frombuffer(data[:whole], dtype=self.RECORD)
+                for h, c in zip(saved['hash'].tolist(), saved['cluster'].tolist()):
+                    self.rows[h] = c
+                    self.rows.move_to_end(h)
+                while len(self.rows) > self.max_rows:
+                    self.rows.popitem(last=False)
+                self.logged = len(saved)
+                if whole != len(data):
+                    os.truncate(self.path, whole)
+            except Exception as e:
+                print(f"Row cache load error: {e}")
+
+    def hash_rows(self, df):
+        """Stable 64-bit hash per row over the model input columns"""
+        frame = df.rename(columns=lambda c: str(c).strip()).reindex(columns=self.columns)
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    def lookup(self, hashes):
+        """Return (clusters, missing mask); clusters is -1 where missing"""
+        with self.lock:
+            clusters = np.fromiter((self.rows.get(h, -1) for h in hashes.tolist()),
+                                   dtype=np.int64, count=len(hashes))
+            missing = clusters < 0
+            for h in hashes[~missing].tolist():
+                self.rows.move_to_end(h)
+            self.rows_reused += int((~missing).sum())
+            self.rows_scored += int(missing.sum())
+        return clusters, missing
+
+    def store(self, hashes, clusters):
+        records = np.empty(len(hashes), dtype=self.RECORD)
+        records['hash'] = hashes
+        records['cluster'] = clusters
+        with self.lock:
+            self.rows.update(zip(records['hash'].tolist(), records['cluster'].tolist()))
+            while len(self.rows) > self.max_rows:
+                self.rows.popitem(last=False)
+
+        # save_lock orders writers of the log; an append costs O(new rows), not O(cache)
+        with self.save_lock:
+            if self.logged + len(records) <= 2 * self.max_rows:
+                with open(self.path, 'ab') as f:
+                    f.write(records.tobytes())
+                self.logged += len(records)
+                return
+            # Compaction: every max_rows appended records at most, so amortised O(1) per row
+            with self.lock:
+                snapshot = np.empty(len(self.rows), dtype=self.RECORD)
+                snapshot['hash'] = np.fromiter(self.rows.keys(), dtype=np.uint64, count=len(self.rows))
+                snapshot['cluster'] = np.fromiter(self.rows.values(), dtype=np.int32, count=len(self.rows))
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(snapshot.tobytes())
+            os.replace(tmp_path, self.path)
+            self.logged = len(snapshot)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'rows_cached': len(self.rows),
+                'rows_reused': self.rows_reused,
+                'rows_scored': self.rows_scored
+            }
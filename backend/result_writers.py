@@ -0,0 +1,149 @@
+"""
+Chunked writers for scored batch results: CSV, XLSX and Parquet.
+
+Rows are written a chunk at a time to a file on disk, so a writer holds one
+chunk's worth of Python objects at most, whatever the row count:
+
+  - XLSX uses openpyxl's write-only workbook. Appended rows are serialised to a
+    temp file straight away and zipped into the target on close; strings are
+    written inline, so there is no shared-strings table growing with distinct
+    values (e.g. one USN per row). Excel stops at 1,048,576 rows per sheet, so
+    longer results continue on "Predictions (2)", "Predictions (3)", ...
+  - Parquet goes through one ParquetWriter, one row group per chunk.
+  - Profile_Name and Suggested_Roles only take a handful of values and are
+    written categorical: Parquet stores them dictionary-encoded, and XLSX cells
+    reuse one string per category instead of building one per row.
+
+    writer = open_writer('xlsx', path)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+"""
+import numpy as np
+import pandas as pd
+
+OUTPUT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+CATEGORICAL_OUTPUT_COLS = ['Profile_Name', 'Suggested_Roles']
+XLSX_MAX_ROWS = 1048576  # per sheet, header included
+CHUNK_ROWS = 10000
+
+
+def _with_categories(chunk):
+    for col in CATEGORICAL_OUTPUT_COLS:
+        if col in chunk.columns and not isinstance(chunk[col].dtype, pd.CategoricalDtype):
+            chunk = chunk.assign(**{col: chunk[col].astype('category')})
+    return chunk
+
+
+def _cell_values(series):
+    """One column of a chunk as a list of openpyxl-ready values (None for missing)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        names = [str(c) for c in series.cat.categories] + [None]  # code -1 -> None
+        return [names[c] for c in series.cat.codes.tolist()]
+    values = series.tolist()
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iub':
+        return values  # numpy ints / bools can't be missing
+    # NaN, None, pd.NA and NaT all become empty cells
+    missing = series.isna().to_numpy()
+    return [None if m else v for v, m in zip(values, missing)] if missing.any() else values
+
+
+class CsvResultWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxResultWriter:
+    def __init__(self, path, sheet_title='Predictions'):
+        from openpyxl import Workbook
+        self.path = path
+        self.sheet_title = sheet_title
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+        self.sheets = 0
+        self.header = None
+
+    def _next_sheet(self):
+        self.sheets += 1
+        title = self.sheet_title if self.sheets == 1 else f"{self.sheet_title} ({self.sheets})"
+        self.sheet = self.workbook.create_sheet(title)
+        self.sheet.append(self.header)
+        self.sheet_rows = 1
+
+    def write(self, chunk):
+        if self.header is None:
+            self.header = [str(c) for c in chunk.columns]
+            self._next_sheet()
+        chunk = _with_categories(chunk)
+        columns = [_cell_values(chunk[col]) for col in chunk.columns]
+        for row in zip(*columns):
+            if self.sheet_rows >= XLSX_MAX_ROWS:
+                self._next_sheet()
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.workbook.create_sheet(self.sheet_title)
+        self.workbook.save(self.path)
+
+
+class ParquetResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        chunk = _with_categories(chunk)
+        if self.writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pandas(chunk, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.table({}), self.path)
+
+
+def open_writer(fmt, path):
+    if fmt == 'csv':
+        return CsvResultWriter(path)
+    if fmt == 'xlsx':
+        return XlsxResultWriter(path)
+    if fmt == 'parquet':
+        return ParquetResultWriter(path)
+    raise ValueError(f"Unknown output format {fmt!r}; use one of {', '.join(OUTPUT_FORMATS)}")
+
+
+def write_result(df, path, fmt, chunk_rows=CHUNK_ROWS):
+    """Write a whole scored frame to `path`, chunk by chunk"""
+    writer = open_writer(fmt, path)
+    try:
+        if len(df) == 0:
+            writer.write(df)
+        for start in range(0, len(df), chunk_rows):
+            writer.write(df.iloc[start:start + chunk_rows])
+    finally:
+        writer.close()
+    return path
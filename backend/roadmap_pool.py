@@ -0,0 +1,230 @@
+"""
+Precomputed roadmap pool.
+
+The roadmap prompt only depends on the cluster (profile + roles), the CGPA and
+the project count, so we bucket CGPA and projects into a few bands and
+pre-generate one roadmap per cluster x CGPA band x project band. A background
+warmer fills the pool within a concurrency and rate budget and refreshes
+entries older than the TTL; /predict/individual reads from the pool first.
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# (lower bound inclusive, upper bound exclusive, label shown in the prompt)
+CGPA_BANDS = [
+    (float('-inf'), 6.0, 'below 6.0'),
+    (6.0, 7.0, '6.0-7.0'),
+    (7.0, 8.0, '7.0-8.0'),
+    (8.0, 9.0, '8.0-9.0'),
+    (9.0, float('inf'), '9.0 and above'),
+]
+
+PROJECT_BANDS = [
+    (float('-inf'), 1, '0'),
+    (1, 3, '1-2'),
+    (3, 5, '3-4'),
+    (5, float('inf'), '5 or more'),
+]
+
+
+def _band(value, bands):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        value = 0.0
+    for low, high, label in bands:
+        if low <= value < high:
+            return label
+    return bands[0][2]
+
+
+def profile_bucket(data):
+    """(cgpa band, project band) for an individual request payload"""
+    return _band(data.get('cgpa', 0), CGPA_BANDS), _band(data.get('projects', 0), PROJECT_BANDS)
+
+
+class RoadmapPool:
+    """Persistent store of roadmaps keyed by model version, cluster and bucket"""
+
+    def __init__(self, db_path, ttl_seconds):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS roadmaps (
+                    model_version TEXT, cluster_id INTEGER,
+                    cgpa_band TEXT, project_band TEXT,
+                    roadmap TEXT, created_at REAL,
+                    PRIMARY KEY (model_version, cluster_id, cgpa_band, project_band)
+                )
+            """)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def get(self, model_version, cluster_id, data):
+        cgpa_band, project_band = profile_bucket(data)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT roadmap FROM roadmaps WHERE model_version=? AND cluster_id=? "
+                "AND cgpa_band=? AND project_band=?",
+                (model_version, int(cluster_id), cgpa_band, project_band)
+            ).fetchone()
+        with self.lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def get_any(self, model_version, cluster_id):
+        """Most recent roadmap for the cluster in any bucket (fallback when the LLM is down)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT roadmap FROM roadmaps WHERE model_version=? AND cluster_id=? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (model_version, int(cluster_id))
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, model_version, cluster_id, cgpa_band, project_band, roadmap):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO roadmaps VALUES (?, ?, ?, ?, ?, ?)",
+                (model_version, int(cluster_id), cgpa_band, project_band, roadmap, time.time())
+            )
+
+    def ages(self, model_version):
+        """(cluster_id, cgpa_band, project_band) -> age in seconds"""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT cluster_id, cgpa_band, project_band, created_at FROM roadmaps "
+                "WHERE model_version=?", (model_version,)
+            ).fetchall()
+        return {(r[0], r[1], r[2]): now - r[3] for r in rows}
+
+    def stats(self, model_version, cluster_ids):
+        wanted = {(int(c), cb[2], pb[2]) for c in cluster_ids
+                  for cb in CGPA_BANDS for pb in PROJECT_BANDS}
+        ages = {k: v for k, v in self.ages(model_version).items() if k in wanted}
+        fresh = [a for a in ages.values() if a <= self.ttl_seconds]
+        with self.lock:
+            lookups = self.hits + self.misses
+            hit_rate = round(self.hits / lookups, 4) if lookups else 0.0
+        return {
+            'buckets_total': len(wanted),
+            'buckets_filled': len(ages),
+            'buckets_fresh': len(fresh),
+            'coverage': round(len(ages) / len(wanted), 4) if wanted else 0.0,
+            'oldest_age_seconds': round(max(ages.values()), 1) if ages else None,
+            'newest_age_seconds': round(min(ages.values()), 1) if ages else None,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate
+        }
+
+
+class RoadmapWarmer:
+    """Fills missing or stale pool entries in the background"""
+
+    def __init__(self, pool, generate_fn, concurrency=2, max_calls_per_minute=30):
+        # generate_fn(data, profile, roles) -> roadmap text, raises on failure
+        self.pool = pool
+        self.generate_fn = generate_fn
+        self.concurrency = max(1, concurrency)
+        self.min_interval = 60.0 / max_calls_per_minute if max_calls_per_minute > 0 else 0.0
+        self.rate_lock = threading.Lock()
+        self.next_slot = 0.0
+        self.llm_calls = 0
+        self.failures = 0
+        self.last_run_at = None
+        self.running = False
+
+    def _wait_for_slot(self):
+        # Space calls evenly so a warm run never bursts against the LLM quota
+        with self.rate_lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _warm_one(self, model_version, cluster_id, info, cgpa_band, project_band):
+        self._wait_for_slot()
+        data = {'cgpa': cgpa_band, 'projects': project_band}
+        try:
+            roadmap = self.generate_fn(data, info.get('name', ''), info.get('roles'))
+            self.pool.put(model_version, cluster_id, cgpa_band, project_band, roadmap)
+            self.llm_calls += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"Roadmap warm error (cluster {cluster_id}, {cgpa_band}, {project_band}): {e}")
+
+    def run_once(self, model_version, cluster_info):
+        """Generate every missing or stale bucket for the current clusters"""
+        ages = self.pool.ages(model_version)
+        todo = []
+        for cluster_id, info in (cluster_info or {}).items():
+            for _, _, cgpa_band in CGPA_BANDS:
+                for _, _, project_band in PROJECT_BANDS:
+                    age = ages.get((int(cluster_id), cgpa_band, project_band))
+                    if age is None or age > self.pool.ttl_seconds:
+                        todo.append((model_version, cluster_id, info, cgpa_band, project_band))
+
+        self.running = True
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as ex:
+                list(ex.map(lambda job: self._warm_one(*job), todo))
+        finally:
+            self.running = False
+            self.last_run_at = time.time()
+        return len(todo)
+
+    def start(self, get_state, interval_seconds=0):
+        """Run in a daemon thread; get_state() -> (model_version, cluster_info)"""
+        def loop():
+            while True:
+                version, info = get_state()
+                if version and info:
+                    count = self.run_once(version, info)
+                    print(f"Roadmap pool warm run finished ({count} buckets)")
+                if interval_seconds <= 0:
+                    return
+                time.sleep(interval_seconds)
+
+        thread = threading.Thread(target=loop, name='roadmap-warmer', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'last_run_at': self.last_run_at,
+            'llm_calls': self.llm_calls,
+            'failures': self.failures,
+            'concurrency': self.concurrency
+        }
+
+
+def template_roadmap(profile, roles):
+    """Static roadmap used when the LLM is unavailable and nothing is cached"""
+    roles_text = ", ".join(roles) if roles else "roles that match your profile"
+    profile_text = profile or "your target career track"
+    return f"""6 Month Roadmap: {profile_text}
+Target roles: {roles_text}
+
+Month 1-2: Strengthen fundamentals. Clear any backlogs, revise core subjects and pick one primary skill for {roles_text}.
+Month 3: Build one end-to-end project in that skill and publish it on GitHub with a clear README.
+Month 4: Earn one recognised certification and take part in a hackathon or open-source contribution.
+Month 5: Apply for internships and prepare a one-page resume tailored to {roles_text}.
+Month 6: Practise interviews (technical and HR), network with alumni and review progress with a mentor.
+
+(This is a standard plan. A personalised roadmap will be available when the AI counsellor is back online.)"""
@@ -0,0 +1,326 @@
+"""
+Sharded batch scoring across several backend instances.
+
+A large CSV / XLSX / Parquet file is cut into shards of shard_rows rows, and
+each shard is posted as a small CSV upload to /predict/batch?delivery=attachment
+on one of a list of backend instances (the same app.py, started with different
+PORTs or on different hosts). One pooled HTTP session keeps connections open
+to every instance.
+
+Each shard goes to the instance with the fewest shards in flight. A shard that
+fails (connection error, timeout, 5xx, or 503 while an instance warms up) is
+retried on an instance it has not failed on yet, and an instance that keeps
+failing sits out for a cooldown. A 4xx answer such as a failed validation is
+final. Scored shards are appended to the output in input order as soon as every
+shard before them is done, so only a bounded window of shards is ever in
+memory. The profile distribution is summed from each shard's X-Distribution
+header.
+
+Every shard is stored by the instance that scored it, under the given academic
+year, as its own upload. A shard that timed out on one instance but had in fact
+been stored there can therefore appear twice in the prediction store; the
+merged output file never has duplicates.
+
+    python shard_coordinator.py run big.parquet --output scored.csv \\
+        --instances http://10.0.0.5:5001 http://10.0.0.6:5001
+    python shard_coordinator.py bench --rows 400000 --instances 1 2 3 4
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from chunk_readers import read_chunks
+
+SCORING_INSTANCES = os.getenv("SCORING_INSTANCES", "http://127.0.0.1:5001")
+SHARD_ROWS = int(os.getenv("SHARD_ROWS", "50000"))
+SHARD_TIMEOUT_SECONDS = float(os.getenv("SHARD_TIMEOUT_SECONDS", "120"))
+
+
+class ShardFailed(Exception):
+    pass
+
+
+class ShardCoordinator:
+    def __init__(self, instances, per_instance=2, timeout=120, max_attempts=3, cooldown_seconds=30,
+                 academic_year=None):
+        self.instances = [url.rstrip('/') for url in instances]
+        if not self.instances:
+            raise ValueError("At least one scoring instance is needed")
+        self.concurrency = len(self.instances) * per_instance
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.cooldown_seconds = cooldown_seconds
+        self.academic_year = academic_year
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.instances), pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.failures = Counter()  # consecutive failures per instance
+        self.down_until = {}
+        self.stats = {url: {'shards': 0, 'rows': 0, 'failures': 0, 'seconds': 0.0} for url in self.instances}
+
+    # --- instances ---
+
+    def probe(self):
+        """Drop instances that don't answer /health/ready; returns the ones kept"""
+        ready = []
+        for url in self.instances:
+            try:
+                if self.session.get(f"{url}/health/ready", timeout=5).status_code == 200:
+                    ready.append(url)
+                    continue
+            except requests.RequestException:
+                pass
+            print(f"   {url} is not ready; leaving it out")
+        if not ready:
+            raise ShardFailed("No scoring instance is ready")
+        self.instances = ready
+        return ready
+
+    def _pick(self, tried):
+        """Least-loaded instance this shard hasn't failed on, preferring ones not cooling down"""
+        with self.lock:
+            now = time.monotonic()
+            candidates = [u for u in self.instances if u not in tried] or list(self.instances)
+            healthy = [u for u in candidates if self.down_until.get(u, 0) <= now] or candidates
+            url = min(healthy, key=lambda u: self.in_flight[u])
+            self.in_flight[url] += 1
+            return url
+
+    def _release(self, url, ok, rows=None, seconds=0.0):
+        with self.lock:
+            self.in_flight[url] -= 1
+            stats = self.stats[url]
+            if ok:
+                self.failures[url] = 0
+            if ok and rows is not None:
+                stats['shards'] += 1
+                stats['rows'] += rows
+                stats['seconds'] += seconds
+            elif not ok:
+                self.failures[url] += 1
+                stats['failures'] += 1
+                if self.failures[url] >= 2:
+                    self.down_until[url] = time.monotonic() + self.cooldown_seconds
+
+    # --- shards ---
+
+    def score_shard(self, index, chunk):
+        """(index, rows, scored CSV bytes, distribution, upload_id), retried across instances"""
+        body = chunk.to_csv(index=False).encode()
+        data = {'academic_year': self.academic_year} if self.academic_year else {}
+        tried, errors = set(), []
+        for _ in range(self.max_attempts):
+            url = self._pick(tried)
+            tried.add(url)
+            t0 = time.perf_counter()
+            try:
+                response = self.session.post(
+                    f"{url}/predict/batch", params={'delivery': 'attachment'}, data=data,
+                    files={'file': (f"shard-{index:06d}.csv", body, 'text/csv')}, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._release(url, False)
+                errors.append(f"{url}: {e}")
+                continue
+            if response.status_code == 200:
+                self._release(url, True, len(chunk), time.perf_counter() - t0)
+                distribution = json.loads(response.headers.get('X-Distribution') or '{}')
+                return index, len(chunk), response.content, distribution, response.headers.get('X-Upload-Id')
+            if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                # The shard itself is bad; another instance would say the same
+                self._release(url, True)
+                raise ShardFailed(f"Shard {index} rejected by {url} ({response.status_code}): "
+                                  f"{response.text[:500]}")
+            self._release(url, False)
+            errors.append(f"{url}: HTTP {response.status_code}")
+        raise ShardFailed(f"Shard {index} failed on every attempt: {'; '.join(errors)}")
+
+    def run(self, path, output, shard_rows=50000):
+        """Score `path` shard by shard and write one CSV to `output`, in input order"""
+        distribution = Counter()
+        upload_ids = []
+        rows = 0
+        done = {}  # index -> scored bytes, waiting for the shards before it
+        next_to_write = 0
+        window = self.concurrency * 2
+        t0 = time.perf_counter()
+
+        tmp = output + '.tmp'
+        with open(tmp, 'wb') as out, ThreadPoolExecutor(self.concurrency) as executor:
+            pending = set()
+
+            def collect(block):
+                nonlocal next_to_write, rows
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED) if block else (
+                    {f for f in pending if f.done()}, None)
+                for future in finished:
+                    pending.discard(future)
+                    index, shard_rows_scored, body, shard_distribution, upload_id = future.result()
+                    done[index] = body
+                    rows += shard_rows_scored
+                    distribution.update(shard_distribution)
+                    if upload_id:
+                        upload_ids.append(upload_id)
+                while next_to_write in done:
+                    body = done.pop(next_to_write)
+                    if next_to_write:
+                        body = body[body.index(b'\n') + 1:]  # header only once
+                    out.write(body)
+                    next_to_write += 1
+
+            try:
+                for index, chunk in read_chunks(path, shard_rows):
+                    pending.add(executor.submit(self.score_shard, index, chunk))
+                    # Stop reading while the window between the oldest unwritten shard and this one is full
+                    while index + 1 - next_to_write >= window and pending:
+                        collect(block=True)
+                    collect(block=False)
+                while pending:
+                    collect(block=True)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                out.close()
+                os.remove(tmp)
+                raise
+        os.replace(tmp, output)
+
+        return {
+            'rows': rows,
+            'shards': next_to_write,
+            'seconds': round(time.perf_counter() - t0, 3),
+            'distribution': dict(distribution),
+            'upload_ids': upload_ids,
+            'instances': {url: {**s, 'seconds': round(s['seconds'], 3)} for url, s in self.stats.items()}
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def print_result(result):
+    seconds = result['seconds'] or 1e-9
+    print(f"{result['rows']:,} rows in {result['shards']} shards, {result['seconds']:.1f}s "
+          f"({result['rows'] / seconds:,.0f} rows/s)")
+    for url, s in result['instances'].items():
+        print(f"   {url:<28} {s['shards']:>5} shards {s['rows']:>10,} rows {s['failures']:>3} failures")
+    total = sum(result['distribution'].values()) or 1
+    for name, count in sorted(result['distribution'].items(), key=lambda kv: -kv[1]):
+        print(f"   {name:<35} {count:>12,} ({count / total * 100:5.1f}%)")
+
+
+# --- local scaling benchmark: N copies of app.py on consecutive ports ---
+
+def start_instances(n, base_port, workdir):
+    import subprocess
+    import sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    procs, urls = [], []
+    for i in range(n):
+        port = base_port + i
+        scratch = os.path.join(workdir, f"instance-{port}")
+        os.makedirs(scratch, exist_ok=True)
+        env = {**os.environ, 'PORT': str(port), 'DISABLE_BACKGROUND_TASKS': '1',
+               # Fresh caches and store per instance so repeated runs really score
+               'RESULT_CACHE_DIR': os.path.join(scratch, 'cache'),
+               'PREDICTION_STORE_DIR': os.path.join(scratch, 'store'),
+               # Each instance stays on one process; the instances are the parallelism
+               'SCORING_WORKERS': '1'}
+        log = open(os.path.join(scratch, 'app.log'), 'wb')
+        procs.append(subprocess.Popen([sys.executable, 'app.py'], cwd=here, env=env,
+                                      stdout=log, stderr=subprocess.STDOUT))
+        urls.append(f"http://127.0.0.1:{port}")
+
+    deadline = time.monotonic() + 120
+    for url, proc in zip(urls, procs):
+        while True:
+            try:
+                if requests.get(f"{url}/health/ready", timeout=2).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if proc.poll() is not None or time.monotonic() > deadline:
+                stop_instances(procs)
+                raise SystemExit(f"{url} did not come up; see {workdir}/instance-*/app.log")
+            time.sleep(0.5)
+    return procs, urls
+
+
+def stop_instances(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except Exception:
+            proc.kill()
+
+
+def bench(rows, instance_counts, shard_rows, per_instance, base_port):
+    import tempfile
+    from benchmarks import synthetic_students
+
+    workdir = tempfile.mkdtemp(prefix='shard-bench-')
+    source = os.path.join(workdir, 'students.csv')
+    synthetic_students(rows).to_csv(source, index=False)
+    print(f"rows={rows:,} shard_rows={shard_rows:,} per_instance={per_instance} cpus={os.cpu_count()}")
+
+    baseline = None
+    for n in instance_counts:
+        procs, urls = start_instances(n, base_port, os.path.join(workdir, f"run-{n}"))
+        try:
+            coordinator = ShardCoordinator(urls, per_instance=per_instance)
+            result = coordinator.run(source, os.path.join(workdir, f"scored-{n}.csv"), shard_rows)
+            coordinator.close()
+        finally:
+            stop_instances(procs)
+        rate = result['rows'] / result['seconds']
+        baseline = baseline or rate
+        print(f"  instances={n}  {result['seconds']:7.2f}s  {rate:>10,.0f} rows/s  x{rate / baseline:4.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large file across several backend instances")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('run')
+    p.add_argument('input', help="CSV, XLSX or Parquet file")
+    p.add_argument('--output', required=True, help="Scored CSV")
+    p.add_argument('--instances', nargs='+', default=SCORING_INSTANCES.split(','))
+    p.add_argument('--shard-rows', type=int, default=SHARD_ROWS)
+    p.add_argument('--per-instance', type=int, default=2, help="Shards in flight per instance")
+    p.add_argument('--timeout', type=float, default=SHARD_TIMEOUT_SECONDS)
+    p.add_argument('--academic-year')
+    p = sub.add_parser('bench')
+    p.add_argument('--rows', type=int, default=400000)
+    p.add_argument('--instances', type=int, nargs='+', default=[1, 2, 3, 4])
+    p.add_argument('--shard-rows', type=int, default=SHARD_ROWS)
+    p.add_argument('--per-instance', type=int, default=2)
+    p.add_argument('--base-port', type=int, default=5101)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        bench(args.rows, args.instances, args.shard_rows, args.per_instance, args.base_port)
+        return
+
+    coordinator = ShardCoordinator(args.instances, per_instance=args.per_instance, timeout=args.timeout,
+                                   academic_year=args.academic_year)
+    try:
+        coordinator.probe()
+        print_result(coordinator.run(args.input, args.output, args.shard_rows))
+    finally:
+        coordinator.close()
+
+
+if __name__ == '__main__':
+    main()
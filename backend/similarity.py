@@ -0,0 +1,294 @@
+"""
+Nearest-alumni search over the training cohort embeddings (embeddings.npy).
+
+The index uses an IVF layout: every stored vector is assigned to its closest
+coarse centroid and the vectors are written grouped by list, so a query only
+scans the few lists nearest to it. Small cohorts reuse the trained KMeans
+centroids as the coarse quantizer; from AUTO_LISTS_MIN_ROWS vectors on, a finer
+one with about sqrt(N) lists is fitted on a sample (or pass --n-lists).
+
+Build offline (from the backend folder):
+
+    python similarity.py --source students.xlsx --outcome-col Status_after_Graduation
+
+The backend memory-maps the resulting arrays at startup.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+
+INDEX_DIR = os.path.join(os.path.dirname(__file__), '..', 'models', 'similarity_index')
+
+# Rows per block when assigning vectors to lists (keeps build memory flat)
+ASSIGN_BLOCK = 65536
+# Below this many vectors the handful of KMeans centroids are fine as lists
+AUTO_LISTS_MIN_ROWS = 20000
+# Quantizer training rows per list
+TRAIN_ROWS_PER_LIST = 64
+
+
+def default_n_lists(n, kmeans_lists):
+    """About sqrt(N) lists for large indexes, 0 (reuse the KMeans centroids) for small ones"""
+    if n < AUTO_LISTS_MIN_ROWS:
+        return 0
+    return max(int(kmeans_lists), int(round(np.sqrt(n))))
+
+
+def _assign_to_lists(vectors, centroids):
+    """Return the nearest centroid for every row, computed block by block"""
+    c_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2 ; |x|^2 is constant per row
+        dist = c_norms[None, :] - 2.0 * (block @ centroids.T)
+        assignments[start:start + len(block)] = dist.argmin(axis=1)
+    return assignments
+
+
+def build_index(embeddings, kmeans, out_dir=INDEX_DIR, n_lists=None,
+                outcomes=None, student_ids=None, random_state=42):
+    """Build the IVF index on disk and return its metadata
+
+    n_lists=None picks default_n_lists(N); 0 reuses the KMeans centroids.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    os.makedirs(out_dir, exist_ok=True)
+
+    if n_lists is None:
+        n_lists = default_n_lists(n, kmeans.n_clusters)
+    if n_lists:
+        from sklearn.cluster import MiniBatchKMeans
+        rng = np.random.default_rng(random_state)
+        train_rows = min(n, max(TRAIN_ROWS_PER_LIST * n_lists, 8192))
+        sample = np.sort(rng.choice(n, size=train_rows, replace=False)) if train_rows < n else slice(None)
+        quantizer = MiniBatchKMeans(n_clusters=n_lists, batch_size=8192,
+                                    n_init=3, random_state=random_state)
+        quantizer.fit(embeddings[sample])
+        centroids = quantizer.cluster_centers_.astype(np.float32)
+    else:
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+
+    lists = _assign_to_lists(embeddings, centroids)
+    clusters = kmeans.predict(embeddings).astype(np.int16)
+
+    # Group rows by list so each list is one contiguous slice
+    order = np.argsort(lists, kind='stable')
+    counts = np.bincount(lists, minlength=len(centroids))
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    vectors = embeddings[order]
+    np.save(os.path.join(out_dir, 'centroids.npy'), centroids)
+    np.save(os.path.join(out_dir, 'vectors.npy'), vectors)
+    np.save(os.path.join(out_dir, 'norms.npy'), (vectors ** 2).sum(axis=1))
+    np.save(os.path.join(out_dir, 'offsets.npy'), offsets)
+    np.save(os.path.join(out_dir, 'row_ids.npy'), order.astype(np.int64))
+    np.save(os.path.join(out_dir, 'clusters.npy'), clusters[order])
+
+    meta = {'n_vectors': int(n), 'dim': int(dim), 'n_lists': int(len(centroids)),
+            'outcomes': [], 'built_at': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    # Outcomes are stored as small integer codes plus a vocabulary
+    if outcomes is not None:
+        codes, vocab = _encode_outcomes(outcomes)
+        np.save(os.path.join(out_dir, 'outcomes.npy'), codes[order])
+        meta['outcomes'] = vocab
+
+    if student_ids is not None:
+        ids = np.asarray([str(s) for s in student_ids])
+        np.save(os.path.join(out_dir, 'student_ids.npy'), ids[order])
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def _encode_outcomes(outcomes):
+    values = np.asarray([None if v is None or v != v else str(v) for v in outcomes], dtype=object)
+    present = values != None  # noqa: E711 (elementwise comparison)
+    vocab = sorted(set(values[present]))
+    lookup = {v: i for i, v in enumerate(vocab)}
+    codes = np.full(len(values), -1, dtype=np.int16)
+    codes[present] = [lookup[v] for v in values[present]]
+    return codes, vocab
+
+
+class SimilarityIndex:
+    """Read-only view of a built index; arrays are memory-mapped"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        def load(name, required=True):
+            path = os.path.join(index_dir, name)
+            if not os.path.exists(path):
+                if required:
+                    raise FileNotFoundError(path)
+                return None
+            return np.load(path, mmap_mode='r')
+
+        self.centroids = np.asarray(load('centroids.npy'))
+        self.offsets = np.asarray(load('offsets.npy'))
+        self.vectors = load('vectors.npy')
+        self.norms = load('norms.npy')
+        self.row_ids = load('row_ids.npy')
+        self.clusters = load('clusters.npy')
+        self.outcomes = load('outcomes.npy', required=False)
+        self.student_ids = load('student_ids.npy', required=False)
+        self.outcome_vocab = self.meta.get('outcomes', [])
+        self.dim = self.meta['dim']
+        self.n_lists = len(self.centroids)
+        # Default probes: about sqrt(lists), i.e. ~N^0.25 of the sqrt(N) lists (recall@10 ~1.0 at 1M)
+        self.default_nprobe = min(self.n_lists, max(2, int(np.ceil(np.sqrt(self.n_lists)))))
+
+    def __len__(self):
+        return int(self.meta['n_vectors'])
+
+    def search(self, query, k=5, nprobe=None):
+        """Return (positions, squared distances) of the k nearest stored vectors"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query has {q.shape[0]} features, index expects {self.dim}")
+
+        nprobe = max(1, min(nprobe or self.default_nprobe, self.n_lists))
+        c_dist = ((self.centroids - q) ** 2).sum(axis=1)
+        probe = np.argpartition(c_dist, nprobe - 1)[:nprobe] if nprobe < self.n_lists else np.arange(self.n_lists)
+
+        q_norm = float(q @ q)
+        positions, distances = [], []
+        for lst in probe:
+            start, stop = int(self.offsets[lst]), int(self.offsets[lst + 1])
+            if stop == start:
+                continue
+            d = self.norms[start:stop] - 2.0 * (self.vectors[start:stop] @ q) + q_norm
+            if len(d) > k:
+                top = np.argpartition(d, k - 1)[:k]
+            else:
+                top = np.arange(len(d))
+            positions.append(top + start)
+            distances.append(d[top])
+
+        if not positions:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        positions = np.concatenate(positions)
+        distances = np.maximum(np.concatenate(distances), 0)
+        best = np.argsort(distances, kind='stable')[:k]
+        return positions[best], distances[best]
+
+    def brute_force(self, query, k=5):
+        """Exact search over every stored vector (used to measure recall)"""
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        d = np.asarray(self.norms) - 2.0 * (np.asarray(self.vectors) @ q) + float(q @ q)
+        top = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+        top = top[np.argsort(d[top], kind='stable')]
+        return top, np.maximum(d[top], 0)
+
+    def describe(self, positions, distances, cluster_info=None):
+        """Turn search hits into JSON-friendly records"""
+        cluster_info = cluster_info or {}
+        results = []
+        for pos, dist in zip(positions, distances):
+            cid = int(self.clusters[pos])
+            outcome = None
+            if self.outcomes is not None and self.outcomes[pos] >= 0:
+                outcome = self.outcome_vocab[int(self.outcomes[pos])]
+            results.append({
+                'row': int(self.row_ids[pos]),
+                'student_id': str(self.student_ids[pos]) if self.student_ids is not None else None,
+                'distance': round(float(np.sqrt(dist)), 4),
+                'cluster_id': cid,
+                'profile_name': cluster_info.get(cid, {}).get('name', f'Cluster {cid}'),
+                'outcome': outcome
+            })
+        return results
+
+
+def load_similarity_index(index_dir=INDEX_DIR):
+    """Load the index if it has been built, else None"""
+    if not os.path.exists(os.path.join(index_dir, 'meta.json')):
+        return None
+    try:
+        return SimilarityIndex(index_dir)
+    except Exception as e:
+        print(f"Similarity index load error: {e}")
+        return None
+
+
+def measure_recall(index, queries, k=10, nprobe=None):
+    """Recall@k and query latency (mean, p50, p99) of the IVF search against brute force"""
+    hits, total, latencies = 0, 0, []
+    for q in queries:
+        t0 = time.perf_counter()
+        approx, _ = index.search(q, k=k, nprobe=nprobe)
+        latencies.append(time.perf_counter() - t0)
+        exact, _ = index.brute_force(q, k=k)
+        hits += len(np.intersect1d(approx, exact))
+        total += len(exact)
+    latencies = 1000 * np.asarray(latencies or [0.0])
+    return {
+        'recall': hits / total if total else 0.0,
+        'mean_latency_ms': float(latencies.mean()),
+        'p50_latency_ms': float(np.percentile(latencies, 50)),
+        'p99_latency_ms': float(np.percentile(latencies, 99)),
+        'nprobe': nprobe or index.default_nprobe,
+        'k': k
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the nearest-alumni index")
+    model_dir = os.path.join(os.path.dirname(__file__), '..', 'models')
+    parser.add_argument('--embeddings', default=os.path.join(model_dir, 'embeddings.npy'))
+    parser.add_argument('--kmeans', default=os.path.join(model_dir, 'kmeans_model.pkl'))
+    parser.add_argument('--out', default=INDEX_DIR)
+    parser.add_argument('--n-lists', type=int, default=None,
+                        help="Coarse lists (default: about sqrt(N) for large inputs; 0 = the KMeans centroids)")
+    parser.add_argument('--source', help="Training file (CSV/XLSX) in the same row order as the embeddings")
+    parser.add_argument('--outcome-col', default='Status_after_Graduation')
+    parser.add_argument('--id-col', default='USN')
+    parser.add_argument('--recall-queries', type=int, default=200)
+    args = parser.parse_args()
+
+    embeddings = np.load(args.embeddings, mmap_mode='r')
+    with open(args.kmeans, 'rb') as f:
+        kmeans = pickle.load(f)
+
+    outcomes, student_ids = None, None
+    if args.source:
+        import pandas as pd
+        if args.source.endswith('.csv'):
+            df = pd.read_csv(args.source)
+        else:
+            df = pd.read_excel(args.source)
+        df.columns = [c.strip() for c in df.columns]
+        if len(df) != len(embeddings):
+            raise ValueError(f"Source has {len(df)} rows but embeddings have {len(embeddings)}")
+        if args.outcome_col in df.columns:
+            outcomes = df[args.outcome_col].tolist()
+        if args.id_col in df.columns:
+            student_ids = df[args.id_col].tolist()
+
+    print(f"Building index over {len(embeddings)} vectors...")
+    t0 = time.perf_counter()
+    meta = build_index(embeddings, kmeans, args.out, args.n_lists, outcomes, student_ids)
+    print(f"Built {meta['n_lists']} lists in {time.perf_counter() - t0:.1f}s")
+
+    index = SimilarityIndex(args.out)
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(embeddings), size=min(args.recall_queries, len(embeddings)), replace=False)
+    queries = np.asarray(embeddings[np.sort(sample)], dtype=np.float32)
+    stats = measure_recall(index, queries, k=10)
+    print(f"Recall@10: {stats['recall']:.3f}  latency p50 {stats['p50_latency_ms']:.2f} ms, "
+          f"p99 {stats['p99_latency_ms']:.2f} ms (nprobe={stats['nprobe']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend is a flat set of modules run from backend/, not an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,100 @@
+"""
+Randomized add / replace / delete sequences against CohortAggregates.
+
+The reference totals come straight from a pandas groupby over the uploads that
+are still live, not from aggregates.contribution(), so a bug in key building
+or in the fixed-point sums cannot show up on both sides.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import METRICS, SCALE, CohortAggregates
+
+PROFILES = np.array(['Tech', 'Research', 'Corporate', 'Entrepreneur', 'Low-skill', None], dtype=object)
+BRANCHES = np.array(['CSE', 'ECE', 'ME', None], dtype=object)
+
+
+def random_upload(rng):
+    n = int(rng.integers(1, 300))
+    clusters = rng.integers(0, 5, n)
+    # Roughly 2% of rows have no profile name, 5% no CGPA
+    profile_idx = np.where(rng.random(n) < 0.02, len(PROFILES) - 1, clusters)
+    return pd.DataFrame({
+        'Cluster_ID': clusters,
+        'Profile_Name': PROFILES[profile_idx],
+        'Branch_Department': rng.choice(BRANCHES, n),
+        'CGPA': np.where(rng.random(n) < 0.05, np.nan, np.round(rng.uniform(4, 10, n), 2)),
+        'Technical_Skills_Score': rng.integers(1, 6, n),
+        'Soft_Skills_Score': rng.uniform(1, 5, n),
+    })
+
+
+def reference_totals(live):
+    """{table: {key: count}} and per-cluster float sums, from the live frames alone"""
+    if not live:
+        return {}, {}, {}
+    df = pd.concat([frame.assign(year=year) for year, frame in live.values()], ignore_index=True)
+    df['profile'] = df['Profile_Name'].fillna('Unknown')
+    df['branch'] = df['Branch_Department'].fillna('Unknown')
+
+    year_profile = {f"{y}|{p}": int(c) for (y, p), c in df.groupby(['year', 'profile']).size().items()}
+    branch_profile = {f"{b}|{p}": int(c) for (b, p), c in df.groupby(['branch', 'profile']).size().items()}
+    grouped = df.groupby('Cluster_ID')
+    clusters = {str(cid): {'rows': int(len(g)),
+                           **{m: (int(g[m].count()), float(g[m].sum())) for m in METRICS}}
+                for cid, g in grouped}
+    return year_profile, branch_profile, clusters
+
+
+def assert_matches_reference(agg, live):
+    year_profile, branch_profile, clusters = reference_totals(live)
+    totals = agg.totals()
+    assert totals['year_profile'] == year_profile
+    assert totals['branch_profile'] == branch_profile
+    assert set(totals['clusters']) == set(clusters)
+    for cid, expected in clusters.items():
+        stats = totals['clusters'][cid]
+        assert stats['rows'] == expected['rows']
+        for m in METRICS:
+            n, total = expected[m]
+            assert stats.get(f"{m}_n", 0) == n
+            # Each value is rounded to 1/SCALE once, so the error is at most half a unit per row
+            assert abs(stats.get(f"{m}_sum", 0) / SCALE - total) <= n * 0.5 / SCALE + 1e-9
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_incremental_totals_match_groupby(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    path = str(tmp_path / 'aggregates.json')
+    agg = CohortAggregates(path)
+    live = {}
+
+    for step in range(150):
+        action = rng.choice(['add', 'add', 'replace', 'delete'])
+        if action in ('replace', 'delete') and live:
+            upload_id = str(rng.choice(sorted(live)))
+        else:
+            upload_id, action = f"u{step}", 'add'
+
+        if action == 'delete':
+            assert agg.remove_upload(upload_id)
+            live.pop(upload_id)
+        else:
+            year = str(rng.choice(['2022', '2023', '2024']))
+            df = random_upload(rng)
+            agg.add_upload(upload_id, year, df)
+            live[upload_id] = (year, df)
+
+        assert_matches_reference(agg, live)
+
+    # Only contributions are persisted; reloading must rebuild the same totals
+    assert CohortAggregates(path).totals() == agg.totals()
+
+
+def test_remove_unknown_upload_is_a_no_op(tmp_path):
+    agg = CohortAggregates(str(tmp_path / 'aggregates.json'))
+    agg.add_upload('a', '2024', random_upload(np.random.default_rng(0)))
+    before = agg.totals()
+    assert not agg.remove_upload('missing')
+    assert agg.totals() == before
@@ -0,0 +1,151 @@
+"""
+Per-request timing spans, Server-Timing headers and a JSON-lines trace log.
+
+Code marks phases with `with span('preprocess'):`. Spans attach to the trace
+of the current request (a contextvar, so calls outside a request are no-ops).
+At the end of the request the spans are summed per name into a Server-Timing
+header, and the full trace is handed to a background writer thread through a
+bounded queue. Request threads never touch the log file; if the writer falls
+behind, traces are dropped and counted instead of blocking.
+"""
+import contextvars
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('trace', default=None)
+
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class Trace:
+    def __init__(self, request_id, method, path):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.t0 = time.perf_counter()
+        self.spans = []  # (name, start ms, duration ms)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def server_timing(self):
+        totals = {}
+        for name, _, duration in self.spans:
+            totals[name] = totals.get(name, 0.0) + duration
+        parts = [f"{name};dur={ms:.1f}" for name, ms in totals.items()]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def record(self, status):
+        return {
+            'request_id': self.request_id,
+            'method': self.method,
+            'path': self.path,
+            'status': status,
+            'started_at': round(self.started_at, 3),
+            'duration_ms': round(self.elapsed_ms(), 2),
+            'spans': [{'name': n, 'start_ms': round(s, 2), 'duration_ms': round(d, 2)}
+                      for n, s, d in self.spans]
+        }
+
+
+def begin(method, path, request_id=None):
+    """Start the trace for the current request; an acceptable incoming id is kept"""
+    if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+        request_id = uuid.uuid4().hex
+    trace = Trace(request_id, method, path)
+    _current.set(trace)
+    return trace
+
+
+def end():
+    trace = _current.get()
+    _current.set(None)
+    return trace
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end_time = time.perf_counter()
+        trace.spans.append((name, (start - trace.t0) * 1000, (end_time - start) * 1000))
+
+
+class TraceWriter:
+    def __init__(self, path, max_queue=10000, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.written = 0
+        self.dropped = 0
+        self.thread = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def submit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Drain whatever else is waiting so a burst costs one write
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            self._write([r for r in batch if r is not None])
+            if stop:
+                return
+
+    def _write(self, records):
+        if not records:
+            return
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a') as f:
+                f.write("".join(json.dumps(r) + "\n" for r in records))
+            self.written += len(records)
+        except OSError as e:
+            print(f"Trace write error: {e}")
+
+    def close(self, timeout=2.0):
+        """Flush what is queued and stop the thread"""
+        if self.thread is not None:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.thread.join(timeout)
+            self.thread = None
+
+    def stats(self):
+        return {'path': self.path, 'written': self.written, 'dropped': self.dropped,
+                'queued': self.queue.qsize(), 'running': self.thread is not None}
@@ -0,0 +1,141 @@
+"""
+Up-front validation of batch uploads against the 17 model columns.
+
+The schema is compiled once (per loaded set of label encoders) into arrays of
+bounds and flags, so checking an upload is a handful of vectorized masks over
+the whole frame. Columns are checked cheapest-first and validation stops as
+soon as the share of bad rows already exceeds the allowed error rate.
+"""
+import numpy as np
+import pandas as pd
+
+# column -> (min, max, whole number, required)
+NUMERIC_SPEC = {
+    'Age': (15, 60, True, False),
+    'CGPA': (0, 10, False, True),
+    'Number_of_Backlogs': (0, 50, True, False),
+    'Number_of_Internships': (0, 20, True, False),
+    'Number_of_Publications': (0, 50, True, False),
+    'Number_of_Projects': (0, 100, True, False),
+    'Number_of_Certification_Courses': (0, 100, True, False),
+    'Technical_Skills_Score': (1, 5, False, False),
+    'Number_of_Hackathons': (0, 100, True, False),
+    'Soft_Skills_Score': (1, 5, False, False),
+}
+
+# column -> required; allowed values come from the fitted label encoders
+CATEGORICAL_SPEC = {
+    'Gender': False,
+    'Branch_Department': True,
+    'Type_of_Internships': False,
+    'Co_curricular_Activities': False,
+    'Leadership_Roles': False,
+    'Entrepreneur_Cell_Member': False,
+    'Family_Business_Background': False,
+}
+
+MAX_REPORTED_ERRORS = 100
+
+
+class ValidationSchema:
+    def __init__(self, label_encoders=None):
+        self.numeric_cols = list(NUMERIC_SPEC)
+        spec = np.array([NUMERIC_SPEC[c] for c in self.numeric_cols], dtype=np.float64)
+        self.mins, self.maxs = spec[:, 0], spec[:, 1]
+        self.whole = spec[:, 2].astype(bool)
+        self.required_numeric = spec[:, 3].astype(bool)
+
+        self.categorical_cols = list(CATEGORICAL_SPEC)
+        self.required_categorical = np.array([CATEGORICAL_SPEC[c] for c in self.categorical_cols])
+        self.allowed = {
+            col: np.asarray(le.classes_).astype(str)
+            for col, le in (label_encoders or {}).items() if col in CATEGORICAL_SPEC
+        }
+
+    def validate(self, df, max_error_rate=0.1):
+        """Return a compact report; 'aborted' is set when validation stopped early"""
+        n = len(df)
+        columns = {str(c).strip(): c for c in df.columns}
+        bad_rows = np.zeros(n, dtype=bool)
+        counts = {}
+        samples = []
+        limit = max_error_rate * n
+
+        def record(col, code, mask, values=None):
+            hits = int(mask.sum())
+            if not hits:
+                return
+            counts.setdefault(col, {})[code] = hits
+            bad_rows[mask] = True
+            if len(samples) < MAX_REPORTED_ERRORS:
+                for i in np.flatnonzero(mask)[:MAX_REPORTED_ERRORS - len(samples)]:
+                    value = None if values is None else values.iloc[i]
+                    samples.append({'row': int(i), 'column': col, 'code': code,
+                                    'value': None if value is None or value != value else str(value)})
+
+        def over_limit():
+            return n and bad_rows.sum() > limit
+
+        def report(aborted):
+            errors = int(bad_rows.sum())
+            return {
+                'valid': errors == 0,
+                'aborted': bool(aborted),
+                'rows': n,
+                'rows_with_errors': errors,
+                'error_rate': round(errors / n, 4) if n else 0.0,
+                'max_error_rate': max_error_rate,
+                'columns': counts,
+                'errors': sorted(samples, key=lambda e: (e['row'], e['column']))
+            }
+
+        if n == 0:
+            counts['_file'] = {'empty': 1}
+            return report(True)
+
+        # 1. Required columns that are missing entirely fail every row
+        missing_required = [c for c, req in zip(self.numeric_cols, self.required_numeric) if req and c not in columns]
+        missing_required += [c for c, req in zip(self.categorical_cols, self.required_categorical)
+                             if req and c not in columns]
+        for col in missing_required:
+            record(col, 'missing_column', np.ones(n, dtype=bool))
+        if over_limit():
+            return report(True)
+
+        # 2. All numeric columns in one block
+        present = [i for i, c in enumerate(self.numeric_cols) if c in columns]
+        if present:
+            raw = df[[columns[self.numeric_cols[i]] for i in present]]
+            values = raw.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+            given = raw.notna().to_numpy()
+            mins, maxs = self.mins[present], self.maxs[present]
+            whole, required = self.whole[present], self.required_numeric[present]
+
+            with np.errstate(invalid='ignore'):
+                masks = {
+                    'missing': ~given & required,
+                    'not_numeric': np.isnan(values) & given,
+                    'out_of_range': (values < mins) | (values > maxs),
+                    'not_whole_number': whole & (np.floor(values) != values) & ~np.isnan(values),
+                }
+            for code, mask in masks.items():
+                for j in np.flatnonzero(mask.any(axis=0)):
+                    record(self.numeric_cols[present[j]], code, mask[:, j], raw.iloc[:, j])
+            if over_limit():
+                return report(True)
+
+        # 3. Categorical columns against the encoder vocabularies
+        for col, required in zip(self.categorical_cols, self.required_categorical):
+            if col not in columns:
+                continue
+            raw = df[columns[col]]
+            given = raw.notna().to_numpy()
+            if required:
+                record(col, 'missing', ~given)
+            if col in self.allowed:
+                known = raw.astype(str).isin(self.allowed[col]).to_numpy()
+                record(col, 'unknown_category', given & ~known, raw)
+            if over_limit():
+                return report(True)
+
+        return report(False)
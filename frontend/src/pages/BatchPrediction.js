@@ -89,29 +89,43 @@ const BatchPrediction = () => {
 
     const formData = new FormData();
     formData.append('file', file);
+    formData.append('output_format', 'xlsx');
+    // Streamed straight from the server's result file; the summary comes in X-* headers
+    formData.append('delivery', 'attachment');
 
     try {
       const response = await axios.post(`${API_URL}/predict/batch`, formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
         },
+        responseType: 'blob',
       });
 
-      if (response.data.success) {
-        // Handle file download from base64
-        const link = document.createElement('a');
-        link.href = `data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,${response.data.file_base64}`;
-        link.download = response.data.filename;
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
-
-        setDistribution(response.data.distribution);
-        setSuccess(true);
-        setFile(null);
-      }
+      const disposition = response.headers['content-disposition'] || '';
+      const match = disposition.match(/filename="?([^";]+)"?/);
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = match ? match[1] : 'career_predictions.xlsx';
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      URL.revokeObjectURL(url);
+
+      setDistribution(JSON.parse(response.headers['x-distribution'] || '{}'));
+      setSuccess(true);
+      setFile(null);
     } catch (err) {
-      setError(err.response?.data?.error || 'An error occurred during prediction');
+      // Error bodies are JSON, but arrive as a Blob because of responseType
+      let message = 'An error occurred during prediction';
+      if (err.response?.data instanceof Blob) {
+        try {
+          message = JSON.parse(await err.response.data.text()).error || message;
+        } catch (parseError) {
+          // not JSON; keep the generic message
+        }
+      }
+      setError(message);
     } finally {
       setLoading(false);
     }
@@ -37,6 +37,7 @@ const IndividualPrediction = () => {
   const [chatInput, setChatInput] = useState('');
   const [chatHistory, setChatHistory] = useState([]);
   const [chatLoading, setChatLoading] = useState(false);
+  const [chatSessionId, setChatSessionId] = useState(null);
 
   const branches = [
     'CSE', 'ISE', 'AIML', 'CSDS', 'CSD', 'CSBS', 'CSCY', 'CS IOT',
@@ -58,6 +59,7 @@ const IndividualPrediction = () => {
     setLoading(true);
     setError('');
     setResult(null);
+    setChatSessionId(null);
 
     try {
       const response = await axios.post(`${API_URL}/predict/individual`, formData);
@@ -93,6 +95,7 @@ const IndividualPrediction = () => {
     try {
       const response = await axios.post(`${API_URL}/chat`, {
         message: userMessage,
+        session_id: chatSessionId,
         history: chatHistory,
         context: {
           profile_name: result.profile_name,
@@ -101,6 +104,7 @@ const IndividualPrediction = () => {
         }
       });
 
+      setChatSessionId(response.data.session_id);
       setChatHistory(prev => [...prev, { role: 'ai', content: response.data.response }]);
     } catch (err) {
       setChatHistory(prev => [...prev, { role: 'ai', content: "Sorry, I encountered an error. Please try again." }]);
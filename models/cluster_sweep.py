@@ -0,0 +1,260 @@
+"""
+Parallel sweep over KMeans cluster counts and HDBSCAN parameter grids.
+
+Every configuration is fitted on a process pool started with fork; workers read
+the embedding matrix from a memory-mapped .npy, so it is shared, not copied.
+Quality is scored on repeated random subsamples instead of the full matrix
+(silhouette is O(n^2)): each metric is reported as the mean over --rounds
+subsamples of --sample-size rows with a 95% confidence interval, plus the exact
+Davies-Bouldin index over all rows for KMeans (it is linear in n).
+
+HDBSCAN does not scale to hundreds of thousands of rows, so it is fitted on a
+fixed random subset (--hdbscan-sample) and scored on subsamples of that subset;
+its noise fraction is reported alongside.
+
+Embeddings built from a data file are cached under sweep_cache/, keyed on the
+file's path, size and modification time, so repeated sweeps skip the encoding.
+
+    python cluster_sweep.py --source archive/ --k 2 11 --report sweep_report.json
+    python cluster_sweep.py --embeddings embeddings.npy
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+try:
+    import hdbscan
+except ImportError:
+    hdbscan = None
+
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(MODEL_DIR, 'sweep_cache')
+
+# State handed to forked workers; only set while a sweep is running
+_job = {}
+
+
+# --- scoring ---
+
+def _interval(values):
+    values = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    if not len(values):
+        return None
+    mean = float(values.mean())
+    half = 1.96 * float(values.std(ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+    return {'mean': round(mean, 4), 'ci95': [round(mean - half, 4), round(mean + half, 4)]}
+
+
+def sampled_scores(X, labels, sample_size=4000, rounds=8, seed=0, candidates=None):
+    """Silhouette and Davies-Bouldin over `rounds` random subsamples; noise (-1) is left out
+
+    candidates: row indices to draw from (default all rows of X)
+    """
+    rng = np.random.default_rng(seed)
+    pool = np.arange(len(labels)) if candidates is None else np.asarray(candidates)
+    silhouettes, dbs = [], []
+    for _ in range(rounds):
+        idx = np.sort(rng.choice(pool, size=min(sample_size, len(pool)), replace=False))
+        lab = labels[idx]
+        keep = lab >= 0
+        if len(np.unique(lab[keep])) < 2:
+            continue
+        sample = np.asarray(X[idx[keep]], dtype=np.float64)
+        silhouettes.append(silhouette_score(sample, lab[keep]))
+        dbs.append(davies_bouldin_score(sample, lab[keep]))
+    return {'silhouette': _interval(silhouettes), 'davies_bouldin': _interval(dbs)}
+
+
+# --- configurations ---
+
+def build_configs(k_min, k_max, min_cluster_sizes, min_samples):
+    configs = [{'algorithm': 'kmeans', 'k': k} for k in range(k_min, k_max + 1)]
+    configs += [{'algorithm': 'hdbscan', 'min_cluster_size': mcs, 'min_samples': ms}
+                for mcs in min_cluster_sizes for ms in min_samples]
+    return configs
+
+
+def _hdbscan(min_cluster_size, min_samples):
+    if hdbscan is not None:
+        return hdbscan.HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples,
+                               metric='euclidean', core_dist_n_jobs=1)
+    # scikit-learn >= 1.3 ships the same algorithm
+    from sklearn.cluster import HDBSCAN
+    return HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples, metric='euclidean')
+
+
+def run_config(config):
+    X, opts = _job['X'], _job['opts']
+    result = dict(config)
+    t0 = time.perf_counter()
+    if config['algorithm'] == 'kmeans':
+        model = KMeans(n_clusters=config['k'], n_init=opts['n_init'], random_state=opts['seed'])
+        labels = model.fit_predict(X)
+        candidates = None
+    else:
+        candidates = _job['hdbscan_rows']
+        labels = np.full(len(X), -1, dtype=np.int64)
+        labels[candidates] = _hdbscan(config['min_cluster_size'], config['min_samples']).fit_predict(
+            np.asarray(X[candidates]))
+    result['fit_s'] = round(time.perf_counter() - t0, 2)
+
+    t0 = time.perf_counter()
+    scored = labels if candidates is None else labels[candidates]
+    found = scored[scored >= 0]
+    result['clusters'] = int(len(np.unique(found)))
+    result['noise_fraction'] = round(1 - len(found) / max(len(scored), 1), 4)
+    result['sizes'] = np.bincount(found).tolist() if len(found) else []
+    result.update(sampled_scores(X, labels, opts['sample_size'], opts['rounds'], opts['seed'], candidates))
+    if candidates is None and result['clusters'] > 1:
+        result['davies_bouldin_full'] = round(float(davies_bouldin_score(X, labels)), 4)
+    result['score_s'] = round(time.perf_counter() - t0, 2)
+    return result
+
+
+def _init_worker():
+    # Each worker already runs one configuration per core; nested BLAS/OpenMP pools oversubscribe
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def sweep(X, configs, workers=None, sample_size=4000, rounds=8, hdbscan_sample=20000, n_init=3, seed=42):
+    workers = max(1, min(workers or os.cpu_count() or 1, len(configs)))
+    rng = np.random.default_rng(seed)
+    _job['X'] = X
+    _job['hdbscan_rows'] = np.sort(rng.choice(len(X), size=min(hdbscan_sample, len(X)), replace=False))
+    _job['opts'] = {'sample_size': sample_size, 'rounds': rounds, 'n_init': n_init, 'seed': seed}
+    results = []
+
+    def collect(iterator):
+        for result in iterator:
+            sil = result['silhouette']
+            print(f"   {describe(result):<32} clusters={result['clusters']:<3} "
+                  f"silhouette={sil['mean'] if sil else 'n/a'} fit={result['fit_s']}s")
+            results.append(result)
+
+    try:
+        if workers == 1 or 'fork' not in mp.get_all_start_methods():
+            collect(map(run_config, configs))
+        else:
+            # Slow HDBSCAN fits first so they don't end up alone at the tail
+            order = sorted(configs, key=lambda c: c['algorithm'] != 'hdbscan')
+            with mp.get_context('fork').Pool(workers, initializer=_init_worker) as pool:
+                collect(pool.imap_unordered(run_config, order))
+    finally:
+        _job.clear()
+    return results
+
+
+def describe(config):
+    if config['algorithm'] == 'kmeans':
+        return f"kmeans k={config['k']}"
+    return f"hdbscan mcs={config['min_cluster_size']} ms={config['min_samples']}"
+
+
+# --- embeddings ---
+
+def _cache_key(source):
+    h = hashlib.sha256()
+    paths = sorted(os.path.join(source, n) for n in os.listdir(source)) if os.path.isdir(source) else [source]
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+def load_embeddings(source=None, embeddings=None, cache_dir=CACHE_DIR, chunk_rows=100_000):
+    """Memory-mapped embedding matrix; data files are encoded once (in chunks) and cached"""
+    if embeddings:
+        return np.load(embeddings, mmap_mode='r'), {'embeddings': embeddings, 'cached': True, 'embed_s': 0.0}
+
+    path = os.path.join(cache_dir, f"{_cache_key(source)}.npy")
+    if os.path.exists(path):
+        return np.load(path, mmap_mode='r'), {'embeddings': path, 'cached': True, 'embed_s': 0.0}
+
+    # Same preprocessing the streaming trainer (and the backend) uses
+    from train_streaming import FEATURE_COLS, StreamingPreprocessor, iter_chunks
+    t0 = time.perf_counter()
+    prep = StreamingPreprocessor()
+    rows = 0
+    for chunk in iter_chunks(source, chunk_rows):
+        prep.observe(chunk)
+        rows += len(chunk)
+    prep.finish()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + '.tmp'
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float32, shape=(rows, len(FEATURE_COLS)))
+    start = 0
+    for chunk in iter_chunks(source, chunk_rows):
+        out[start:start + len(chunk)] = prep.encode(chunk)
+        start += len(chunk)
+    out.flush()
+    del out
+    os.replace(tmp, path)
+    return np.load(path, mmap_mode='r'), {'embeddings': path, 'cached': False,
+                                          'embed_s': round(time.perf_counter() - t0, 2)}
+
+
+def print_report(results):
+    ranked = sorted(results, key=lambda r: -(r['silhouette']['mean'] if r['silhouette'] else -2))
+    print(f"\n{'config':<32} {'clusters':>8} {'noise':>6} {'silhouette (95% CI)':>26} "
+          f"{'Davies-Bouldin (95% CI)':>28} {'fit s':>7} {'score s':>7}")
+    for r in ranked:
+        sil, db = r['silhouette'], r['davies_bouldin']
+        sil_s = f"{sil['mean']:.3f} [{sil['ci95'][0]:.3f}, {sil['ci95'][1]:.3f}]" if sil else 'n/a'
+        db_s = f"{db['mean']:.3f} [{db['ci95'][0]:.3f}, {db['ci95'][1]:.3f}]" if db else 'n/a'
+        print(f"{describe(r):<32} {r['clusters']:>8} {r['noise_fraction']:>6.2f} {sil_s:>26} "
+              f"{db_s:>28} {r['fit_s']:>7.1f} {r['score_s']:>7.1f}")
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel KMeans / HDBSCAN sweep with sampled scores")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--source', help=".parquet / .csv file, or a directory of them")
+    src.add_argument('--embeddings', help="Existing .npy embedding matrix (e.g. embeddings.npy)")
+    parser.add_argument('--k', type=int, nargs=2, default=[2, 11], metavar=('MIN', 'MAX'))
+    parser.add_argument('--min-cluster-size', type=int, nargs='+', default=[50, 100, 250, 500, 1000])
+    parser.add_argument('--min-samples', type=int, nargs='+', default=[5, 15])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sample-size', type=int, default=4000)
+    parser.add_argument('--rounds', type=int, default=8)
+    parser.add_argument('--hdbscan-sample', type=int, default=20000)
+    parser.add_argument('--n-init', type=int, default=3)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--report', default=os.path.join(MODEL_DIR, 'sweep_report.json'))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    X, info = load_embeddings(args.source, args.embeddings, args.cache_dir)
+    print(f"Embeddings: {X.shape[0]:,} x {X.shape[1]} ({'cached' if info['cached'] else 'built'} "
+          f"{info['embeddings']}, {info['embed_s']}s)")
+
+    configs = build_configs(args.k[0], args.k[1], args.min_cluster_size, args.min_samples)
+    print(f"Sweeping {len(configs)} configurations...")
+    results = sweep(X, configs, args.workers, args.sample_size, args.rounds, args.hdbscan_sample,
+                    args.n_init)
+    ranked = print_report(results)
+    wall = round(time.perf_counter() - t0, 2)
+    print(f"\nTotal {wall}s")
+
+    with open(args.report, 'w') as f:
+        json.dump({'rows': int(X.shape[0]), 'dims': int(X.shape[1]), 'wall_s': wall, **info,
+                   'sample_size': args.sample_size, 'rounds': args.rounds,
+                   'hdbscan_sample': args.hdbscan_sample, 'results': ranked}, f, indent=2)
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
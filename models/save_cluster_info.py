@@ -1,25 +1,59 @@
+import argparse
+import os
 import pickle
 
-# Update this dictionary based on your cluster insights
-cluster_info = {
-    0: {
-        "name": "Technical Innovators",
-        "roles": ["Software Engineer", "Backend Developer", "AI Engineer"],
-        "description": "Strong coding ability, technical inclination and analytical thinking."
-    },
-    1: {
-        "name": "Research & Data Learners",
-        "roles": ["Data Analyst", "Research Intern"],
-        "description": "Good academic mindset, research interest and analytical thinking."
-    },
-    2: {
-        "name": "Career Growth Oriented Learners",
-        "roles": ["Associate Engineer", "Junior Developer"],
-        "description": "Growing skillset, quick learning mindset, consistent improvement focus."
-    }
-}
-
-with open("cluster_info.pkl", "wb") as f:
-    pickle.dump(cluster_info, f)
-
-print("cluster_info.pkl created successfully!")
+import cluster_naming
+from train_unsupervised import CATEGORICAL_COLS, NUMERICAL_COLS, MODEL_DIR
+
+# Rebuild cluster_info.pkl for whatever kmeans_model.pkl is in the model folder,
+# with one named, validated entry (name, roles, description) per cluster.
+#
+#   python save_cluster_info.py                      # statistics read off the centroids
+#   python save_cluster_info.py --data students.csv  # statistics from labelled training rows
+
+
+def load(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write cluster_info.pkl for the current KMeans model")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--data', help="Optional CSV / Excel / Parquet of training rows to label and summarise")
+    args = parser.parse_args()
+
+    kmeans = load(os.path.join(args.model_dir, 'kmeans_model.pkl'))
+    scaler = load(os.path.join(args.model_dir, 'scaler.pkl'))
+    encoders = load(os.path.join(args.model_dir, 'label_encoders.pkl'))
+    print(f"KMeans with {kmeans.n_clusters} clusters")
+
+    if args.data:
+        from train_unsupervised import read_source
+        from train_streaming import StreamingPreprocessor
+        df = read_source(args.data)
+        # Label rows exactly as the backend would: fitted scaler + encoders, unseen -> first class
+        prep = StreamingPreprocessor()
+        prep.scaler, prep.label_encoders = scaler, encoders
+        prep.medians = df[NUMERICAL_COLS].median().fillna(0).to_numpy()
+        clean = df.copy()
+        for col in CATEGORICAL_COLS:
+            classes = encoders[col].classes_
+            values = clean[col].fillna('Unknown').astype(str)
+            clean[col] = values.where(values.isin(classes), classes[0])
+        labels = kmeans.predict(prep.encode(clean).astype(kmeans.cluster_centers_.dtype))
+        summary, sizes = cluster_naming.cluster_summary(labels, df, kmeans.n_clusters)
+    else:
+        summary, sizes = cluster_naming.summary_from_centroids(kmeans, scaler, encoders,
+                                                               NUMERICAL_COLS, CATEGORICAL_COLS)
+
+    cluster_info = cluster_naming.build_cluster_info(summary, sizes)
+
+    with open(os.path.join(args.model_dir, 'cluster_info.pkl'), 'wb') as f:
+        pickle.dump(cluster_info, f)
+
+    print(f"cluster_info.pkl created successfully! ({len(cluster_info)} clusters)")
+
+
+if __name__ == '__main__':
+    main()
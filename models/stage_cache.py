@@ -0,0 +1,94 @@
+"""
+On-disk cache for the stages of the training pipeline.
+
+Every stage gets a key: a hash of its name, its parameters and the content
+fingerprints of the outputs it reads from. Its outputs (Parquet / .npy /
+pickles) are written to a scratch directory and renamed to
+pipeline_cache/<stage>/<key>/ only once the stage has finished, together with a
+manifest that records their fingerprint. A rerun with the same key reuses that
+directory; a run that crashed half-way left no manifest, so only the failed
+stage and the ones after it run again. Keying on outputs rather than upstream
+keys means a forced rerun of a non-deterministic stage (TabNet) that produces
+different outputs also invalidates everything downstream of it.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+MANIFEST = 'manifest.json'
+
+
+def file_fingerprint(path, block=1 << 20, exclude=()):
+    """Content hash of a file (or of every file in a directory)"""
+    h = hashlib.sha256()
+    paths = sorted(os.path.join(path, n) for n in os.listdir(path)
+                   if n not in exclude) if os.path.isdir(path) else [path]
+    for p in paths:
+        h.update(os.path.basename(p).encode())
+        with open(p, 'rb') as f:
+            for chunk in iter(lambda: f.read(block), b''):
+                h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def stage_key(name, params, upstream=()):
+    payload = json.dumps({'stage': name, 'params': params, 'upstream': list(upstream)},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+class StageCache:
+    def __init__(self, root, force=(), keep=3):
+        self.root = root
+        self.force = set(force)
+        self.keep = keep
+        self.report = []  # (stage, key, 'cached' | 'ran', seconds)
+
+    def run(self, name, params, upstream, compute):
+        """compute(out_dir) writes the stage outputs; returns (output fingerprint, directory)
+
+        Pass the fingerprints returned by the upstream stages as `upstream`.
+        """
+        key = stage_key(name, params, upstream)
+        final = os.path.join(self.root, name, key)
+        forced = name in self.force or 'all' in self.force
+        manifest_path = os.path.join(final, MANIFEST)
+        if not forced and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                output = json.load(f).get('output') or file_fingerprint(final, exclude=(MANIFEST,))
+            print(f"[{name}] cached ({key})")
+            self.report.append((name, key, 'cached', 0.0))
+            return output, final
+
+        print(f"[{name}] running ({key})...")
+        scratch = final + '.partial'
+        shutil.rmtree(scratch, ignore_errors=True)
+        os.makedirs(scratch)
+        t0 = time.perf_counter()
+        compute(scratch)
+        seconds = time.perf_counter() - t0
+        output = file_fingerprint(scratch)
+        with open(os.path.join(scratch, MANIFEST), 'w') as f:
+            json.dump({'stage': name, 'key': key, 'params': params, 'upstream': list(upstream),
+                       'output': output, 'seconds': round(seconds, 2), 'created_at': time.time()},
+                      f, indent=2, default=str)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(scratch, final)
+        self.report.append((name, key, 'ran', seconds))
+        self._prune(name)
+        return output, final
+
+    def _prune(self, name):
+        """Keep the newest `keep` completed outputs per stage"""
+        stage_dir = os.path.join(self.root, name)
+        done = [os.path.join(stage_dir, d) for d in os.listdir(stage_dir)
+                if os.path.exists(os.path.join(stage_dir, d, MANIFEST))]
+        done.sort(key=os.path.getmtime, reverse=True)
+        for path in done[self.keep:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def summary(self):
+        return "\n".join(f"   {name:<8} {status:<6} {seconds:7.1f}s  {key}"
+                         for name, key, status, seconds in self.report)
@@ -0,0 +1,403 @@
+"""
+Out-of-core training for archives too large for train_unsupervised.py.
+
+train_unsupervised.py reads one Excel file into memory, pretrains TabNet on all
+of it and runs a full-batch KMeans(n_init=10). This script streams chunked
+Parquet (a file or a directory of files) or CSV instead, so peak memory is
+bounded by --chunk-rows plus a fixed-size reservoir sample, not by the archive:
+
+  1. stats pass  - StandardScaler.partial_fit, the category set of every
+                   label-encoded column and a uniform reservoir sample of rows
+  2. init        - median fill values and k-means++ centroids (KMeans with
+                   n_init restarts) computed on the reservoir only
+  3. fit passes  - MiniBatchKMeans.partial_fit plus the embedding model, fed
+                   chunk by chunk: IncrementalPCA (pca.pkl, what the backend
+                   uses for embeddings) or TabNet pretraining one chunk at a time
+  4. label pass  - per-cluster means for naming, accumulated chunk by chunk
+
+KMeans is fitted on the same 17-column matrix (scaled numericals + encoded
+categoricals) that the backend scores, so the artifacts drop into models/.
+
+    python train_streaming.py train archive/ --output-dir versions/streamed
+    python train_streaming.py bench --rows 100000 1000000 5000000
+"""
+import argparse
+import glob
+import json
+import os
+import pickle
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+from cluster_naming import STAT_FLAGS, STAT_MEANS, build_cluster_info
+from train_unsupervised import CATEGORICAL_COLS, NUMERICAL_COLS, MODEL_DIR, TabNetPretrainer, torch
+
+FEATURE_COLS = NUMERICAL_COLS + CATEGORICAL_COLS
+
+
+# --- chunked input ---
+
+def source_files(source):
+    if os.path.isdir(source):
+        files = sorted(glob.glob(os.path.join(source, '*.parquet')) + glob.glob(os.path.join(source, '*.csv')))
+        if not files:
+            raise FileNotFoundError(f"No .parquet or .csv files in {source}")
+        return files
+    return [source]
+
+
+def _clean(chunk):
+    chunk.columns = [c.strip() for c in chunk.columns]
+    missing = [c for c in FEATURE_COLS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    out = pd.DataFrame(index=chunk.index)
+    for col in NUMERICAL_COLS:
+        out[col] = pd.to_numeric(chunk[col], errors='coerce').astype(np.float64)
+    for col in CATEGORICAL_COLS:
+        out[col] = chunk[col].fillna('Unknown').astype(str)
+    return out
+
+
+def iter_chunks(source, chunk_rows):
+    """Yield cleaned frames of at most chunk_rows rows
+
+    Parquet reads only the model columns, but pyarrow decodes a whole row group at a
+    time, so archives should be written with row groups no larger than the chunk size.
+    """
+    for path in source_files(source):
+        if path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            parquet = pq.ParquetFile(path)
+            columns = [n for n in parquet.schema_arrow.names if n.strip() in FEATURE_COLS]
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield _clean(batch.to_pandas())
+        elif path.endswith('.csv'):
+            for chunk in pd.read_csv(path, chunksize=chunk_rows):
+                yield _clean(chunk)
+        else:
+            raise ValueError(f"Unsupported file type (use .parquet or .csv): {path}")
+
+
+class Reservoir:
+    """Uniform sample of `size` rows from a stream (Algorithm R, vectorised per chunk)"""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.seen = 0
+        self.num = np.empty((0, len(NUMERICAL_COLS)))
+        self.cat = np.empty((0, len(CATEGORICAL_COLS)), dtype=object)
+
+    def add(self, chunk):
+        num = chunk[NUMERICAL_COLS].to_numpy()
+        cat = chunk[CATEGORICAL_COLS].to_numpy(dtype=object)
+        free = min(self.size - len(self.num), len(chunk))
+        if free > 0:
+            self.num = np.vstack([self.num, num[:free]])
+            self.cat = np.vstack([self.cat, cat[:free]])
+        rest = np.arange(max(free, 0), len(chunk))
+        if len(rest):
+            # Row i of the stream replaces a random slot with probability size / (i + 1)
+            slots = self.rng.integers(0, self.seen + rest + 1)
+            keep = slots < self.size
+            self.num[slots[keep]] = num[rest[keep]]
+            self.cat[slots[keep]] = cat[rest[keep]]
+        self.seen += len(chunk)
+
+    def frame(self):
+        df = pd.DataFrame(self.num, columns=NUMERICAL_COLS)
+        for j, col in enumerate(CATEGORICAL_COLS):
+            df[col] = self.cat[:, j]
+        return df
+
+
+# --- preprocessing fitted in one pass ---
+
+class StreamingPreprocessor:
+    def __init__(self, reservoir_rows=50_000, seed=0):
+        self.scaler = StandardScaler()
+        self.categories = {col: set() for col in CATEGORICAL_COLS}
+        self.missing = np.zeros(len(NUMERICAL_COLS), dtype=np.int64)
+        self.reservoir = Reservoir(reservoir_rows, seed)
+        self.medians = None
+        self.label_encoders = None
+
+    def observe(self, chunk):
+        num = chunk[NUMERICAL_COLS].to_numpy()
+        self.scaler.partial_fit(num)  # NaNs are ignored by the running mean / variance
+        self.missing += np.isnan(num).sum(axis=0)
+        for col in CATEGORICAL_COLS:
+            self.categories[col].update(chunk[col].unique())
+        self.reservoir.add(chunk)
+
+    def finish(self):
+        """Freeze medians and encoders; fold the median-filled rows into the scaler statistics"""
+        medians = np.nanmedian(self.reservoir.num, axis=0) if len(self.reservoir.num) else None
+        self.medians = np.nan_to_num(medians if medians is not None else np.zeros(len(NUMERICAL_COLS)))
+
+        # train_unsupervised fills before scaling; adding the filled rows to the observed
+        # moments gives exactly the statistics of the filled column
+        seen = np.broadcast_to(np.asarray(self.scaler.n_samples_seen_, dtype=np.float64), self.missing.shape)
+        total = seen + self.missing
+        mean = (seen * self.scaler.mean_ + self.missing * self.medians) / np.maximum(total, 1)
+        var = (seen * (self.scaler.var_ + (self.scaler.mean_ - mean) ** 2)
+               + self.missing * (self.medians - mean) ** 2) / np.maximum(total, 1)
+        self.scaler.mean_ = mean
+        self.scaler.var_ = var
+        self.scaler.scale_ = np.where(var > 0, np.sqrt(var), 1.0)
+        self.scaler.n_samples_seen_ = int(total.max()) if len(total) else 0
+
+        self.label_encoders = {}
+        for col in CATEGORICAL_COLS:
+            le = LabelEncoder()
+            le.fit(np.array(sorted(self.categories[col]), dtype=object).astype(str))
+            self.label_encoders[col] = le
+
+    def filled_numeric(self, chunk):
+        num = chunk[NUMERICAL_COLS].to_numpy()
+        return np.where(np.isnan(num), self.medians, num)
+
+    def encode(self, chunk, num=None):
+        """17-column matrix in the backend's column order"""
+        num = self.filled_numeric(chunk) if num is None else num
+        X = np.empty((len(chunk), len(FEATURE_COLS)), dtype=np.float64)
+        X[:, :len(NUMERICAL_COLS)] = (num - self.scaler.mean_) / self.scaler.scale_
+        for j, col in enumerate(CATEGORICAL_COLS):
+            classes = self.label_encoders[col].classes_
+            X[:, len(NUMERICAL_COLS) + j] = np.searchsorted(classes, chunk[col].to_numpy().astype(str))
+        return X
+
+
+# --- training ---
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def train(source, n_clusters=5, chunk_rows=100_000, batch_size=8192, epochs=1, reservoir_rows=50_000,
+          embedding='pca', n_components=8, seed=42):
+    timings = {}
+    prep = StreamingPreprocessor(reservoir_rows, seed)
+
+    t0 = time.perf_counter()
+    rows = 0
+    for chunk in iter_chunks(source, chunk_rows):
+        prep.observe(chunk)
+        rows += len(chunk)
+    prep.finish()
+    timings['stats_pass_s'] = time.perf_counter() - t0
+    print(f"Stats pass: {rows:,} rows, reservoir {len(prep.reservoir.num):,}")
+    if rows < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} rows, got {rows}")
+
+    t0 = time.perf_counter()
+    sample = prep.encode(prep.reservoir.frame())
+    init = KMeans(n_clusters=n_clusters, n_init=10, random_state=seed).fit(sample).cluster_centers_
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1, batch_size=batch_size,
+                             random_state=seed)
+    timings['init_s'] = time.perf_counter() - t0
+
+    pca = IncrementalPCA(n_components=n_components) if embedding == 'pca' else None
+    tabnet = None
+    if embedding == 'tabnet':
+        if TabNetPretrainer is None:
+            raise RuntimeError("embedding='tabnet' needs torch and pytorch-tabnet")
+        tabnet = TabNetPretrainer(optimizer_fn=torch.optim.Adam, optimizer_params=dict(lr=2e-2),
+                                  mask_type='entmax')
+
+    t0 = time.perf_counter()
+    for epoch in range(epochs):
+        for chunk in iter_chunks(source, chunk_rows):
+            X = prep.encode(chunk)
+            for start in range(0, len(X), batch_size):
+                batch = X[start:start + batch_size]
+                if len(batch) >= n_clusters:
+                    kmeans.partial_fit(batch)
+            if pca is not None and len(X) >= n_components:
+                pca.partial_fit(X[:, :len(NUMERICAL_COLS)])
+            if tabnet is not None:
+                # TabNetPretrainer keeps its network between fit() calls, so each call is one
+                # epoch over the chunk; only the chunk's tensors are ever materialised
+                tabnet.fit(X_train=X, pretraining_ratio=0.8, max_epochs=1, patience=0,
+                           batch_size=256, virtual_batch_size=128, num_workers=0, drop_last=False)
+        print(f"Epoch {epoch + 1}/{epochs} done")
+    timings['fit_passes_s'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    counts = np.zeros(n_clusters, dtype=np.int64)
+    sums = np.zeros((n_clusters, len(STAT_MEANS) + len(STAT_FLAGS)))
+    naming_idx = [NUMERICAL_COLS.index(c) for c in STAT_MEANS]
+    inertia = 0.0
+    for chunk in iter_chunks(source, chunk_rows):
+        num = prep.filled_numeric(chunk)
+        X = prep.encode(chunk, num)
+        labels = kmeans.predict(X)
+        inertia += float(((X - kmeans.cluster_centers_[labels]) ** 2).sum())
+        counts += np.bincount(labels, minlength=n_clusters)
+        values = np.column_stack([num[:, naming_idx]] + [(chunk[c] == 'Yes').to_numpy() for c in STAT_FLAGS])
+        for j in range(values.shape[1]):
+            sums[:, j] += np.bincount(labels, weights=values[:, j], minlength=n_clusters)
+    means = np.divide(sums, counts[:, None], out=np.full_like(sums, np.nan), where=counts[:, None] > 0)
+    summary = pd.DataFrame(means, columns=STAT_MEANS + STAT_FLAGS)
+    cluster_info = build_cluster_info(summary, counts, verbose=False)
+    timings['label_pass_s'] = time.perf_counter() - t0
+
+    report = {
+        'rows': rows,
+        'cluster_sizes': counts.tolist(),
+        'inertia_per_row': inertia / rows,
+        'timings': {k: round(v, 2) for k, v in timings.items()},
+        'peak_rss_mb': round(_peak_rss_mb(), 1)
+    }
+    artifacts = {
+        'kmeans_model.pkl': kmeans,
+        'scaler.pkl': prep.scaler,
+        'label_encoders.pkl': prep.label_encoders,
+        'cluster_info.pkl': cluster_info
+    }
+    if pca is not None:
+        artifacts['pca.pkl'] = pca
+    return artifacts, tabnet, report
+
+
+def save(artifacts, tabnet, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    for filename, obj in artifacts.items():
+        with open(os.path.join(output_dir, filename), 'wb') as f:
+            pickle.dump(obj, f)
+    if tabnet is not None:
+        tabnet.save_model(os.path.join(output_dir, 'tabnet_model'))
+    print(f"Saved {', '.join(artifacts)} to {output_dir}")
+
+
+def train_in_memory(source, n_clusters=5, seed=42):
+    """What train_unsupervised does (minus TabNet), for the benchmark baseline"""
+    df = pd.concat(list(iter_chunks(source, 1_000_000)), ignore_index=True)
+    for col in NUMERICAL_COLS:
+        df[col] = df[col].fillna(df[col].median())
+    for col in CATEGORICAL_COLS:
+        df[col] = LabelEncoder().fit_transform(df[col])
+    df[NUMERICAL_COLS] = StandardScaler().fit_transform(df[NUMERICAL_COLS])
+    kmeans = KMeans(n_clusters=n_clusters, n_init=10, random_state=seed).fit(df[FEATURE_COLS].values)
+    X = df[FEATURE_COLS].values
+    inertia = float(((X - kmeans.cluster_centers_[kmeans.labels_]) ** 2).sum())
+    return {'rows': len(df), 'inertia_per_row': inertia / len(df), 'peak_rss_mb': round(_peak_rss_mb(), 1)}
+
+
+# --- benchmark ---
+
+def synthetic_chunk(rows, rng):
+    """Archive-shaped rows with a few missing values"""
+    df = pd.DataFrame({
+        'Age': rng.integers(18, 25, rows).astype(np.float64),
+        'Gender': rng.choice(['Male', 'Female'], rows),
+        'Branch_Department': rng.choice(['CSE', 'ECE', 'ME', 'CIVIL'], rows),
+        'CGPA': np.round(rng.uniform(5, 10, rows), 2),
+        'Number_of_Backlogs': rng.integers(0, 4, rows),
+        'Number_of_Internships': rng.integers(0, 4, rows),
+        'Type_of_Internships': rng.choice(['None', 'Paid', 'Unpaid'], rows),
+        'Number_of_Publications': rng.integers(0, 3, rows),
+        'Number_of_Projects': rng.integers(0, 8, rows),
+        'Number_of_Certification_Courses': rng.integers(0, 10, rows),
+        'Technical_Skills_Score': rng.integers(1, 6, rows),
+        'Number_of_Hackathons': rng.integers(0, 6, rows),
+        'Co_curricular_Activities': rng.choice(['Yes', 'No'], rows),
+        'Leadership_Roles': rng.choice(['Yes', 'No'], rows),
+        'Soft_Skills_Score': rng.integers(1, 6, rows),
+        'Entrepreneur_Cell_Member': rng.choice(['Yes', 'No'], rows),
+        'Family_Business_Background': rng.choice(['Yes', 'No'], rows),
+    })
+    df.loc[rng.random(rows) < 0.01, 'Age'] = np.nan
+    return df
+
+
+def write_synthetic(path, rows, chunk_rows=100_000, seed=0):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    rng = np.random.default_rng(seed)
+    writer = None
+    for start in range(0, rows, chunk_rows):
+        table = pa.Table.from_pandas(synthetic_chunk(min(chunk_rows, rows - start), rng), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+
+def bench(row_counts, chunk_rows, baseline_max_rows):
+    """Each run is a fresh process so ru_maxrss is that run's own peak"""
+    workdir = tempfile.mkdtemp(prefix='train_streaming_')
+    script = os.path.abspath(__file__)
+    try:
+        print(f"{'rows':>10} {'mode':>10} {'wall s':>8} {'peak MB':>8} {'inertia/row':>12}")
+        for rows in row_counts:
+            path = os.path.join(workdir, f'students_{rows}.parquet')
+            write_synthetic(path, rows, chunk_rows)
+            modes = ['streaming'] + (['in-memory'] if rows <= baseline_max_rows else [])
+            for mode in modes:
+                cmd = [sys.executable, script, 'train', path, '--output-dir', os.path.join(workdir, 'out'),
+                       '--chunk-rows', str(chunk_rows), '--report-json']
+                if mode == 'in-memory':
+                    cmd.append('--in-memory')
+                t0 = time.perf_counter()
+                out = subprocess.run(cmd, capture_output=True, text=True, check=True,
+                                     cwd=os.path.dirname(script)).stdout
+                wall = time.perf_counter() - t0
+                report = json.loads(out.strip().splitlines()[-1])
+                print(f"{rows:>10,} {mode:>10} {wall:8.1f} {report['peak_rss_mb']:8.0f} "
+                      f"{report['inertia_per_row']:12.4f}")
+            os.remove(path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core clustering training")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('train')
+    p.add_argument('source', help=".parquet / .csv file, or a directory of them")
+    p.add_argument('--output-dir', default=MODEL_DIR)
+    p.add_argument('--clusters', type=int, default=5)
+    p.add_argument('--chunk-rows', type=int, default=100_000)
+    p.add_argument('--batch-size', type=int, default=8192)
+    p.add_argument('--epochs', type=int, default=1)
+    p.add_argument('--reservoir-rows', type=int, default=50_000)
+    p.add_argument('--embedding', choices=['pca', 'tabnet', 'none'], default='pca')
+    p.add_argument('--in-memory', action='store_true', help="Full-batch baseline, nothing is saved")
+    p.add_argument('--report-json', action='store_true')
+
+    p = sub.add_parser('bench')
+    p.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+    p.add_argument('--chunk-rows', type=int, default=100_000)
+    p.add_argument('--baseline-max-rows', type=int, default=1_000_000)
+
+    args = parser.parse_args()
+    if args.command == 'bench':
+        bench(args.rows, args.chunk_rows, args.baseline_max_rows)
+        return
+
+    if args.in_memory:
+        report = train_in_memory(args.source, args.clusters)
+    else:
+        artifacts, tabnet, report = train(args.source, args.clusters, args.chunk_rows, args.batch_size,
+                                          args.epochs, args.reservoir_rows, args.embedding)
+        save(artifacts, tabnet, args.output_dir)
+        for cid, info in artifacts['cluster_info.pkl'].items():
+            print(f"   Cluster {cid} ({report['cluster_sizes'][cid]:,} rows) -> {info['name']}")
+    print(json.dumps(report) if args.report_json else report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,47 @@
+import argparse
+import hashlib
+import inspect
 import pandas as pd
 import numpy as np
 import pickle
 import os
-import google.generativeai as genai
+import shutil
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
 import json
 from dotenv import load_dotenv
-import torch
-from pytorch_tabnet.pretraining import TabNetPretrainer
-import hdbscan
 import warnings
 
+import cluster_naming
+from cluster_sweep import sampled_scores
+from stage_cache import StageCache, file_fingerprint
+
+# Heavy training dependencies are optional so the column lists can be
+# imported by train_streaming.py and save_cluster_info.py without them
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+try:
+    import torch
+    from pytorch_tabnet.pretraining import TabNetPretrainer
+except ImportError:
+    torch = None
+    TabNetPretrainer = None
+
+try:
+    import hdbscan
+except ImportError:
+    hdbscan = None
+
 warnings.filterwarnings("ignore")
 load_dotenv()
 
 # --- Configuration ---
-DATA_PATH = r"C:\Users\sambh\Downloads\unseen_student_datan.xlsx"
 MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.getenv("TRAINING_DATA_PATH", os.path.join(MODEL_DIR, "unseen_student_datan.xlsx"))
+PIPELINE_CACHE_DIR = os.getenv("PIPELINE_CACHE_DIR", os.path.join(MODEL_DIR, "pipeline_cache"))
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 # Define columns based on user request (Mapped to Excel file)
@@ -36,51 +59,63 @@ NUMERICAL_COLS = [
 ]
 
 def configure_gemini():
+    if genai is None:
+        print("Warning: google-generativeai not installed.")
+        return False
     if not GEMINI_API_KEY:
         print("Warning: GEMINI_API_KEY not found.")
         return False
     genai.configure(api_key=GEMINI_API_KEY)
     return True
 
-def load_and_preprocess_data(filepath):
+def read_source(filepath):
+    """Parse the training file once (Excel, CSV or Parquet) and keep only the model columns"""
     print(f"Loading data from: {filepath}")
-    try:
+    if filepath.endswith('.parquet'):
+        df = pd.read_parquet(filepath)
+    elif filepath.endswith('.csv'):
+        df = pd.read_csv(filepath)
+    else:
         df = pd.read_excel(filepath)
-    except Exception as e:
-        print(f"Error loading Excel: {e}")
-        return None, None, None, None
 
     # Normalize column names
     df.columns = [c.strip() for c in df.columns]
-    
-    # Handle missing columns or map them if names slightly differ
-    # For now, assuming exact matches or close enough to be found manually if needed
-    # Let's print columns to be sure during run
     print("Columns found:", df.columns.tolist())
 
+    missing = [c for c in NUMERICAL_COLS + CATEGORICAL_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+
+    df = df[NUMERICAL_COLS + CATEGORICAL_COLS].copy()
+    for col in NUMERICAL_COLS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    for col in CATEGORICAL_COLS:
+        # Columnar storage needs one type per column; missing values stay missing
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def encode_and_scale(df):
+    """Fill, label-encode and scale a parsed frame; returns (X, encoded df, encoders, scaler)"""
+    df = df.copy()
+
     # Fill missing values
     for col in NUMERICAL_COLS:
-        if col in df.columns:
-            df[col] = df[col].fillna(df[col].median())
+        df[col] = df[col].fillna(df[col].median())
     
     for col in CATEGORICAL_COLS:
-        if col in df.columns:
-            df[col] = df[col].fillna('Unknown')
+        df[col] = df[col].fillna('Unknown')
 
     # Encoders
     label_encoders = {}
     for col in CATEGORICAL_COLS:
-        if col in df.columns:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col].astype(str))
-            label_encoders[col] = le
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col].astype(str))
+        label_encoders[col] = le
             
     # Scaling
     scaler = StandardScaler()
-    if all(c in df.columns for c in NUMERICAL_COLS):
-        df[NUMERICAL_COLS] = scaler.fit_transform(df[NUMERICAL_COLS])
-    else:
-        print("Missing some numerical columns!")
+    df[NUMERICAL_COLS] = scaler.fit_transform(df[NUMERICAL_COLS])
         
     # Prepare X for TabNet
     # TabNet expects all features. We'll combine cat and num.
@@ -93,23 +128,46 @@ def load_and_preprocess_data(filepath):
     
     return X, df, label_encoders, scaler
 
+
+def load_and_preprocess_data(filepath):
+    try:
+        return encode_and_scale(read_source(filepath))
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        return None, None, None, None
+
+# Part of the embed stage's cache key: changing any of these retrains TabNet
+TABNET_PARAMS = {
+    'lr': 2e-2,
+    'mask_type': 'entmax',  # "sparsemax"
+    'pretraining_ratio': 0.8,
+    'max_epochs': 100,  # Adjust based on time/performance
+    'patience': 10,
+    'batch_size': 256,
+    'virtual_batch_size': 128
+}
+
+# Part of the cluster stage's cache key
+CLUSTER_PARAMS = {'k': 5, 'n_init': 10, 'random_state': 42}
+
+
 def train_tabnet(X):
     print("Training TabNet Pretrainer...")
     # TabNet Pretrainer
     unsupervised_model = TabNetPretrainer(
         optimizer_fn=torch.optim.Adam,
-        optimizer_params=dict(lr=2e-2),
-        mask_type='entmax' # "sparsemax"
+        optimizer_params=dict(lr=TABNET_PARAMS['lr']),
+        mask_type=TABNET_PARAMS['mask_type']
     )
     
     unsupervised_model.fit(
         X_train=X,
         eval_set=[X],
-        pretraining_ratio=0.8,
-        max_epochs=100, # Adjust based on time/performance
-        patience=10,
-        batch_size=256, 
-        virtual_batch_size=128,
+        pretraining_ratio=TABNET_PARAMS['pretraining_ratio'],
+        max_epochs=TABNET_PARAMS['max_epochs'],
+        patience=TABNET_PARAMS['patience'],
+        batch_size=TABNET_PARAMS['batch_size'],
+        virtual_batch_size=TABNET_PARAMS['virtual_batch_size'],
         num_workers=0,
         drop_last=False
     )
@@ -161,239 +219,129 @@ def get_embeddings(model, X):
 def cluster_embeddings(embeddings):
     print("Clustering Embeddings...")
     
-    # 1. HDBSCAN
-    print("   Running HDBSCAN...")
-    hdb = hdbscan.HDBSCAN(min_cluster_size=5, min_samples=2, metric='euclidean')
-    hdb_labels = hdb.fit_predict(embeddings)
-    n_hdb = len(set(hdb_labels)) - (1 if -1 in hdb_labels else 0)
-    print(f"   HDBSCAN found {n_hdb} clusters (excluding noise).")
-    
-    if n_hdb > 1:
-        sil_hdb = silhouette_score(embeddings, hdb_labels) if len(set(hdb_labels)) > 1 else -1
-        print(f"   HDBSCAN Silhouette: {sil_hdb:.4f}")
+    # 1. HDBSCAN (diagnostics only; use cluster_sweep.py to compare settings properly)
+    if hdbscan is not None:
+        print("   Running HDBSCAN...")
+        hdb = hdbscan.HDBSCAN(min_cluster_size=5, min_samples=2, metric='euclidean')
+        hdb_labels = hdb.fit_predict(embeddings)
+        n_hdb = len(set(hdb_labels)) - (1 if -1 in hdb_labels else 0)
+        print(f"   HDBSCAN found {n_hdb} clusters (excluding noise).")
+
+        if n_hdb > 1:
+            # Full silhouette is O(n^2); sampled scores with a confidence interval instead
+            sil_hdb = sampled_scores(embeddings, hdb_labels)['silhouette']
+            if sil_hdb:
+                print(f"   HDBSCAN Silhouette: {sil_hdb['mean']:.4f} (95% CI {sil_hdb['ci95']})")
     
     # 2. KMeans (User requested fixed 5 categories)
-    print("   Running KMeans with K=5...")
-    best_k = 5
-    best_kmeans = KMeans(n_clusters=best_k, random_state=42, n_init=10)
+    best_k = CLUSTER_PARAMS['k']
+    print(f"   Running KMeans with K={best_k}...")
+    best_kmeans = KMeans(n_clusters=best_k, random_state=CLUSTER_PARAMS['random_state'],
+                         n_init=CLUSTER_PARAMS['n_init'])
     best_kmeans.fit(embeddings)
+    sil_km = sampled_scores(embeddings, best_kmeans.labels_)['silhouette']
+    if sil_km:
+        print(f"   KMeans Silhouette: {sil_km['mean']:.4f} (95% CI {sil_km['ci95']})")
             
     return best_kmeans, best_k
 
-'''def map_clusters_to_categories(kmeans, df_orig):
-    print("Mapping clusters to 5 fixed categories...")
-    labels = kmeans.labels_
-    df_orig['Cluster'] = labels
-    
-    # Calculate centroids/means for mapping
-    cluster_stats = []
-    for c_id in range(5):
-        cluster_data = df_orig[df_orig['Cluster'] == c_id]
-        stats = {
-            'id': c_id,
-            'cgpa': cluster_data['CGPA'].mean(),
-            'tech_score': cluster_data['Technical_Skills_Score'].mean(),
-            'projects': cluster_data['Number_of_Projects'].mean(),
-            'publications': cluster_data['Number_of_Publications'].mean(),
-            'leadership': cluster_data['Leadership_Roles'].apply(lambda x: 1 if x == 'Yes' else 0).mean(),
-            'entrepreneur': cluster_data['Entrepreneur_Cell_Member'].apply(lambda x: 1 if x == 'Yes' else 0).mean(),
-            'backlogs': cluster_data['Number_of_Backlogs'].mean()
-        }
-        cluster_stats.append(stats)
-        
-    # Define Categories
-    categories = [
-        "Tech-Oriented Dev Track",
-        "Research & Higher Studies",
-        "Corporate/Management Oriented",
-        "Entrepreneurial Track",
-        "Low-skill / Needs Intervention"
-    ]
-    
-    # Heuristic Mapping
-    # We will assign each cluster to the best fitting category
-    # This is a simple greedy assignment or scoring
-    
-    mapping = {} # cluster_id -> category_name
-    assigned_cats = set()
-    
-    # 1. Low-skill (Highest backlogs or lowest CGPA/Tech)
-    low_skill_cluster = max(cluster_stats, key=lambda x: x['backlogs'] - x['cgpa'] - x['tech_score'])
-    mapping[low_skill_cluster['id']] = "Low-skill / Needs Intervention"
-    assigned_cats.add("Low-skill / Needs Intervention")
-    
-    remaining_clusters = [c for c in cluster_stats if c['id'] not in mapping]
-    
-    # 2. Research (Highest Publications + CGPA)
-    if remaining_clusters:
-        research_cluster = max(remaining_clusters, key=lambda x: x['publications'] * 2 + x['cgpa'])
-        mapping[research_cluster['id']] = "Research & Higher Studies"
-        assigned_cats.add("Research & Higher Studies")
-        remaining_clusters = [c for c in remaining_clusters if c['id'] not in mapping]
-        
-    # 3. Entrepreneur (Highest Entrepreneurship + Leadership)
-    if remaining_clusters:
-        ent_cluster = max(remaining_clusters, key=lambda x: x['entrepreneur'] * 3 + x['leadership'])
-        mapping[ent_cluster['id']] = "Entrepreneurial Track"
-        assigned_cats.add("Entrepreneurial Track")
-        remaining_clusters = [c for c in remaining_clusters if c['id'] not in mapping]
-        
-    # 4. Tech (Highest Tech Score + Projects)
-    if remaining_clusters:
-        tech_cluster = max(remaining_clusters, key=lambda x: x['tech_score'] * 2 + x['projects'])
-        mapping[tech_cluster['id']] = "Tech-Oriented Dev Track"
-        assigned_cats.add("Tech-Oriented Dev Track")
-        remaining_clusters = [c for c in remaining_clusters if c['id'] not in mapping]
-        
-    # 5. Corporate (Remaining, usually balanced or high leadership)
-    if remaining_clusters:
-        corp_cluster = remaining_clusters[0]
-        mapping[corp_cluster['id']] = "Corporate/Management Oriented"
-        assigned_cats.add("Corporate/Management Oriented")
-        
-    # Create Cluster Info
-    cluster_info = {}
-    
-    # Predefined roles and descriptions
-    category_details = {
-        "Tech-Oriented Dev Track": {
-            "roles": ["Software Engineer", "Full Stack Developer", "DevOps Engineer", "System Architect"],
-            "description": "Strong technical skills and project experience, suitable for core development roles."
-        },
-        "Research & Higher Studies": {
-            "roles": ["Data Scientist", "Research Associate", "PhD Candidate", "R&D Engineer"],
-            "description": "High academic performance and research interest, ideal for higher education or R&D."
-        },
-        "Corporate/Management Oriented": {
-            "roles": ["Product Manager", "Business Analyst", "Consultant", "Project Manager"],
-            "description": "Balanced profile with leadership qualities, suitable for management and corporate roles."
-        },
-        "Entrepreneurial Track": {
-            "roles": ["Startup Founder", "Product Owner", "Innovation Manager", "Business Development"],
-            "description": "High initiative and entrepreneurial spirit, suited for starting or leading new ventures."
-        },
-        "Low-skill / Needs Intervention": {
-            "roles": ["Junior Developer", "IT Support", "QA Tester", "Intern"],
-            "description": "Needs to focus on skill development and clearing backlogs to improve career prospects."
-        }
-    }
-    
-    for c_id, cat_name in mapping.items():
-        details = category_details[cat_name]
-        cluster_info[c_id] = {
-            "name": cat_name,
-            "roles": details["roles"],
-            "description": details["description"]
-        }
-        print(f"   Cluster {c_id} -> {cat_name}")
-        
-    return cluster_info'''
-
 def map_clusters_to_categories(kmeans, df_orig):
-    labels = kmeans.labels_
-    df_orig['Cluster'] = labels
+    # Vectorised per-cluster statistics + one-to-one matching to category prototypes
+    print("Mapping clusters to categories...")
+    return cluster_naming.name_clusters(kmeans.labels_, df_orig, kmeans.n_clusters)
 
-    # Mean per cluster
-    summary = df_orig.groupby('Cluster').agg({
-        'CGPA': 'mean',
-        'Technical_Skills_Score': 'mean',
-        'Number_of_Projects': 'mean',
-        'Number_of_Publications': 'mean',
-        'Leadership_Roles': lambda x: (x == 'Yes').mean(),
-        'Entrepreneur_Cell_Member': lambda x: (x == 'Yes').mean(),
-        'Number_of_Backlogs': 'mean'
-    })
 
-    cluster_info = {}
+def name_clusters(kmeans, df_raw):
+    # Naming looks at the parsed (unencoded) columns; the ingest stage already has them
+    return map_clusters_to_categories(kmeans, df_raw.copy())
 
-    for cid in summary.index:
-        row = summary.loc[cid]
 
-        # Rules
+def naming_rules_version():
+    """Hash of the naming code, so editing the rules only invalidates the name stage"""
+    source = inspect.getsource(map_clusters_to_categories) + inspect.getsource(cluster_naming)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
 
-        # 1️⃣ Very weak academic or backlog → low skill
-        if row['CGPA'] < 7.0 or row['Number_of_Backlogs'] > 2:
-            category = "Low-skill / Needs Intervention"
 
-        # 2️⃣ Research-oriented profile
-        elif row['Number_of_Publications'] >= 1 and row['CGPA'] >= 8.5:
-            category = "Research & Higher Studies"
+def _pickle(obj, path):
+    with open(path, 'wb') as f:
+        pickle.dump(obj, f)
 
-        # 3️⃣ Entrepreneur focus
-        elif row['Entrepreneur_Cell_Member'] >= 0.40 or row['Leadership_Roles'] >= 0.40:
-            category = "Entrepreneurial Track"
 
-        # 4️⃣ Strong tech profile
-        elif row['Technical_Skills_Score'] >= 3.5 or row['Number_of_Projects'] >= 3:
-            category = "Tech-Oriented Dev Track"
+def _unpickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
 
-        # 5️⃣ Default cluster → corporate
-        else:
-            category = "Corporate/Management Oriented"
 
-        # Attach info
-        cluster_info[cid] = {
-            "name": category,
-            "roles": [],  # We'll fill next
-            "description": ""
-        }
+def run_pipeline(data_path=DATA_PATH, cache_dir=PIPELINE_CACHE_DIR, force=(), output_dir=MODEL_DIR):
+    """ingest -> encode -> embed -> cluster -> name -> export, each stage cached on disk"""
+    cache = StageCache(cache_dir, force)
 
-    return cluster_info
+    # 1. Ingest: parse the source once into Parquet
+    ingest_out, ingest_dir = cache.run(
+        'ingest', {'source': file_fingerprint(data_path), 'columns': NUMERICAL_COLS + CATEGORICAL_COLS}, [],
+        lambda out: read_source(data_path).to_parquet(os.path.join(out, 'data.parquet'), index=False))
 
+    # 2. Encode & scale
+    def encode(out):
+        X, _, encoders, scaler = encode_and_scale(pd.read_parquet(os.path.join(ingest_dir, 'data.parquet')))
+        np.save(os.path.join(out, 'X.npy'), X.astype(np.float64))
+        _pickle(encoders, os.path.join(out, 'label_encoders.pkl'))
+        _pickle(scaler, os.path.join(out, 'scaler.pkl'))
+    encode_out, encode_dir = cache.run('encode', {}, [ingest_out], encode)
 
-def name_clusters(kmeans, df, original_df_path):
-    # Wrapper to maintain signature but use new logic
-    df_orig = pd.read_excel(original_df_path)
-    df_orig.columns = [c.strip() for c in df_orig.columns]
-    return map_clusters_to_categories(kmeans, df_orig)
+    # 3. Embed: TabNet pretraining, the expensive part
+    def embed(out):
+        if TabNetPretrainer is None:
+            raise RuntimeError("The embed stage needs torch and pytorch-tabnet")
+        X = np.load(os.path.join(encode_dir, 'X.npy'))
+        tabnet = train_tabnet(X)
+        embeddings = get_embeddings(tabnet, X)
+        if embeddings is None:
+            raise RuntimeError("Failed to extract embeddings")
+        np.save(os.path.join(out, 'embeddings.npy'), np.asarray(embeddings))
+        tabnet.save_model(os.path.join(out, 'tabnet_model'))
+    embed_out, embed_dir = cache.run('embed', TABNET_PARAMS, [encode_out], embed)
 
-def main():
-    configure_gemini()
-    
-    # 1. Load & Preprocess
-    X, df, encoders, scaler = load_and_preprocess_data(DATA_PATH)
-    if X is None: return
-    
-    # 2. Train TabNet
-    tabnet = train_tabnet(X)
-    
-    # 3. Get Embeddings
-    embeddings = get_embeddings(tabnet, X)
-    if embeddings is None:
-        print("Failed to extract embeddings. Exiting.")
-        return
-    
     # 4. Cluster
-    kmeans, best_k = cluster_embeddings(embeddings)
-    
-    # 5. Name Clusters
-    cluster_info = name_clusters(kmeans, df, DATA_PATH)
-    
-    # 6. Save
+    def cluster(out):
+        kmeans, _ = cluster_embeddings(np.load(os.path.join(embed_dir, 'embeddings.npy')))
+        _pickle(kmeans, os.path.join(out, 'kmeans_model.pkl'))
+    cluster_out, cluster_dir = cache.run('cluster', CLUSTER_PARAMS, [embed_out], cluster)
+
+    # 5. Name: reads the ingest Parquet, never the source file again
+    def name(out):
+        kmeans = _unpickle(os.path.join(cluster_dir, 'kmeans_model.pkl'))
+        df_raw = pd.read_parquet(os.path.join(ingest_dir, 'data.parquet'))
+        _pickle(name_clusters(kmeans, df_raw), os.path.join(out, 'cluster_info.pkl'))
+    _, name_dir = cache.run('name', {'rules': naming_rules_version()}, [cluster_out, ingest_out], name)
+
+    # 6. Export (always runs; it's only file copies)
     print("Saving artifacts...")
-    
-    # Save TabNet
-    tabnet.save_model(os.path.join(MODEL_DIR, 'tabnet_model'))
-    
-    # Save KMeans
-    with open(os.path.join(MODEL_DIR, 'kmeans_model.pkl'), 'wb') as f:
-        pickle.dump(kmeans, f)
-        
-    # Save Scaler & Encoders
-    with open(os.path.join(MODEL_DIR, 'scaler.pkl'), 'wb') as f:
-        pickle.dump(scaler, f)
-        
-    with open(os.path.join(MODEL_DIR, 'label_encoders.pkl'), 'wb') as f:
-        pickle.dump(encoders, f)
-        
-    # Save Cluster Info
-    with open(os.path.join(MODEL_DIR, 'cluster_info.pkl'), 'wb') as f:
-        pickle.dump(cluster_info, f)
-        
-    # Save Embeddings (optional, for viz)
-    np.save(os.path.join(MODEL_DIR, 'embeddings.npy'), embeddings)
-    
+    os.makedirs(output_dir, exist_ok=True)
+    for directory, filename in [(encode_dir, 'scaler.pkl'), (encode_dir, 'label_encoders.pkl'),
+                                (embed_dir, 'tabnet_model.zip'), (embed_dir, 'embeddings.npy'),
+                                (cluster_dir, 'kmeans_model.pkl'), (name_dir, 'cluster_info.pkl')]:
+        path = os.path.join(directory, filename)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(output_dir, filename))
+
+    print(cache.summary())
     print("Training Complete!")
+    return cache.report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stage-cached unsupervised training")
+    parser.add_argument('--data', default=DATA_PATH, help="Excel / CSV / Parquet training file")
+    parser.add_argument('--cache-dir', default=PIPELINE_CACHE_DIR)
+    parser.add_argument('--output-dir', default=MODEL_DIR)
+    parser.add_argument('--force', nargs='*', default=[],
+                        choices=['ingest', 'encode', 'embed', 'cluster', 'name', 'all'],
+                        help="Rerun these stages even if cached")
+    args = parser.parse_args()
+
+    configure_gemini()
+    run_pipeline(args.data, args.cache_dir, args.force, args.output_dir)
 
 if __name__ == "__main__":
     main()